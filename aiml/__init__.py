@@ -1,13 +1,62 @@
-from .preprocessing import preprocess_dataset
-from .model_training import train_models
-from .bias_metrices import evaluate_bias
-from .visualization import plot_selection_rates
-from .report import generate_report
+import importlib
+
+# Public name -> submodule. These pull in pandas, scikit-learn, matplotlib and fpdf, so they are
+# imported on first attribute access (PEP 562) rather than with the package; importing
+# aiml.jobs, aiml.cache or aiml.uploads stays cheap.
+_LAZY_EXPORTS = {
+    "preprocess_dataset": ".preprocessing",
+    "train_models": ".model_training",
+    "evaluate_bias": ".bias_metrices",
+    "plot_selection_rates": ".visualization",
+    "generate_report": ".report",
+    "run_analysis": ".pipeline",
+    "run_preview": ".pipeline",
+    "run_batch": ".pipeline",
+    "score_dataset": ".pipeline",
+    "build_deferred_report": ".pipeline",
+    "run_mitigation": ".pipeline",
+    "FairnessMonitor": ".monitoring",
+    "tail_records": ".monitoring",
+}
 
 __all__ = [
     "preprocess_dataset",
     "train_models",
     "evaluate_bias",
     "plot_selection_rates",
-    "generate_report"
-]
\ No newline at end of file
+    "generate_report",
+    "run_analysis",
+    "run_preview",
+    "run_batch",
+    "score_dataset",
+    "build_deferred_report",
+    "run_mitigation",
+    "FairnessMonitor",
+    "tail_records",
+    "warm_up",
+]
+
+
+def __getattr__(name):
+    if name not in _LAZY_EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def warm_up():
+    """
+    Import the whole analysis stack now instead of on the first analysis request, e.g. from a
+    startup thread or a gunicorn post_fork hook. Returns the seconds it took.
+    """
+    import time
+
+    from .model_training import MODEL_REGISTRY, _estimator_class
+
+    start = time.perf_counter()
+    for name in _LAZY_EXPORTS:
+        __getattr__(name)
+    for estimator_path, _, _ in MODEL_REGISTRY.values():
+        _estimator_class(estimator_path)
+    return time.perf_counter() - start
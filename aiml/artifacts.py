@@ -0,0 +1,70 @@
+import json
+import os
+import re
+import time
+import uuid
+
+_ARTIFACT_ID = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+
+class ArtifactStore:
+    """
+    Fitted models and preprocessing kept on the local filesystem for scoring later uploads.
+
+    Each artifact lives in `root/<artifact_id>/` with the model and the preprocessor (encoders,
+    scaler, column lists) dumped uncompressed by joblib, so their NumPy arrays are memory-mapped
+    on load instead of copied, plus a small meta.json describing how it was trained.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, artifact_id):
+        if not _ARTIFACT_ID.match(artifact_id or ""):
+            raise KeyError(artifact_id)
+        return os.path.join(self.root, artifact_id)
+
+    def save(self, model, preprocessor, metadata=None):
+        """Store a fitted model with its preprocessor and return the new versioned artifact ID."""
+        metadata = dict(metadata or {})
+        name = re.sub(r"[^A-Za-z0-9_]+", "_", str(metadata.get("model_name", "model")))
+        artifact_id = f"{name}-{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+        path = self._path(artifact_id)
+        os.makedirs(path)
+        import joblib  # deferred: only needed once a model is saved or loaded
+
+        joblib.dump(model, os.path.join(path, "model.joblib"))
+        joblib.dump(preprocessor, os.path.join(path, "preprocessor.joblib"))
+
+        metadata.update({"artifact_id": artifact_id, "created_at": time.time()})
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as fh:
+            json.dump(metadata, fh, default=str)
+        return artifact_id
+
+    def metadata(self, artifact_id):
+        try:
+            with open(os.path.join(self._path(artifact_id), "meta.json"), "r", encoding="utf-8") as fh:
+                return json.load(fh)
+        except OSError:
+            raise KeyError(artifact_id)
+
+    def load(self, artifact_id, mmap_mode="r"):
+        """Return (model, preprocessor, metadata); raises KeyError for unknown IDs."""
+        meta = self.metadata(artifact_id)
+        path = self._path(artifact_id)
+        import joblib
+
+        model = joblib.load(os.path.join(path, "model.joblib"), mmap_mode=mmap_mode)
+        preprocessor = joblib.load(os.path.join(path, "preprocessor.joblib"), mmap_mode=mmap_mode)
+        return model, preprocessor, meta
+
+    def list(self):
+        items = []
+        for artifact_id in sorted(os.listdir(self.root)):
+            try:
+                items.append(self.metadata(artifact_id))
+            except KeyError:
+                continue
+        return sorted(items, key=lambda m: m.get("created_at", 0), reverse=True)
@@ -1,7 +1,146 @@
-from fairlearn.metrics import MetricFrame, selection_rate, demographic_parity_difference, equalized_odds_ratio
-from sklearn.metrics import accuracy_score
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed, effective_n_jobs
 
-def evaluate_bias(models, X_test, y_test, A_test):
+COUNT_COLUMNS = ["tn", "fp", "fn", "tp"]
+
+
+def group_confusion_counts(y_true, y_pred, sensitive_features):
+    """
+    Per-group confusion-matrix counts in a single pass.
+    Returns (groups, counts) where counts has one row per group with columns [tn, fp, fn, tp].
+    """
+    y_true = np.asarray(y_true)
+    y_pred = np.asarray(y_pred)
+    for name, values in (("y_true", y_true), ("y_pred", y_pred)):
+        if values.size and not np.isin(values, (0, 1)).all():
+            raise ValueError(f"{name} must be binary (0/1) to compute fairness metrics.")
+
+    groups, codes = np.unique(np.asarray(sensitive_features), return_inverse=True)
+    cells = codes * 4 + y_true.astype(np.int64) * 2 + y_pred.astype(np.int64)
+    counts = np.bincount(cells, minlength=4 * len(groups)).reshape(len(groups), 4)
+    return groups, counts
+
+
+def _safe_divide(num, den):
+    # Empty denominators give 0, like sklearn's confusion_matrix(normalize="true")
+    num = np.asarray(num, dtype=np.float64)
+    den = np.asarray(den, dtype=np.float64)
+    return np.divide(num, den, out=np.zeros_like(num), where=den > 0)
+
+
+def group_metrics_from_counts(groups, counts):
+    """Confusion counts plus selection rate, TPR, FPR and precision per group."""
+    tn, fp, fn, tp = counts.T
+    n = counts.sum(axis=1)
+    return pd.DataFrame({
+        "count": n,
+        "tn": tn,
+        "fp": fp,
+        "fn": fn,
+        "tp": tp,
+        "selection_rate": _safe_divide(fp + tp, n),
+        "tpr": _safe_divide(tp, tp + fn),
+        "fpr": _safe_divide(fp, fp + tn),
+        "precision": _safe_divide(tp, tp + fp),
+    }, index=pd.Index(groups, name="sensitive_feature_0"))
+
+
+def _nan_ratio(values):
+    # min/max across groups; 0/0 is NaN, as in fairlearn's MetricFrame.ratio()
+    return np.nanmin(values, axis=-1) / np.nanmax(values, axis=-1)
+
+
+def metric_arrays(counts):
+    """
+    Unrounded headline metrics for counts shaped (..., n_groups, 4), e.g. a stack of bootstrap
+    resamples. Groups with no rows are left out, as fairlearn never sees them.
+    """
+    counts = np.asarray(counts, dtype=np.float64)
+    tn, fp, fn, tp = np.moveaxis(counts, -1, 0)
+    n = tn + fp + fn + tp
+    present = n > 0
+
+    selection = np.where(present, _safe_divide(fp + tp, n), np.nan)
+    tpr = np.where(present, _safe_divide(tp, tp + fn), np.nan)
+    fpr = np.where(present, _safe_divide(fp, fp + tn), np.nan)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        accuracy = (tn + tp).sum(axis=-1) / n.sum(axis=-1)
+        dpd = np.nanmax(selection, axis=-1) - np.nanmin(selection, axis=-1)
+        di = _nan_ratio(selection)
+        tpr_ratio = _nan_ratio(tpr)
+        fpr_ratio = _nan_ratio(fpr)
+
+    # Worst case of the TPR and FPR ratios, with fairlearn's NaN handling (TPR ratio first)
+    eod = np.where(np.isnan(fpr_ratio), tpr_ratio, np.minimum(tpr_ratio, fpr_ratio))
+    eod = np.where(np.isnan(tpr_ratio), np.nan, eod)
+
+    return {
+        "Accuracy": accuracy,
+        "Demographic Parity Diff": dpd,
+        "Equal Opportunity Diff": eod,
+        "Disparate Impact": di,
+    }
+
+
+def metrics_from_counts(groups, counts, min_group_size=1):
+    """
+    All headline fairness metrics from per-group confusion counts. Returns (metrics, group_frame).
+    Groups with fewer than `min_group_size` rows stay in the frame but are left out of the metrics.
+    """
+    frame = group_metrics_from_counts(groups, counts)
+    frame["included"] = frame["count"] >= min_group_size
+    if not frame["included"].any():
+        raise ValueError(f"No group has at least {min_group_size} rows in the test set.")
+
+    included = counts[frame["included"].to_numpy()]
+    metrics = {name: round(np.float64(value), 2) for name, value in metric_arrays(included).items()}
+    return metrics, frame
+
+
+def _bootstrap_batch(n_rows, cell_probs, size, seed):
+    rng = np.random.default_rng(seed)
+    draws = rng.multinomial(n_rows, cell_probs, size=size).reshape(size, -1, 4)
+    return metric_arrays(draws)
+
+
+def bootstrap_intervals(counts, n_resamples=2000, confidence=0.95, n_jobs=-1, random_state=42):
+    """
+    Percentile bootstrap confidence intervals for the headline metrics.
+
+    Resampling the test set with replacement only changes how many rows land in each
+    (group, y_true, y_pred) cell, so each resample is a single multinomial draw over the
+    per-group confusion counts instead of a pass over the rows. Batches of resamples are
+    spread over `n_jobs` workers.
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    n_rows = int(counts.sum())
+    cell_probs = counts.ravel() / n_rows
+
+    n_batches = max(1, min(effective_n_jobs(n_jobs), n_resamples))
+    sizes = [len(b) for b in np.array_split(np.arange(n_resamples), n_batches)]
+    seeds = np.random.SeedSequence(random_state).spawn(n_batches)
+
+    batches = Parallel(n_jobs=n_batches, prefer="threads")(
+        delayed(_bootstrap_batch)(n_rows, cell_probs, size, seed) for size, seed in zip(sizes, seeds)
+    )
+
+    alpha = (1 - confidence) / 2
+    intervals = {}
+    for name in batches[0]:
+        samples = np.concatenate([batch[name] for batch in batches])
+        samples = samples[~np.isnan(samples)]
+        if samples.size == 0:
+            intervals[name] = {"low": None, "high": None}
+            continue
+        low, high = np.quantile(samples, [alpha, 1 - alpha])
+        intervals[name] = {"low": round(float(low), 2), "high": round(float(high), 2)}
+
+    return {"confidence": confidence, "n_resamples": n_resamples, "intervals": intervals}
+
+
+def evaluate_bias(models, X_test, y_test, A_test, return_group_metrics=False, min_group_size=1):
     results = {}
 
     # If a single model is passed, wrap it in a dict
@@ -11,15 +150,13 @@ def evaluate_bias(models, X_test, y_test, A_test):
     for name, model in models.items():
         y_pred = model.predict(X_test)
 
-        metrics = {
-            "Accuracy": round(accuracy_score(y_test, y_pred), 2),
-            "Demographic Parity Diff": round(demographic_parity_difference(y_test, y_pred, sensitive_features=A_test), 2),
-            "Equal Opportunity Diff": round(equalized_odds_ratio(y_test, y_pred, sensitive_features=A_test), 2)
-        }
+        # Every metric comes from one bincount over (group, y_true, y_pred)
+        groups, counts = group_confusion_counts(y_test, y_pred, A_test)
+        metrics, group_frame = metrics_from_counts(groups, counts, min_group_size=min_group_size)
 
-        # Disparate Impact (min selection rate / max selection rate)
-        rates = MetricFrame(metrics=selection_rate, y_true=y_test, y_pred=y_pred, sensitive_features=A_test)
-        metrics["Disparate Impact"] = round((rates.group_min() / rates.group_max()),2)
+        rates = group_frame.loc[group_frame["included"], "selection_rate"].rename("selection_rate")
         results[name] = metrics
 
-    return metrics, rates, y_pred
\ No newline at end of file
+    if return_group_metrics:
+        return metrics, rates, y_pred, group_frame
+    return metrics, rates, y_pred
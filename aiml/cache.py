@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+# Bump when a pipeline change alters results for the same inputs, so older entries stop matching
+CACHE_VERSION = 2
+
+# Files an analysis writes to report_dir: cache entry field -> result field
+ARTIFACT_FIELDS = {
+    "chart": "chart_path",
+    "chart_svg": "chart_svg_path",
+    "report": "report_path",
+    "report_spec": "report_spec_path",
+}
+
+
+def analysis_key(dataset_digest, **params):
+    """
+    Cache key for one analysis: the dataset hash plus every parameter that changes the result
+    (target/sensitive columns, model name and hyperparameters, bootstrap settings, ...).
+    """
+    payload = json.dumps({"dataset": dataset_digest, "version": CACHE_VERSION, **params},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    Content-addressed cache of finished analyses.
+
+    Each entry is a small JSON file in `index_dir` holding the metrics plus the names of the charts
+    and PDF it produced in `report_dir`. Entries older than `max_age` seconds are dropped, and the
+    least recently used ones are evicted once the artifacts they point to exceed `max_bytes`.
+    Only index entries are removed: the files belong to retention.ReportStore, as they may be
+    shared with other analyses or still be downloading, and an entry whose files it collected
+    reads as a miss. Hit/miss counters are kept per process.
+    """
+
+    def __init__(self, report_dir, index_dir, max_bytes=500 * 1024 * 1024, max_age=7 * 24 * 3600):
+        self.report_dir = report_dir
+        self.index_dir = index_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(index_dir, exist_ok=True)
+        if hasattr(os, "register_at_fork"):
+            # Analysis workers are forked from a threaded server and put their results here
+            os.register_at_fork(after_in_child=self._reset_lock)
+
+    def _reset_lock(self):
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Locks cannot be pickled; a copy sent to a worker process gets its own
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _entry_path(self, key):
+        return os.path.join(self.index_dir, f"{key}.json")
+
+    def _artifact_paths(self, entry):
+        return [os.path.join(self.report_dir, entry[name]) for name in ARTIFACT_FIELDS if entry.get(name)]
+
+    def _is_complete(self, entry):
+        for name in ARTIFACT_FIELDS:
+            if entry.get(name) and not os.path.exists(os.path.join(self.report_dir, entry[name])):
+                # A deferred PDF is built from its spec on first download
+                if name == "report" and entry.get("report_spec") and \
+                        os.path.exists(os.path.join(self.report_dir, entry["report_spec"])):
+                    continue
+                return False
+        return True
+
+    def _read_entry(self, key):
+        try:
+            with open(self._entry_path(key), "r", encoding="utf-8") as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+    def _remove_entry(self, key):
+        try:
+            os.remove(self._entry_path(key))
+        except OSError:
+            pass
+
+    def get(self, key):
+        """Return the cached result for `key`, or None if missing, expired or its files are gone."""
+        entry = self._read_entry(key)
+        valid = (
+            entry is not None
+            and time.time() - entry["created_at"] <= self.max_age
+            and self._is_complete(entry)
+        )
+        with self._lock:
+            if valid:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        if not valid:
+            if entry is not None:
+                self._remove_entry(key)
+            return None
+
+        # Touch the index file so size-based eviction is least-recently-used
+        os.utime(self._entry_path(key))
+        return {
+            **entry["result"],
+            **{field: os.path.join(self.report_dir, entry[name]) if entry.get(name) else None
+               for name, field in ARTIFACT_FIELDS.items()},
+        }
+
+    def put(self, key, result):
+        entry = {
+            "created_at": time.time(),
+            **{name: os.path.basename(result[field]) if result.get(field) else None
+               for name, field in ARTIFACT_FIELDS.items()},
+            "result": {k: v for k, v in result.items() if k not in ARTIFACT_FIELDS.values()},
+        }
+        tmp_path = self._entry_path(key) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump(entry, fh, default=str)
+        os.replace(tmp_path, self._entry_path(key))
+        self.evict()
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until their artifacts fit in max_bytes."""
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.index_dir):
+            if not name.endswith(".json"):
+                continue
+            key = name[:-len(".json")]
+            entry = self._read_entry(key)
+            if entry is None:
+                continue
+            if now - entry["created_at"] > self.max_age:
+                self._remove_entry(key)
+                continue
+            size = sum(os.path.getsize(p) for p in self._artifact_paths(entry) if os.path.exists(p))
+            entries.append((os.path.getmtime(self._entry_path(key)), key, entry, size))
+
+        total = sum(e[3] for e in entries)
+        for _, key, entry, size in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            self._remove_entry(key)
+            total -= size
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "entries": sum(1 for n in os.listdir(self.index_dir) if n.endswith(".json")),
+        }
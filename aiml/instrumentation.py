@@ -0,0 +1,155 @@
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+SECONDS_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# name -> (type, help)
+METRIC_TYPES = {
+    "biasguard_stage_wall_seconds": ("histogram", "Wall-clock time of each pipeline stage."),
+    "biasguard_stage_cpu_seconds": ("histogram", "CPU time of the thread running each pipeline stage."),
+    "biasguard_stage_rows_total": ("counter", "Rows processed by each pipeline stage."),
+    "biasguard_stage_peak_rss_bytes": ("gauge", "Peak resident memory of the process as of the end of each stage."),
+    "biasguard_request_seconds": ("histogram", "Wall-clock time of each HTTP request by endpoint."),
+    "biasguard_jobs_pending": ("gauge", "Background jobs queued or running."),
+    "biasguard_monitor_metric": ("gauge", "Fairness metrics of each monitored stream over its sliding window."),
+    "biasguard_monitor_alerts_firing": ("gauge", "Fairness thresholds currently breached by each monitored stream."),
+    "biasguard_analysis_rejected_total": ("counter", "Analysis requests refused by admission control, by reason."),
+    "biasguard_analysis_limit_total": ("counter", "Analysis workers stopped by a resource limit, by limit."),
+}
+
+
+def peak_rss_bytes():
+    """High-water mark of this process's resident memory, or None where it cannot be read."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _format_labels(labels, extra=None):
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """
+    In-process histograms, counters and gauges, rendered in the Prometheus text format.
+    Labels are given as a tuple of (name, value) pairs. Safe to use from several threads.
+    """
+
+    def __init__(self, buckets=SECONDS_BUCKETS):
+        self.buckets = buckets
+        self._histograms = {}
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, value, labels=()):
+        with self._lock:
+            # Cumulative bucket counts, sum, count
+            histogram = self._histograms.setdefault((name, labels), [[0] * len(self.buckets), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def inc(self, name, value=1, labels=()):
+        with self._lock:
+            self._values[(name, labels)] = self._values.get((name, labels), 0) + value
+
+    def set(self, name, value, labels=()):
+        with self._lock:
+            self._values[(name, labels)] = value
+
+    def record_stage(self, record):
+        """Add one stage record (as produced by `stage`) to the stage metrics."""
+        labels = (("stage", record["stage"]),)
+        self.observe("biasguard_stage_wall_seconds", record["wall_seconds"], labels)
+        self.observe("biasguard_stage_cpu_seconds", record["cpu_seconds"], labels)
+        if record.get("rows") is not None:
+            self.inc("biasguard_stage_rows_total", int(record["rows"]), labels)
+        if record.get("peak_rss_bytes") is not None:
+            self.set("biasguard_stage_peak_rss_bytes", record["peak_rss_bytes"], labels)
+
+    def render(self):
+        with self._lock:
+            histograms = {k: (list(c), s, n) for k, (c, s, n) in self._histograms.items()}
+            values = dict(self._values)
+
+        lines = []
+        for name, (kind, help_text) in METRIC_TYPES.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            if kind == "histogram":
+                for (metric, labels), (buckets, total, count) in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, in_bucket in zip(self.buckets, buckets):
+                        lines.append(f"{name}_bucket{_format_labels(labels, ('le', bound))} {in_bucket}")
+                    lines.append(f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))} {count}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {count}")
+            else:
+                for (metric, labels), value in sorted(values.items()):
+                    if metric == name:
+                        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+
+if hasattr(os, "register_at_fork"):
+    # Analysis workers are forked from a threaded server; a lock held by another thread at fork
+    # time would stay locked forever in the child
+    os.register_at_fork(after_in_child=lambda: setattr(METRICS, "_lock", threading.Lock()))
+
+_collectors = threading.local()
+
+
+@contextmanager
+def stage(name, rows=None):
+    """
+    Time a pipeline stage: wall time, CPU time of this thread and the process's peak RSS.
+    Set record["rows"] inside the block when the row count is only known afterwards.
+    """
+    record = {"stage": name, "rows": rows}
+    wall, cpu = time.perf_counter(), time.thread_time()
+    yield record
+    record["wall_seconds"] = time.perf_counter() - wall
+    record["cpu_seconds"] = time.thread_time() - cpu
+    record["peak_rss_bytes"] = peak_rss_bytes()
+    METRICS.record_stage(record)
+    for records in getattr(_collectors, "stack", []):
+        records.append(record)
+
+
+@contextmanager
+def collect_stages():
+    """Collect the records of every stage run by this thread inside the block."""
+    records = []
+    _collectors.stack = getattr(_collectors, "stack", []) + [records]
+    try:
+        yield records
+    finally:
+        _collectors.stack = [r for r in _collectors.stack if r is not records]
+
+
+def run_traced(fn, *args, **kwargs):
+    """Call `fn` and return (result, stage records), e.g. to carry a worker process's timings back."""
+    with collect_stages() as records:
+        result = fn(*args, **kwargs)
+    return result, records
@@ -0,0 +1,226 @@
+import multiprocessing
+import os
+import signal
+import threading
+from contextlib import contextmanager
+
+from .instrumentation import METRICS, run_traced
+
+try:
+    import fcntl
+    import resource
+except ImportError:  # not available on Windows
+    fcntl = resource = None
+
+
+class HostBusyError(RuntimeError):
+    """Raised before any work starts when the host is already running as many analyses as it may."""
+
+    def __init__(self, message, retry_after=5):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class WorkerLimitError(RuntimeError):
+    """An analysis worker ran out of time or memory; `limit` is "timeout", "cpu", "memory" or "crashed"."""
+
+    def __init__(self, limit, message):
+        super().__init__(message)
+        self.limit = limit
+
+
+class HostSlots:
+    """
+    Admission control shared by every web worker process on the host.
+
+    Each running analysis holds an exclusive flock on one of `max_concurrent` files in
+    `slot_dir`; when none is free the request is refused at once with HostBusyError instead of
+    queueing behind the others. Locks are dropped by the kernel if a process dies. With
+    `max_load` set, requests are also refused while the 1-minute load average per CPU is above it.
+    """
+
+    def __init__(self, slot_dir, max_concurrent=2, max_load=0.0):
+        self.slot_dir = slot_dir
+        self.max_concurrent = max_concurrent
+        self.max_load = max_load
+        self._held = set()
+        self._local = threading.BoundedSemaphore(max_concurrent)
+        os.makedirs(slot_dir, exist_ok=True)
+        if hasattr(os, "register_at_fork"):
+            # A forked worker must not keep the slots of other requests locked after they finish
+            os.register_at_fork(after_in_child=self._close_inherited)
+
+    def _close_inherited(self):
+        for fd in list(self._held):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        self._held.clear()
+
+    def _try_lock(self):
+        for i in range(self.max_concurrent):
+            fd = os.open(os.path.join(self.slot_dir, f"slot_{i}.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                continue
+            self._held.add(fd)
+            return fd
+        return None
+
+    def _reject(self):
+        METRICS.inc("biasguard_analysis_rejected_total", labels=(("reason", "slots"),))
+        raise HostBusyError(f"Server is busy ({self.max_concurrent} analyses running), try again later")
+
+    @contextmanager
+    def acquire(self):
+        """Hold one slot for the duration of the block; raises HostBusyError when there is none."""
+        if self.max_load and hasattr(os, "getloadavg"):
+            load = os.getloadavg()[0] / (os.cpu_count() or 1)
+            if load > self.max_load:
+                METRICS.inc("biasguard_analysis_rejected_total", labels=(("reason", "load"),))
+                raise HostBusyError(f"Server is overloaded (load {load:.2f} per CPU), try again later")
+
+        if fcntl is None:
+            if not self._local.acquire(blocking=False):
+                self._reject()
+            try:
+                yield
+            finally:
+                self._local.release()
+            return
+
+        fd = self._try_lock()
+        if fd is None:
+            self._reject()
+        try:
+            yield
+        finally:
+            self._held.discard(fd)
+            os.close(fd)
+
+
+def _address_space():
+    """Bytes of address space this process has mapped, or 0 where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+def _set_limits(memory_limit, cpu_limit, cpu_backstop=True):
+    if memory_limit:
+        # A forked worker starts with the server's mappings (libraries, thread stacks), so the
+        # limit is what it may map on top of them
+        limit = _address_space() + memory_limit
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    if cpu_limit:
+        # RLIMIT_CPU counts the whole life of the process, so the budget starts from what it has used
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        soft = int(usage.ru_utime + usage.ru_stime + cpu_limit) + 1
+        # SIGXCPU at the soft limit ends the process; the hard limit is only a backstop. Pool workers
+        # leave it alone, as an unprivileged process could not raise it again for its next job.
+        hard = soft + 5 if cpu_backstop else resource.getrlimit(resource.RLIMIT_CPU)[1]
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def limit_worker(memory_limit):
+    """ProcessPoolExecutor initializer: cap the address space of a long-lived pool worker."""
+    if resource is not None and memory_limit:
+        _set_limits(memory_limit, 0)
+
+
+def run_limited(cpu_limit, fn, *args, **kwargs):
+    """Run one job in a pool worker with `cpu_limit` seconds of CPU time (0 = unlimited), traced."""
+    if resource is not None and cpu_limit:
+        _set_limits(0, cpu_limit, cpu_backstop=False)
+    return run_traced(fn, *args, **kwargs)
+
+
+def _worker(conn, memory_limit, cpu_limit, fn, args, kwargs):
+    try:
+        _set_limits(memory_limit, cpu_limit)
+        message = ("ok", run_traced(fn, *args, **kwargs))
+    except MemoryError:
+        message = ("limit", "memory")
+    except BaseException as e:
+        message = ("error", e)
+    try:
+        conn.send(message)
+    except Exception as e:
+        # The exception or result could not be pickled; send its text instead
+        text = str(message[1]) if message[0] == "error" else f"Result could not be returned: {e}"
+        conn.send(("error", RuntimeError(text)))
+    finally:
+        conn.close()
+
+
+class IsolatedRunner:
+    """
+    Run analysis entry points in a forked worker process, one per call, so a pathological upload
+    can only take down its own worker and never the web server.
+
+    The worker may map `memory_limit` bytes of address space beyond what it inherits and use
+    `cpu_limit` seconds of CPU time (via `resource`), and is killed after `timeout` seconds of wall
+    time; 0 disables a limit. Forking lets the worker read an upload that is still buffered in
+    memory without copying it; results and exceptions come back pickled, so callers see the same
+    errors as an in-process call, plus WorkerLimitError when a limit was hit. Stage timings are
+    added to METRICS. The locks the worker may take (METRICS, ResultCache, ReportStore and the
+    deferred-report locks) are reset after fork, as is every logging handler's by logging itself.
+    Where fork or `resource` is not available the call runs in this process without limits.
+    """
+
+    def __init__(self, memory_limit=0, cpu_limit=0, timeout=0):
+        self.memory_limit = memory_limit
+        self.cpu_limit = cpu_limit
+        self.timeout = timeout
+        self.enabled = resource is not None and "fork" in multiprocessing.get_all_start_methods()
+
+    @staticmethod
+    def _limit_hit(limit, message):
+        METRICS.inc("biasguard_analysis_limit_total", labels=(("limit", limit),))
+        raise WorkerLimitError(limit, message)
+
+    def run(self, fn, *args, **kwargs):
+        if not self.enabled:
+            return fn(*args, **kwargs)
+
+        ctx = multiprocessing.get_context("fork")
+        receiver, sender = ctx.Pipe(duplex=False)
+        # Not a daemon: joblib runs daemonic processes with n_jobs=1, which would serialise bootstrap
+        # batches and forest fits. run() always kills and joins the worker itself.
+        worker = ctx.Process(
+            target=_worker, args=(sender, self.memory_limit, self.cpu_limit, fn, args, kwargs), daemon=False
+        )
+        worker.start()
+        sender.close()
+        try:
+            if not receiver.poll(self.timeout or None):
+                worker.kill()
+                self._limit_hit("timeout", f"Analysis did not finish within {self.timeout:g} s")
+            try:
+                message = receiver.recv()
+            except EOFError:
+                message = None
+        finally:
+            receiver.close()
+            worker.join()
+
+        if message is None:
+            if worker.exitcode == -signal.SIGXCPU or (self.cpu_limit and worker.exitcode == -signal.SIGKILL):
+                self._limit_hit("cpu", f"Analysis used more than {self.cpu_limit:g} s of CPU time")
+            self._limit_hit("crashed", f"Analysis worker exited unexpectedly (exit code {worker.exitcode}); "
+                                       "the dataset may be too large for this server")
+        if message[0] == "limit":
+            self._limit_hit("memory", f"Analysis needed more than {self.memory_limit / 2 ** 20:.0f} MiB of memory"
+                            if self.memory_limit else "Analysis ran out of memory")
+        if message[0] == "error":
+            raise message[1]
+
+        result, records = message[1]
+        for record in records:
+            METRICS.record_stage(record)
+        return result
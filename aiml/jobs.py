@@ -0,0 +1,172 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .instrumentation import METRICS
+from .isolation import limit_worker, run_limited
+
+
+class QueueFullError(RuntimeError):
+    pass
+
+
+class JobQueue:
+    """
+    Bounded in-process job queue backed by a process pool.
+
+    Jobs run in worker processes so model training does not hold the web server's GIL.
+    At most `max_pending` jobs may be queued or running at once; finished jobs are kept
+    for `keep_finished` seconds so clients can poll for the result. Pipeline stage timings
+    recorded in a worker are added to this process's METRICS when the job finishes.
+
+    Workers may map `memory_limit` bytes of address space beyond what they inherit, and each job
+    may use `cpu_limit` seconds of CPU time (0 = unlimited). A worker that dies breaks the pool:
+    the jobs it held fail with limit "crashed" and the next submit starts a fresh pool.
+    """
+
+    def __init__(self, max_workers=2, max_pending=16, keep_finished=3600, memory_limit=0, cpu_limit=0):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.keep_finished = keep_finished
+        self.memory_limit = memory_limit
+        self.cpu_limit = cpu_limit
+        self._executor = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Created on first use so importing the app does not fork worker processes
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, initializer=limit_worker, initargs=(self.memory_limit,)
+            )
+        return self._executor
+
+    def _discard_executor(self, executor):
+        # Called with the lock held. A broken pool accepts no more work and has already terminated
+        # its workers, so it is only dropped and the next submit creates a new one.
+        if executor is not None and executor is self._executor:
+            self._executor = None
+
+    def _prune(self):
+        cutoff = time.time() - self.keep_finished
+        for job_id in [j for j, job in self._jobs.items()
+                       if job["finished_at"] and job["finished_at"] < cutoff]:
+            del self._jobs[job_id]
+
+    def pending_count(self):
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if not job["future"].done())
+
+    def submit(self, fn, *args, on_cancel=None, **kwargs):
+        """
+        Queue `fn(*args, **kwargs)` and return its job ID.
+        `on_cancel` is called if the job is cancelled before it starts, e.g. to remove its input file.
+        """
+        with self._lock:
+            self._prune()
+            pending = sum(1 for job in self._jobs.values() if not job["future"].done())
+            if pending >= self.max_pending:
+                raise QueueFullError(f"Job queue is full ({pending} jobs pending)")
+
+            job_id = uuid.uuid4().hex[:12]
+            executor = self._get_executor()
+            try:
+                future = executor.submit(run_limited, self.cpu_limit, fn, *args, **kwargs)
+            except BrokenProcessPool:
+                self._discard_executor(executor)
+                executor = self._get_executor()
+                future = executor.submit(run_limited, self.cpu_limit, fn, *args, **kwargs)
+            self._jobs[job_id] = {
+                "future": future,
+                "executor": executor,
+                "submitted_at": time.time(),
+                "finished_at": None,
+                "on_cancel": on_cancel,
+            }
+
+        future.add_done_callback(lambda _f, job_id=job_id: self._mark_finished(job_id))
+        return job_id
+
+    def _mark_finished(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job["finished_at"] = time.time()
+            if job["future"].cancelled():
+                return
+            error = job["future"].exception()
+            if isinstance(error, BrokenProcessPool):
+                self._discard_executor(job["executor"])
+
+        if error is None:
+            for record in job["future"].result()[1]:
+                METRICS.record_stage(record)
+        elif isinstance(error, (BrokenProcessPool, MemoryError)):
+            limit = "memory" if isinstance(error, MemoryError) else "crashed"
+            METRICS.inc("biasguard_analysis_limit_total", labels=(("limit", limit),))
+            # The job may have died before removing its input file
+            if isinstance(error, BrokenProcessPool) and job["on_cancel"] is not None:
+                job["on_cancel"]()
+
+    def _get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            raise KeyError(job_id)
+        return job
+
+    def status(self, job_id):
+        job = self._get(job_id)
+        future = job["future"]
+
+        if future.cancelled():
+            state = "cancelled"
+        elif future.done():
+            state = "failed" if future.exception() is not None else "done"
+        elif future.running():
+            state = "running"
+        else:
+            state = "queued"
+
+        info = {
+            "job_id": job_id,
+            "status": state,
+            "submitted_at": job["submitted_at"],
+            "finished_at": job["finished_at"],
+        }
+        if state == "failed":
+            error = future.exception()
+            info["error"] = str(error)
+            if isinstance(error, MemoryError):
+                info["error"] = "Job ran out of memory"
+                info["limit"] = "memory"
+            elif isinstance(error, BrokenProcessPool):
+                info["error"] = ("Job worker exited unexpectedly; a job running with it hit its memory "
+                                 "or CPU limit, or the dataset is too large for this server")
+                info["limit"] = "crashed"
+        return info
+
+    def result(self, job_id):
+        """Return the job's result; raises if it failed, was cancelled or is not finished yet."""
+        future = self._get(job_id)["future"]
+        if not future.done():
+            raise RuntimeError("Job is not finished")
+        return future.result()[0]
+
+    def cancel(self, job_id):
+        """Cancel a job that has not started yet. Running jobs cannot be interrupted."""
+        job = self._get(job_id)
+        cancelled = job["future"].cancel()
+        if cancelled and job["on_cancel"] is not None:
+            job["on_cancel"]()
+        return cancelled
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
@@ -0,0 +1,104 @@
+import numpy as np
+from joblib import Parallel, delayed, effective_n_jobs
+
+from .model_training import build_model
+from .bias_metrices import group_confusion_counts, metrics_from_counts
+
+MITIGATION_METHODS = ("reweighing", "threshold", "exponentiated_gradient")
+DEFAULT_STRENGTHS = (0.25, 0.5, 0.75, 1.0)
+# Demographic parity difference allowed by exponentiated gradient at strength 0; strength 1 allows ~0
+EG_MAX_DIFFERENCE = 0.2
+EG_MIN_DIFFERENCE = 0.005
+
+
+def reweighing_weights(y, A, strength=1.0):
+    """
+    Kamiran & Calders reweighing: weight each (group, label) cell by P(group) * P(label) /
+    P(group, label), so that label and group look independent to the learner. `strength`
+    blends between uniform weights (0) and the full correction (1).
+    """
+    y = np.asarray(y, dtype=np.int64)
+    groups, codes = np.unique(np.asarray(A), return_inverse=True)
+    cells = codes * 2 + y
+    joint = np.bincount(cells, minlength=2 * len(groups)).reshape(len(groups), 2) / len(y)
+    expected = np.outer(joint.sum(axis=1), joint.sum(axis=0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        weights = np.where(joint > 0, expected / joint, 0.0).ravel()[cells]
+    return (1 - strength) + strength * weights
+
+
+def mitigated_predictions(method, strength, model_name, model_params, base_model,
+                          X_train, y_train, A_train, X_test, A_test, random_state=42):
+    """Test-set predictions of `model_name` mitigated with `method` at `strength` (0 to 1)."""
+    if method == "reweighing":
+        model = build_model(model_name, **(model_params or {}))
+        model.fit(X_train, y_train, sample_weight=reweighing_weights(y_train, A_train, strength))
+        return model.predict(X_test)
+
+    if method == "threshold":
+        from fairlearn.postprocessing import ThresholdOptimizer
+
+        # Per-group thresholds on the fitted model; a weaker strength applies them to that
+        # share of rows only, which traces the line between the two operating points
+        optimizer = ThresholdOptimizer(estimator=base_model, constraints="demographic_parity", prefit=True)
+        optimizer.fit(X_train, y_train, sensitive_features=A_train)
+        thresholded = optimizer.predict(X_test, sensitive_features=A_test, random_state=random_state)
+        use = np.random.default_rng(random_state).random(len(thresholded)) < strength
+        return np.where(use, thresholded, base_model.predict(X_test))
+
+    if method == "exponentiated_gradient":
+        from fairlearn.reductions import DemographicParity, ExponentiatedGradient
+
+        bound = max(EG_MIN_DIFFERENCE, (1 - strength) * EG_MAX_DIFFERENCE)
+        reduction = ExponentiatedGradient(
+            build_model(model_name, **(model_params or {})), DemographicParity(difference_bound=bound)
+        )
+        reduction.fit(X_train, y_train, sensitive_features=A_train)
+        return reduction.predict(X_test, random_state=random_state)
+
+    raise ValueError(f"Unknown mitigation method '{method}'; use one of {', '.join(MITIGATION_METHODS)}")
+
+
+def _sweep_point(method, strength, prepared, model_name, model_params, base_model, min_group_size):
+    X_train, X_test, y_train, y_test, A_train, A_test = prepared
+    point = {"method": method, "strength": strength}
+    try:
+        y_pred = mitigated_predictions(method, strength, model_name, model_params, base_model,
+                                       X_train, y_train, A_train, X_test, A_test)
+        groups, counts = group_confusion_counts(y_test, y_pred, A_test)
+        point["metrics"], _ = metrics_from_counts(groups, counts, min_group_size=min_group_size)
+    except ValueError as e:
+        point["error"] = str(e)
+    return point
+
+
+def mitigation_sweep(prepared, model_name, base_model, model_params=None, methods=MITIGATION_METHODS,
+                     strengths=DEFAULT_STRENGTHS, min_group_size=1, n_jobs=-1):
+    """
+    Fit every (method, strength) combination on one shared split and score it on the test set.
+    `prepared` is (X_train, X_test, y_train, y_test, A_train, A_test) and `base_model` the
+    unmitigated fit, which threshold optimization reuses. The fits run on `n_jobs` threads.
+    Returns one point per combination with its metrics, or an "error" if it could not be fitted.
+    """
+    tasks = [(method, float(strength)) for method in methods for strength in strengths]
+    return Parallel(n_jobs=min(effective_n_jobs(n_jobs), len(tasks)), prefer="threads")(
+        delayed(_sweep_point)(method, strength, prepared, model_name, model_params, base_model, min_group_size)
+        for method, strength in tasks
+    )
+
+
+def pareto_front(points, x="Disparate Impact", y="Accuracy"):
+    """
+    Indices of the points no other point beats on both `x` and `y` (higher is better for both),
+    ordered by `x`. Points with an error or a missing metric are skipped, and of points with the
+    same `x` and `y` only the first is kept.
+    """
+    scored = [
+        (i, p["metrics"][x], p["metrics"][y]) for i, p in enumerate(points)
+        if "metrics" in p and not np.isnan(p["metrics"][x]) and not np.isnan(p["metrics"][y])
+    ]
+    front = {}
+    for i, px, py in scored:
+        if not any(qx >= px and qy >= py and (qx > px or qy > py) for _, qx, qy in scored):
+            front.setdefault((px, py), i)
+    return [i for _, i in sorted(front.items(), key=lambda f: (f[0][0], -f[0][1]))]
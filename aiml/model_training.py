@@ -1,17 +1,139 @@
-from sklearn.linear_model import LogisticRegression
-from sklearn.ensemble import RandomForestClassifier
+import importlib
 
-def train_models(X_train, y_train):
+SEED_RANGE = (int, 0, 2 ** 32 - 1)
+
+# name -> (estimator import path, default hyperparameters,
+#          tunable hyperparameters -> (type, smallest and largest accepted value))
+# Estimators are imported on first use, so validating a form does not load scikit-learn.
+# The ranges keep client-chosen values within what the estimator accepts and what one request may cost.
+MODEL_REGISTRY = {
+    "LogisticRegression": (
+        "sklearn.linear_model.LogisticRegression",
+        {"max_iter": 2000},
+        {"max_iter": (int, 1, 10000), "C": (float, 1e-6, 1e6)},
+    ),
+    "RandomForest": (
+        "sklearn.ensemble.RandomForestClassifier",
+        {"n_estimators": 100, "random_state": 42},
+        {"n_estimators": (int, 1, 1000), "max_depth": (int, 1, 100), "random_state": SEED_RANGE},
+    ),
+    "HistGradientBoosting": (
+        # Bins the features once and uses every core through OpenMP
+        "sklearn.ensemble.HistGradientBoostingClassifier",
+        {"random_state": 42},
+        {"max_iter": (int, 1, 1000), "learning_rate": (float, 1e-4, 10.0), "max_depth": (int, 1, 100),
+         "max_leaf_nodes": (int, 2, 4096), "random_state": SEED_RANGE},
+    ),
+    "SGDLogistic": (
+        # Logistic regression fitted by stochastic gradient descent; also trains out of core
+        "sklearn.linear_model.SGDClassifier",
+        {"loss": "log_loss", "random_state": 42},
+        {"alpha": (float, 1e-8, 10.0), "max_iter": (int, 1, 10000), "random_state": SEED_RANGE},
+    ),
+}
+
+# Models with partial_fit, which train_incremental can fit one chunk at a time
+INCREMENTAL_MODELS = {"SGDLogistic"}
+# Models that fit on several cores when given n_jobs; the trees are fitted independently, so
+# results do not depend on it
+PARALLEL_MODELS = {"RandomForest"}
+
+
+def available_models():
+    return list(MODEL_REGISTRY)
+
+
+def validate_model_name(model_name):
+    if model_name not in MODEL_REGISTRY:
+        raise ValueError(f"Model '{model_name}' not available")
+    return model_name
+
+
+def parse_model_params(model_name, raw_params):
+    """
+    Keep only the hyperparameters the model accepts, cast them to the right type and check
+    their range, so bad values are rejected before the upload is read (ValueError).
+    Values usually come straight from a form, so empty strings are ignored.
+    """
+    validate_model_name(model_name)
+    tunable = MODEL_REGISTRY[model_name][2]
+    params = {}
+    for key, (cast, low, high) in tunable.items():
+        value = raw_params.get(key)
+        if value is None or value == "":
+            continue
+        try:
+            params[key] = cast(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid value for '{key}': {value!r}")
+        # JSON specs may hold numbers; int() would silently truncate 1.5
+        if isinstance(value, float) and params[key] != value:
+            raise ValueError(f"Invalid value for '{key}': {value!r}")
+        # Written so NaN fails too
+        if not low <= params[key] <= high:
+            raise ValueError(f"'{key}' must be between {low} and {high}, got {value!r}")
+    return params
+
+
+def _estimator_class(import_path):
+    module_name, _, class_name = import_path.rpartition(".")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def build_model(model_name, n_jobs=1, **params):
+    """The estimator with registry defaults overridden by `params`; PARALLEL_MODELS fit on `n_jobs` cores."""
+    validate_model_name(model_name)
+    estimator_path, defaults, _ = MODEL_REGISTRY[model_name]
+    if model_name in PARALLEL_MODELS:
+        params = {**params, "n_jobs": n_jobs}
+    return _estimator_class(estimator_path)(**{**defaults, **params})
+
+
+def train_model(model_name, X_train, y_train, n_jobs=1, **params):
+    model = build_model(model_name, n_jobs=n_jobs, **params)
+    model.fit(X_train, y_train)
+    return model
+
+
+def train_models(X_train, y_train, model_names=None, params=None, n_jobs=1):
+    """
+    Fit the requested models (all registered models by default) and return them by name.
+    `params` maps a model name to hyperparameters overriding the registry defaults. `n_jobs`
+    is the number of cores each fit may use; callers that already fit in parallel leave it at 1.
+    """
+    if model_names is None:
+        model_names = available_models()
+    elif isinstance(model_names, str):
+        model_names = [model_names]
+
+    # Fail before fitting anything if one of the names is unknown
+    for name in model_names:
+        validate_model_name(name)
+
+    params = params or {}
     models = {}
+    for name in model_names:
+        models[name] = train_model(name, X_train, y_train, n_jobs=n_jobs, **params.get(name, {}))
+
+    return models
+
 
-    # Logistic Regression
-    logreg = LogisticRegression(max_iter=2000)
-    logreg.fit(X_train, y_train)
-    models["LogisticRegression"] = logreg
-
-    # Random Forest
-    rf = RandomForestClassifier(n_estimators=100, random_state=42)
-    rf.fit(X_train, y_train)
-    models["RandomForest"] = rf
-    
-    return models
\ No newline at end of file
+def train_incremental(model_name, batches, classes, epochs=1, params=None):
+    """
+    Fit one of INCREMENTAL_MODELS with partial_fit, a batch at a time, so the training data
+    never has to be in memory at once. `batches(epoch)` returns a fresh iterable of (X, y) for
+    each of the `epochs` passes; `classes` lists every target value.
+    """
+    if model_name not in INCREMENTAL_MODELS:
+        raise ValueError(f"Model '{model_name}' cannot be trained out of core; "
+                         f"use one of {', '.join(sorted(INCREMENTAL_MODELS))}")
+    model = build_model(model_name, **(params or {}))
+    fitted = False
+    for epoch in range(epochs):
+        for X, y in batches(epoch):
+            if len(y):
+                model.partial_fit(X, y, classes=classes)
+                fitted = True
+    if not fitted:
+        raise ValueError("No training rows to fit the model on.")
+    return model
@@ -0,0 +1,276 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from .bias_metrices import group_confusion_counts, metrics_from_counts
+from .report import DI_RANGE, DPD_TOLERANCE
+
+
+def _add_counts(target, groups, counts, sign=1):
+    for group, row in zip(groups, counts):
+        current = target.get(group)
+        target[group] = row * sign if current is None else current + row * sign
+        if sign < 0 and not target[group].any():
+            del target[group]
+
+
+def _binary(values, name):
+    """`values` as int64 0/1; anything else is an error rather than being truncated (0.7 -> 0)."""
+    try:
+        array = np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be 0 or 1")
+    if array.ndim != 1 or not np.isin(array, (0, 1)).all():
+        raise ValueError(f"{name} must be 0 or 1")
+    return array.astype(np.int64)
+
+
+def window_metrics(counts, min_group_size=1):
+    """Headline metrics for {group: [tn, fp, fn, tp]}, or None while no group has enough rows."""
+    if not counts:
+        return None
+    groups = sorted(counts)
+    try:
+        metrics, _ = metrics_from_counts(np.array(groups), np.stack([counts[g] for g in groups]),
+                                         min_group_size=min_group_size)
+    except ValueError:
+        return None
+    return {name: float(value) for name, value in metrics.items()}
+
+
+def threshold_breaches(metrics, dpd_tolerance=DPD_TOLERANCE):
+    """The metrics outside the report thresholds, as {metric: {"value", "threshold"}}."""
+    breaches = {}
+    di = metrics.get("Disparate Impact")
+    if di is not None and not np.isnan(di) and (di < DI_RANGE[0] or di > DI_RANGE[1]):
+        breaches["Disparate Impact"] = {"value": di, "threshold": list(DI_RANGE)}
+    dpd = metrics.get("Demographic Parity Diff")
+    if dpd is not None and not np.isnan(dpd) and dpd > dpd_tolerance:
+        breaches["Demographic Parity Diff"] = {"value": dpd, "threshold": dpd_tolerance}
+    return breaches
+
+
+class FairnessMonitor:
+    """
+    Fairness metrics over a live stream of (prediction, label, group) records.
+
+    Time is cut into panes of `slide_seconds`. Each pane keeps one [tn, fp, fn, tp] row per
+    group, and running sums are kept for the sliding window (the last `window_seconds`) and for
+    the current tumbling window, so memory is fixed per group and no history is ever rescanned:
+    a record adds to its pane and both sums, and an expiring pane is subtracted. The sliding
+    window is evaluated every time a pane closes and raises an alert when Disparate Impact or
+    Demographic Parity crosses its threshold (and another when it recovers); every closed
+    tumbling window is kept in `windows` with its metrics and breaches. Records older than the
+    sliding window are counted as late and ignored. State lives in this process only.
+    """
+
+    def __init__(self, window_seconds=3600, slide_seconds=300, min_group_size=30,
+                 dpd_tolerance=DPD_TOLERANCE, max_history=48, on_alert=None):
+        if slide_seconds <= 0 or window_seconds % slide_seconds:
+            raise ValueError("window_seconds must be a positive multiple of slide_seconds")
+        self.window_seconds = window_seconds
+        self.slide_seconds = slide_seconds
+        self.min_group_size = min_group_size
+        self.dpd_tolerance = dpd_tolerance
+        self.on_alert = on_alert
+        self.windows = deque(maxlen=max_history)
+        self.alerts = deque(maxlen=max_history)
+        self.records = 0
+        self.late = 0
+        self._panes_per_window = window_seconds // slide_seconds
+        self._panes = {}
+        self._sliding = {}
+        self._tumbling = {}
+        self._pane = None
+        self._firing = {}
+        self._lock = threading.Lock()
+
+    def ingest(self, predictions, labels, groups, timestamps=None):
+        """Add a batch of records; `timestamps` (epoch seconds) default to now. Returns the number accepted."""
+        y_pred = _binary(predictions, "predictions")
+        y_true = _binary(labels, "labels")
+        groups = np.asarray(groups, dtype=object)
+        # str() would turn a missing group into a real "None" or "nan" group
+        if pd.isna(groups).any():
+            raise ValueError("group must not be null")
+        groups = groups.astype(str)
+        if not len(y_pred) == len(y_true) == len(groups):
+            raise ValueError("predictions, labels and groups must have the same length")
+        if timestamps is None:
+            timestamps = np.full(len(y_pred), time.time())
+        panes = np.floor(np.asarray(timestamps, dtype=np.float64) / self.slide_seconds).astype(np.int64)
+
+        accepted = 0
+        with self._lock:
+            for pane in np.unique(panes):
+                rows = panes == pane
+                if self._pane is not None and pane <= self._pane - self._panes_per_window:
+                    self.late += int(rows.sum())
+                    continue
+                self._advance(int(pane))
+                pane_groups, counts = group_confusion_counts(y_true[rows], y_pred[rows], groups[rows])
+                pane_groups = pane_groups.tolist()
+                _add_counts(self._panes.setdefault(int(pane), {}), pane_groups, counts)
+                _add_counts(self._sliding, pane_groups, counts)
+                if pane // self._panes_per_window == self._pane // self._panes_per_window:
+                    _add_counts(self._tumbling, pane_groups, counts)
+                accepted += int(rows.sum())
+            self.records += accepted
+        return accepted
+
+    def ingest_records(self, records):
+        """ingest() for a list of {"prediction", "label", "group", "timestamp"?} dicts."""
+        try:
+            predictions = [r["prediction"] for r in records]
+            labels = [r["label"] for r in records]
+            groups = [r["group"] for r in records]
+        except (KeyError, TypeError):
+            raise ValueError("Each record needs prediction, label and group")
+        if any(isinstance(g, list) and (not g or any(pd.isna(v) for v in g)) for g in groups):
+            raise ValueError("group must not be null")
+        groups = [" | ".join(map(str, g)) if isinstance(g, list) else g for g in groups]
+        timestamps = None
+        if any("timestamp" in r for r in records):
+            now = time.time()
+            timestamps = [r.get("timestamp", now) for r in records]
+        try:
+            return self.ingest(predictions, labels, groups, timestamps)
+        except TypeError:
+            raise ValueError("prediction, label and timestamp must be numbers")
+
+    def _advance(self, pane):
+        if self._pane is None:
+            self._pane = pane
+            return
+        if pane - self._pane > self._panes_per_window:
+            # Idle for longer than a window: close what is open, then start clean
+            self._close_pane()
+            self._close_tumbling(self._pane)
+            self._panes, self._sliding, self._tumbling = {}, {}, {}
+            self._pane = pane
+            return
+        while self._pane < pane:
+            self._close_pane()
+            self._pane += 1
+            expired = self._panes.pop(self._pane - self._panes_per_window, None)
+            if expired:
+                _add_counts(self._sliding, list(expired), np.stack(list(expired.values())), sign=-1)
+            if self._pane % self._panes_per_window == 0:
+                self._close_tumbling(self._pane - 1)
+
+    def _bounds(self, last_pane, n_panes):
+        end = (last_pane + 1) * self.slide_seconds
+        return end - n_panes * self.slide_seconds, end
+
+    def _close_pane(self):
+        # Evaluate the sliding window that ends with the current pane
+        metrics = window_metrics(self._sliding, self.min_group_size)
+        breaches = threshold_breaches(metrics, self.dpd_tolerance) if metrics else {}
+        start, end = self._bounds(self._pane, self._panes_per_window)
+        for name in set(breaches) | set(self._firing):
+            if name in breaches and name not in self._firing:
+                self._firing[name] = breaches[name]
+                self._alert("firing", name, breaches[name], start, end)
+            elif name not in breaches and metrics is not None:
+                self._alert("resolved", name, {"value": metrics.get(name), "threshold": self._firing.pop(name)["threshold"]},
+                            start, end)
+
+    def _close_tumbling(self, last_pane):
+        start, end = self._bounds(last_pane - last_pane % self._panes_per_window + self._panes_per_window - 1,
+                                  self._panes_per_window)
+        metrics = window_metrics(self._tumbling, self.min_group_size)
+        self.windows.append({
+            "start": start,
+            "end": end,
+            "records": int(sum(c.sum() for c in self._tumbling.values())),
+            "metrics": metrics,
+            "breaches": threshold_breaches(metrics, self.dpd_tolerance) if metrics else {},
+        })
+        self._tumbling = {}
+
+    def _alert(self, status, metric, breach, start, end):
+        alert = {"status": status, "metric": metric, **breach, "window_start": start, "window_end": end,
+                 "raised_at": time.time()}
+        self.alerts.append(alert)
+        if self.on_alert is not None:
+            self.on_alert(alert)
+
+    def snapshot(self):
+        """Current sliding and tumbling window metrics, closed windows and alerts."""
+        with self._lock:
+            sliding = {g: c.copy() for g, c in self._sliding.items()}
+            tumbling = {g: c.copy() for g, c in self._tumbling.items()}
+            pane = self._pane
+            state = {
+                "records": self.records,
+                "late": self.late,
+                "windows": list(self.windows),
+                "alerts": list(self.alerts),
+                "firing": {name: dict(breach) for name, breach in self._firing.items()},
+            }
+
+        def describe(counts, bounds):
+            metrics = window_metrics(counts, self.min_group_size)
+            return {
+                "start": bounds[0] if pane is not None else None,
+                "end": bounds[1] if pane is not None else None,
+                "groups": {g: int(c.sum()) for g, c in sorted(counts.items())},
+                "metrics": metrics,
+                "breaches": threshold_breaches(metrics, self.dpd_tolerance) if metrics else {},
+            }
+
+        current = pane if pane is not None else 0
+        return {
+            "window_seconds": self.window_seconds,
+            "slide_seconds": self.slide_seconds,
+            "sliding": describe(sliding, self._bounds(current, self._panes_per_window)),
+            "tumbling": describe(tumbling, self._bounds(
+                current - current % self._panes_per_window + self._panes_per_window - 1, self._panes_per_window)),
+            **state,
+        }
+
+
+def tail_records(path, monitor, stop_event=None, poll_interval=1.0, batch_size=10000, from_start=False):
+    """
+    Follow a JSON-lines prediction log (one record per line, as for ingest_records) and feed new
+    lines to `monitor` until `stop_event` is set. Survives truncation and rotation of the file;
+    malformed lines are skipped.
+    """
+    stop_event = stop_event or threading.Event()
+    fh, inode, buffer = None, None, ""
+    while not stop_event.is_set():
+        try:
+            stat = os.stat(path)
+            if fh is None or stat.st_ino != inode or stat.st_size < fh.tell():
+                if fh is not None:
+                    fh.close()
+                fh = open(path, "r", encoding="utf-8")
+                if inode is None and not from_start:
+                    fh.seek(0, os.SEEK_END)
+                inode, buffer = stat.st_ino, ""
+            chunk = fh.read(1 << 20)
+        except OSError:
+            chunk = ""
+        if not chunk:
+            stop_event.wait(poll_interval)
+            continue
+
+        *lines, buffer = (buffer + chunk).split("\n")
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+        for i in range(0, len(records), batch_size):
+            try:
+                monitor.ingest_records(records[i:i + batch_size])
+            except ValueError:
+                continue
+    if fh is not None:
+        fh.close()
@@ -0,0 +1,665 @@
+import json
+import os
+import threading
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed, effective_n_jobs
+
+from .preprocessing import (
+    preprocess_dataset, prepare_features, load_dataset, read_sample, apply_preprocessor,
+    iter_dataset_chunks, fit_streaming_preprocessor, preprocessor_columns
+)
+from .model_training import train_models, train_incremental
+from .bias_metrices import (
+    evaluate_bias, bootstrap_intervals, group_confusion_counts, metrics_from_counts, COUNT_COLUMNS
+)
+from .visualization import plot_selection_rates, plot_pareto_front, CHART_FORMATS
+from .report import generate_report, generate_comparison_report, DI_RANGE
+from .mitigation import mitigation_sweep, pareto_front, MITIGATION_METHODS, DEFAULT_STRENGTHS
+from .instrumentation import stage
+
+# Passes over the training rows for out-of-core models
+STREAMING_EPOCHS = 3
+
+try:
+    from fairlearn.metrics import MetricFrame
+except ImportError:
+    MetricFrame = None
+
+
+def to_native(obj):
+    """Convert numpy/pandas/Fairlearn objects to pure Python for JSON/templates"""
+
+    # --- Fairlearn MetricFrame ---
+    if MetricFrame is not None and isinstance(obj, MetricFrame):
+        return obj.by_group.to_dict()
+
+    # --- Pandas ---
+    if isinstance(obj, pd.Series):
+        return obj.to_dict()
+    if isinstance(obj, pd.DataFrame):
+        return obj.to_dict(orient="list")
+
+    # --- Numpy types ---
+    if isinstance(obj, (np.integer,)):
+        return int(obj)
+    if isinstance(obj, (np.floating,)):
+        return float(obj)
+    if isinstance(obj, (np.bool_,)):
+        return bool(obj)
+    if isinstance(obj, (np.ndarray,)):
+        return obj.tolist()
+
+    # --- Containers ---
+    if isinstance(obj, dict):
+        return {k: to_native(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple, set)):
+        return type(obj)(to_native(v) for v in obj)
+
+    return obj
+
+
+def _report_spec_path(report_path):
+    return os.path.splitext(report_path)[0] + ".json"
+
+
+def _build_report(report_args, report_path):
+    args = dict(report_args)
+    # Write to a temporary name so a download never sees a half-written PDF
+    tmp_path = f"{report_path}.{uuid.uuid4().hex[:8]}.tmp"
+    with stage("report"):
+        if args.pop("kind", None) == "comparison":
+            generate_comparison_report(output_path=tmp_path, **args)
+        else:
+            args["group_rates"] = {k: v for k, v in args["group_rates"]}
+            if args.get("sensitive_series") is not None:
+                args["sensitive_series"] = np.asarray(args["sensitive_series"])
+            generate_report(output_path=tmp_path, **args)
+    os.replace(tmp_path, report_path)
+    return report_path
+
+
+_report_locks = {}
+_report_locks_guard = threading.Lock()
+
+
+def _reset_report_locks():
+    global _report_locks, _report_locks_guard
+    _report_locks = {}
+    _report_locks_guard = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    # Analysis workers are forked from a threaded server, where another thread may hold these
+    os.register_at_fork(after_in_child=_reset_report_locks)
+
+
+def build_deferred_report(report_path):
+    """
+    Build a PDF that evaluate_and_report deferred, from the spec saved next to it. Safe to call
+    from several threads; the PDF is built once. Returns False when there is nothing to build.
+    """
+    with _report_locks_guard:
+        lock = _report_locks.setdefault(report_path, threading.Lock())
+    try:
+        with lock:
+            if os.path.exists(report_path):
+                return True
+            try:
+                with open(_report_spec_path(report_path), "r", encoding="utf-8") as fh:
+                    report_args = json.load(fh)
+            except OSError:
+                return False
+            _build_report(report_args, report_path)
+            return True
+    finally:
+        with _report_locks_guard:
+            _report_locks.pop(report_path, None)
+
+
+def evaluate_and_report(model, X_test, y_test, A_test, model_name, sensitive_name, report_dir, uid,
+                        group_labels=None, bootstrap_resamples=0, confidence=0.95, min_group_size=1,
+                        defer_report=False, n_jobs=-1):
+    """
+    Metrics, chart and PDF for a fitted model on a test set; the second half of run_analysis.
+    With `defer_report` only the report inputs are saved and the PDF is built later by
+    build_deferred_report (e.g. on first download). Bootstrap batches run on `n_jobs` threads.
+    """
+    with stage("evaluate", rows=len(y_test)):
+        metrics, group_rates, y_pred, group_metrics = evaluate_bias(
+            model, X_test, y_test, A_test, return_group_metrics=True, min_group_size=min_group_size
+        )
+    # generate_report only needs the distinct values in order of appearance
+    sensitive_values = pd.unique(np.asarray(A_test)) if group_labels is None else None
+    return report_evaluation(
+        metrics, group_rates, group_metrics, model_name, sensitive_name, report_dir, uid,
+        group_labels=group_labels, sensitive_values=sensitive_values,
+        bootstrap_resamples=bootstrap_resamples, confidence=confidence, defer_report=defer_report, n_jobs=n_jobs
+    )
+
+
+def report_evaluation(metrics, group_rates, group_metrics, model_name, sensitive_name, report_dir, uid,
+                      group_labels=None, sensitive_values=None, bootstrap_resamples=0, confidence=0.95,
+                      defer_report=False, n_jobs=-1):
+    """
+    Intervals, chart and PDF (or its deferred spec) for metrics that are already computed, as
+    returned by evaluate_bias or metrics_from_counts. Returns the analysis result dict.
+    """
+    metrics = to_native(metrics)
+    intervals = None
+    if bootstrap_resamples:
+        with stage("bootstrap"):
+            intervals = bootstrap_intervals(
+                group_metrics.loc[group_metrics["included"], COUNT_COLUMNS].to_numpy(),
+                n_resamples=bootstrap_resamples, confidence=confidence, n_jobs=n_jobs
+            )
+
+    with stage("chart"):
+        chart_path = plot_selection_rates(
+            None,
+            None,
+            save_path=os.path.join(report_dir, f"chart_{uid}.png"),
+            sensitive_mapping=group_labels,
+            rates=group_rates,
+            formats=CHART_FORMATS
+        )
+
+    report_path = os.path.join(report_dir, f"report_{uid}.pdf")
+    report_args = {
+        "metrics": metrics,
+        "chart_path": chart_path,
+        # Pairs rather than a dict so integer group keys survive a JSON round trip
+        "group_rates": [[to_native(k), float(v)] for k, v in group_rates.items()],
+        "sensitive_col": sensitive_name,
+        "chosen_model_name": model_name,
+        "sensitive_mapping": group_labels,
+        "sensitive_series": to_native(sensitive_values),
+        "metric_intervals": intervals,
+    }
+    report_spec_path = None
+    if defer_report:
+        report_spec_path = _report_spec_path(report_path)
+        with open(report_spec_path, "w", encoding="utf-8") as fh:
+            json.dump(to_native(report_args), fh)
+    else:
+        _build_report(report_args, report_path)
+
+    return {
+        "model_name": model_name,
+        "metrics": metrics,
+        "group_rates": to_native(group_rates),
+        "group_metrics": to_native(group_metrics.to_dict(orient="index")),
+        "group_labels": {str(k): v for k, v in group_labels.items()} if group_labels else None,
+        "chart_path": chart_path,
+        "chart_svg_path": os.path.splitext(chart_path)[0] + ".svg" if "svg" in CHART_FORMATS else None,
+        "report_path": report_path,
+        "report_spec_path": report_spec_path,
+        "intervals": intervals,
+    }
+
+
+def _remove_input(file_path):
+    try:
+        os.remove(file_path)
+    except OSError:
+        pass
+
+
+def run_analysis(file_path, target_col, sensitive_col, model_name, report_dir,
+                 uid=None, model_params=None, remove_input=False, cache=None, cache_key=None,
+                 chunksize=None, bootstrap_resamples=0, confidence=0.95, min_group_size=1,
+                 artifact_store=None, save_model=False, defer_report=False, schema=None, out_of_core=False,
+                 feature_dtype="float64", n_jobs=-1):
+    """
+    Run the full pipeline (preprocess -> train -> evaluate -> chart -> report) for one upload.
+    Returns plain Python data only, so the result can cross a process boundary or go to JSON.
+    When a ResultCache and key are given, the finished result is stored for later requests.
+    With `bootstrap_resamples` > 0 the result and the PDF include confidence intervals.
+    `sensitive_col` may be a list of columns for intersectional groups; groups with fewer than
+    `min_group_size` test rows are reported but left out of the metrics.
+    With `save_model` and an ArtifactStore the fitted model and preprocessing are saved and
+    `artifact_id` is returned. With `defer_report` the PDF is left for build_deferred_report.
+    `schema` (column -> dtype, e.g. from run_preview) skips dtype inference. `feature_dtype`
+    ("float64" or "float32") is the dtype of the feature matrix. `n_jobs` is the number of cores
+    the analysis may use (-1 = all). With `out_of_core` the work is handed to run_streaming_analysis.
+    """
+    if out_of_core:
+        return run_streaming_analysis(
+            file_path, target_col, sensitive_col, model_name, report_dir, uid=uid, model_params=model_params,
+            remove_input=remove_input, cache=cache, cache_key=cache_key, chunksize=chunksize or 100000,
+            bootstrap_resamples=bootstrap_resamples, confidence=confidence, min_group_size=min_group_size,
+            artifact_store=artifact_store, save_model=save_model, defer_report=defer_report, schema=schema,
+            feature_dtype=feature_dtype, n_jobs=n_jobs
+        )
+
+    uid = uid or str(uuid.uuid4())[:8]
+    try:
+        with stage("preprocess") as timing:
+            X_train, X_test, y_train, y_test, A_train, A_test, ingestion = preprocess_dataset(
+                file_path, target_col, sensitive_col, chunksize=chunksize, return_info=True, schema=schema,
+                dtype=feature_dtype
+            )
+            timing["rows"] = ingestion["rows_read"]
+        group_labels = ingestion.pop("sensitive_labels", None)
+        preprocessor = ingestion.pop("preprocessor")
+        sensitive_name = _sensitive_name(sensitive_col)
+
+        with stage("train", rows=len(X_train)):
+            models = train_models(X_train, y_train, model_names=[model_name],
+                                  params={model_name: model_params or {}}, n_jobs=n_jobs)
+        model = models[model_name]
+
+        result = evaluate_and_report(
+            model, X_test, y_test, A_test, model_name, sensitive_name, report_dir, uid,
+            group_labels=group_labels, bootstrap_resamples=bootstrap_resamples,
+            confidence=confidence, min_group_size=min_group_size, defer_report=defer_report, n_jobs=n_jobs
+        )
+        result["ingestion"] = ingestion
+
+        if save_model and artifact_store is not None:
+            result["artifact_id"] = artifact_store.save(model, preprocessor, {
+                "model_name": model_name,
+                "model_params": model_params or {},
+                "target_col": target_col,
+                "sensitive_col": sensitive_col,
+                "train_rows": len(X_train),
+                "metrics": result["metrics"],
+            })
+
+        if cache is not None and cache_key:
+            cache.put(cache_key, result)
+        return result
+    finally:
+        if remove_input:
+            _remove_input(file_path)
+
+
+def _test_mask(chunk_index, n_rows, test_size, random_state=42):
+    # Same rows for the same chunk on every pass, without keeping any row ids
+    return np.random.default_rng([random_state, chunk_index]).random(n_rows) < test_size
+
+
+def run_streaming_analysis(file_path, target_col, sensitive_col, model_name, report_dir, uid=None,
+                           model_params=None, remove_input=False, cache=None, cache_key=None,
+                           chunksize=100000, bootstrap_resamples=0, confidence=0.95, min_group_size=1,
+                           artifact_store=None, save_model=False, defer_report=False, schema=None,
+                           epochs=STREAMING_EPOCHS, test_size=0.3, feature_dtype="float64", n_jobs=-1):
+    """
+    run_analysis for files that do not fit in memory: the file is read `chunksize` rows at a time
+    on every pass and never loaded whole, and passes after the first read only the columns kept.
+    Preprocessing is fitted in two passes, an incremental model (see INCREMENTAL_MODELS) is
+    trained for `epochs` passes over the training rows, and a final pass accumulates per-group
+    confusion counts on the test rows. Each chunk is split into train and test rows with a
+    seeded mask. Returns the same result as run_analysis, plus
+    result["training"].
+    """
+    uid = uid or str(uuid.uuid4())[:8]
+    try:
+        with stage("preprocess") as timing:
+            preprocessor, ingestion = fit_streaming_preprocessor(
+                file_path, target_col, sensitive_col, chunksize=chunksize, schema=schema, dtype=feature_dtype
+            )
+            timing["rows"] = ingestion["rows_read"]
+        schema = ingestion.pop("schema")
+        rows = {"train": 0, "test": 0}
+
+        def split_chunks(split, epoch=0):
+            chunks = iter_dataset_chunks(file_path, chunksize=chunksize, schema=schema,
+                                         columns=preprocessor_columns(preprocessor))
+            for i, chunk in enumerate(chunks):
+                X, y, A, encoding = apply_preprocessor(chunk, preprocessor)
+                mask = _test_mask(i, len(chunk), test_size)
+                if split == "train":
+                    # Reshuffle each epoch; files are often sorted by date or outcome
+                    order = np.random.default_rng([epoch, i]).permutation(np.flatnonzero(~mask))
+                    if epoch == 0:
+                        rows["train"] += len(order)
+                    yield X[order], y[order]
+                else:
+                    rows["test"] += int(mask.sum())
+                    yield X[mask], y[mask], A[mask], encoding["sensitive_labels"]
+
+        with stage("train") as timing:
+            model = train_incremental(
+                model_name, lambda epoch: split_chunks("train", epoch),
+                classes=np.arange(len(preprocessor["target_classes"])), epochs=epochs, params=model_params
+            )
+            timing["rows"] = rows["train"] * epochs
+
+        with stage("evaluate") as timing:
+            counts = {}
+            group_labels = {}
+            for X, y, A, labels in split_chunks("test"):
+                if not len(y):
+                    continue
+                groups, chunk_counts = group_confusion_counts(y, model.predict(X), A)
+                for group, row in zip(groups.tolist(), chunk_counts):
+                    counts[group] = counts.get(group, 0) + row
+                group_labels.update(labels)
+            if not counts:
+                raise ValueError("No test rows to evaluate the model on.")
+            groups = np.array(sorted(counts))
+            metrics, group_metrics = metrics_from_counts(
+                groups, np.stack([counts[g] for g in groups]), min_group_size=min_group_size
+            )
+            group_rates = group_metrics.loc[group_metrics["included"], "selection_rate"].rename("selection_rate")
+            timing["rows"] = rows["test"]
+
+        result = report_evaluation(
+            metrics, group_rates, group_metrics, model_name, _sensitive_name(sensitive_col), report_dir, uid,
+            group_labels={g: group_labels[g] for g in groups.tolist()},
+            bootstrap_resamples=bootstrap_resamples, confidence=confidence, defer_report=defer_report,
+            n_jobs=n_jobs
+        )
+        result["ingestion"] = ingestion
+        result["training"] = {"out_of_core": True, "epochs": epochs, **{f"{k}_rows": v for k, v in rows.items()}}
+
+        if save_model and artifact_store is not None:
+            result["artifact_id"] = artifact_store.save(model, preprocessor, {
+                "model_name": model_name,
+                "model_params": model_params or {},
+                "target_col": target_col,
+                "sensitive_col": sensitive_col,
+                "train_rows": rows["train"],
+                "metrics": result["metrics"],
+            })
+
+        if cache is not None and cache_key:
+            cache.put(cache_key, result)
+        return result
+    finally:
+        if remove_input:
+            _remove_input(file_path)
+
+
+def run_preview(file_path, target_col, sensitive_col, model_name, report_dir, uid=None, model_params=None,
+                chunksize=None, sample_rows=20000, time_budget=5.0, bootstrap_resamples=500,
+                confidence=0.95, min_group_size=1, feature_dtype="float64", n_jobs=-1):
+    """
+    Quick approximate analysis on a stratified sample (by target and sensitive groups) drawn while
+    the file is read. Sampling stops reading after half of `time_budget` seconds so training and
+    evaluation fit in the rest. Bootstrap intervals on the sample give the error bounds. The PDF
+    is always deferred. result["preview"] describes the sample and holds the inferred schema, so
+    a later full run can reuse it.
+    """
+    uid = uid or str(uuid.uuid4())[:8]
+    start = time.perf_counter()
+    sensitive_cols = [sensitive_col] if isinstance(sensitive_col, str) else list(sensitive_col)
+
+    with stage("sample") as timing:
+        sample, sampling = read_sample(
+            file_path, [target_col, *sensitive_cols], sample_size=sample_rows,
+            chunksize=chunksize or 100000, time_budget=time_budget / 2
+        )
+        timing["rows"] = sampling["rows_read"]
+    with stage("preprocess", rows=len(sample)):
+        X_train, X_test, y_train, y_test, A_train, A_test, info = prepare_features(
+            sample, target_col, sensitive_col, dtype=feature_dtype
+        )
+    del sample
+
+    with stage("train", rows=len(X_train)):
+        models = train_models(X_train, y_train, model_names=[model_name], params={model_name: model_params or {}},
+                              n_jobs=n_jobs)
+    result = evaluate_and_report(
+        models[model_name], X_test, y_test, A_test, model_name, _sensitive_name(sensitive_col), report_dir, uid,
+        group_labels=info.get("sensitive_labels"), bootstrap_resamples=bootstrap_resamples,
+        confidence=confidence, min_group_size=min_group_size, defer_report=True, n_jobs=n_jobs
+    )
+
+    elapsed = time.perf_counter() - start
+    result["ingestion"] = {
+        "rows_read": sampling["rows_read"],
+        "rows_dropped": sampling["rows_dropped"],
+        "feature_changes": info["feature_changes"],
+    }
+    result["preview"] = {
+        "sample_rows": sampling["sample_rows"],
+        "strata": sampling["strata"],
+        "complete_scan": sampling["complete"],
+        "elapsed": round(elapsed, 3),
+        "time_budget": time_budget,
+        "within_budget": elapsed <= time_budget,
+        "schema": sampling["schema"],
+    }
+    return result
+
+
+def score_dataset(file_path, artifact_store, artifact_id, report_dir, uid=None, remove_input=False,
+                  chunksize=None, bootstrap_resamples=0, confidence=0.95, min_group_size=1,
+                  defer_report=False, n_jobs=-1):
+    """
+    Score a new dataset with a stored model and preprocessing, then compute bias metrics,
+    chart and report on all of its rows. Nothing is refitted. `n_jobs` cores are used.
+    """
+    uid = uid or str(uuid.uuid4())[:8]
+    try:
+        model, preprocessor, meta = artifact_store.load(artifact_id)
+        # Stored models keep the n_jobs they were fitted with
+        if "n_jobs" in model.get_params():
+            model.set_params(n_jobs=n_jobs)
+        with stage("preprocess") as timing:
+            df, ingestion = load_dataset(file_path, chunksize=chunksize, columns=preprocessor_columns(preprocessor))
+            X, y, A, encoding = apply_preprocessor(df, preprocessor)
+            timing["rows"] = ingestion["rows_read"]
+        del df
+
+        sensitive_cols = preprocessor["sensitive_cols"]
+        result = evaluate_and_report(
+            model, X, y, A, meta["model_name"], " x ".join(sensitive_cols), report_dir, uid,
+            group_labels=encoding["sensitive_labels"], bootstrap_resamples=bootstrap_resamples,
+            confidence=confidence, min_group_size=min_group_size, defer_report=defer_report, n_jobs=n_jobs
+        )
+        ingestion["unseen_categories"] = encoding["unseen_categories"]
+        result["ingestion"] = ingestion
+        result["artifact_id"] = artifact_id
+        return result
+    finally:
+        if remove_input:
+            _remove_input(file_path)
+
+
+def _sensitive_name(sensitive_col):
+    return sensitive_col if isinstance(sensitive_col, str) else " x ".join(sensitive_col)
+
+
+def _spec_label(spec):
+    return f"{spec['model_name']}: {spec['target_col']} by {_sensitive_name(spec['sensitive_col'])}"
+
+
+def _features_key(spec):
+    sensitive = spec["sensitive_col"]
+    return spec["target_col"], (sensitive,) if isinstance(sensitive, str) else tuple(sensitive)
+
+
+def _fit_key(spec):
+    return _features_key(spec), spec["model_name"], json.dumps(spec.get("model_params") or {}, sort_keys=True)
+
+
+def _run_spec(spec, prepared, report_dir, uid, bootstrap_resamples, confidence, min_group_size, n_jobs):
+    X_train, X_test, y_train, y_test, A_train, A_test, info = prepared
+    model_name = spec["model_name"]
+    with stage("train", rows=len(X_train)):
+        models = train_models(X_train, y_train, model_names=[model_name],
+                              params={model_name: spec.get("model_params") or {}}, n_jobs=n_jobs)
+    return evaluate_and_report(
+        models[model_name], X_test, y_test, A_test, model_name, _sensitive_name(spec["sensitive_col"]),
+        report_dir, uid, group_labels=info.get("sensitive_labels"), bootstrap_resamples=bootstrap_resamples,
+        confidence=confidence, min_group_size=min_group_size, defer_report=True, n_jobs=n_jobs
+    )
+
+
+def run_batch(file_path, specs, report_dir, uid=None, remove_input=False, cache=None, cache_keys=None,
+              chunksize=None, bootstrap_resamples=0, confidence=0.95, min_group_size=1,
+              defer_report=False, n_jobs=-1, feature_dtype="float64"):
+    """
+    Run several analyses of one dataset and build a single comparative report.
+
+    `specs` is a list of dicts with target_col, sensitive_col, model_name and model_params.
+    The file is read once, the encoding and split are shared by every spec with the same target
+    and sensitive columns, identical specs are fitted once, and the remaining fits run on
+    `n_jobs` threads, which share the cores between them. Specs found in the ResultCache
+    (`cache_keys` lines up with `specs`) are not rerun. A spec that fails gets an "error" entry
+    instead of failing the batch. The per-spec PDFs are always deferred; `defer_report` applies
+    to the comparative report.
+    """
+    uid = uid or str(uuid.uuid4())[:8]
+    cache_keys = cache_keys or [None] * len(specs)
+    results = [None] * len(specs)
+    try:
+        todo = []
+        for i, key in enumerate(cache_keys):
+            cached = cache.get(key) if cache is not None and key else None
+            if cached:
+                results[i] = {**cached, "cached": True}
+            else:
+                todo.append(i)
+
+        ingestion = None
+        if todo:
+            with stage("preprocess") as timing:
+                df, ingestion = load_dataset(file_path, chunksize=chunksize)
+                timing["rows"] = ingestion["rows_read"]
+
+                # One encoding and split per (target, sensitive columns)
+                prepared = {}
+                for i in todo:
+                    features_key = _features_key(specs[i])
+                    if features_key in prepared:
+                        continue
+                    try:
+                        prepared[features_key] = prepare_features(
+                            df, specs[i]["target_col"], specs[i]["sensitive_col"], info=ingestion,
+                            dtype=feature_dtype
+                        )
+                    except ValueError as e:
+                        prepared[features_key] = e
+                del df
+
+            # One fit per distinct spec
+            fits = {}
+            for i in todo:
+                fits.setdefault(_fit_key(specs[i]), []).append(i)
+
+            # Each of the parallel fits gets its share of the cores, not all of them
+            n_threads = min(effective_n_jobs(n_jobs), len(fits))
+            fit_n_jobs = max(1, effective_n_jobs(n_jobs) // n_threads)
+
+            def run_fit(n, indices):
+                spec = specs[indices[0]]
+                features = prepared[_features_key(spec)]
+                if isinstance(features, Exception):
+                    return {"error": str(features)}
+                try:
+                    return _run_spec(spec, features, report_dir, f"{uid}-{n}", bootstrap_resamples,
+                                     confidence, min_group_size, fit_n_jobs)
+                except ValueError as e:
+                    return {"error": str(e)}
+
+            outputs = Parallel(n_jobs=n_threads, prefer="threads")(
+                delayed(run_fit)(n, indices) for n, indices in enumerate(fits.values())
+            )
+            for indices, output in zip(fits.values(), outputs):
+                if "error" not in output:
+                    output["ingestion"] = dict(ingestion)
+                for i in indices:
+                    results[i] = {**output, "cached": False}
+                    if "error" not in output and cache is not None and cache_keys[i]:
+                        cache.put(cache_keys[i], output)
+
+        for spec, result in zip(specs, results):
+            result["spec"] = spec
+            result["label"] = _spec_label(spec)
+
+        succeeded = [r for r in results if "error" not in r]
+        if not succeeded:
+            raise ValueError("; ".join(f"{r['label']}: {r['error']}" for r in results))
+
+        report_path = os.path.join(report_dir, f"comparison_{uid}.pdf")
+        # Repeated specs share one fit (and chart), so they get one row
+        rows = {}
+        for r in succeeded:
+            rows.setdefault(r["chart_path"], {"label": r["label"], "metrics": r["metrics"],
+                                              "chart_path": r["chart_path"]})
+        report_args = {"kind": "comparison", "rows": list(rows.values())}
+        report_spec_path = None
+        if defer_report:
+            report_spec_path = _report_spec_path(report_path)
+            with open(report_spec_path, "w", encoding="utf-8") as fh:
+                json.dump(to_native(report_args), fh)
+        else:
+            _build_report(report_args, report_path)
+
+        return {
+            "results": results,
+            "report_path": report_path,
+            "report_spec_path": report_spec_path,
+            "ingestion": ingestion,
+        }
+    finally:
+        if remove_input:
+            _remove_input(file_path)
+
+
+def run_mitigation(file_path, target_col, sensitive_col, model_name, report_dir, uid=None, model_params=None,
+                   methods=MITIGATION_METHODS, strengths=DEFAULT_STRENGTHS, remove_input=False, cache=None,
+                   cache_key=None, chunksize=None, min_group_size=1, n_jobs=-1, feature_dtype="float64"):
+    """
+    Sweep bias mitigation methods (see aiml.mitigation) over constraint strengths for one model.
+
+    The file is read, encoded and split once and the unmitigated model is fitted once on `n_jobs`
+    cores; every (method, strength) fit reuses both and the fits run on `n_jobs` threads, one
+    core each. Returns the baseline metrics, every sweep point, the accuracy vs Disparate Impact
+    Pareto front (indices into "points", the baseline included) and its chart.
+    """
+    uid = uid or str(uuid.uuid4())[:8]
+    try:
+        with stage("preprocess") as timing:
+            X_train, X_test, y_train, y_test, A_train, A_test, ingestion = preprocess_dataset(
+                file_path, target_col, sensitive_col, chunksize=chunksize, return_info=True, dtype=feature_dtype
+            )
+            timing["rows"] = ingestion["rows_read"]
+        ingestion.pop("preprocessor")
+        group_labels = ingestion.pop("sensitive_labels", None)
+
+        with stage("train", rows=len(X_train)):
+            base_model = train_models(X_train, y_train, model_names=[model_name],
+                                      params={model_name: model_params or {}}, n_jobs=n_jobs)[model_name]
+        with stage("evaluate", rows=len(y_test)):
+            baseline, _, _ = evaluate_bias(base_model, X_test, y_test, A_test, min_group_size=min_group_size)
+
+        with stage("mitigate", rows=len(X_train) * len(methods) * len(strengths)):
+            points = [{"method": "baseline", "strength": 0.0, "metrics": baseline}] + mitigation_sweep(
+                (X_train, X_test, y_train, y_test, A_train, A_test), model_name, base_model,
+                model_params=model_params, methods=methods, strengths=strengths,
+                min_group_size=min_group_size, n_jobs=n_jobs
+            )
+        points = to_native(points)
+        front = pareto_front(points)
+
+        with stage("chart"):
+            chart_path = plot_pareto_front(
+                points, front, save_path=os.path.join(report_dir, f"pareto_{uid}.png"),
+                formats=CHART_FORMATS, x_threshold=DI_RANGE[0]
+            )
+
+        result = {
+            "model_name": model_name,
+            "baseline": to_native(baseline),
+            "sweep": {"methods": list(methods), "strengths": [float(s) for s in strengths]},
+            "points": points,
+            "pareto_front": front,
+            "group_labels": {str(k): v for k, v in group_labels.items()} if group_labels else None,
+            "chart_path": chart_path,
+            "chart_svg_path": os.path.splitext(chart_path)[0] + ".svg" if "svg" in CHART_FORMATS else None,
+            "ingestion": ingestion,
+        }
+        if cache is not None and cache_key:
+            cache.put(cache_key, result)
+        return result
+    finally:
+        if remove_input:
+            _remove_input(file_path)
@@ -1,36 +1,797 @@
+import os
+import re
+import time
+from contextlib import closing
+
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 from sklearn.preprocessing import LabelEncoder, StandardScaler
 from sklearn.model_selection import train_test_split
 
-def preprocess_dataset(dataset_path, target_col, sensitive_col, test_size=0.3):
-    df = pd.read_csv(dataset_path)
+NA_VALUES = ["?"]
+
+# Text columns with at least this share of distinct values are treated as identifiers
+ID_UNIQUE_RATIO = 0.95
+# Text columns with more distinct values than this are hashed into HASH_BUCKETS codes
+MAX_CATEGORIES = 1000
+HASH_BUCKETS = 256
+# Rows per StandardScaler.partial_fit call when fitting on a whole feature matrix
+SCALER_BLOCK_ROWS = 65536
+_ID_NAME = re.compile(r"(^|[_\s-])(id|uuid|key)$|^id[_\s-]", re.IGNORECASE)
+
+# File signatures of the columnar formats; anything else is read as CSV
+PARQUET_MAGIC = b"PAR1"
+ARROW_FILE_MAGIC = b"ARROW1"
+ARROW_STREAM_MAGIC = b"\xff\xff\xff\xff"
+
+
+def _rewind(source):
+    # Datasets may be paths or seekable file objects (e.g. a spooled upload) that are read twice
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return source
+
+
+def dataset_format(dataset_path):
+    """"parquet", "arrow" (IPC file or stream, which includes Feather v2) or "csv", from the first bytes."""
+    if hasattr(dataset_path, "read"):
+        head = _rewind(dataset_path).read(8)
+        dataset_path.seek(0)
+    else:
+        with open(dataset_path, "rb") as fh:
+            head = fh.read(8)
+    if head.startswith(PARQUET_MAGIC):
+        return "parquet"
+    if head.startswith(ARROW_FILE_MAGIC) or head.startswith(ARROW_STREAM_MAGIC):
+        return "arrow"
+    return "csv"
+
+
+def _is_local_path(dataset_path):
+    return isinstance(dataset_path, (str, os.PathLike))
+
+
+def _is_text(arrow_type):
+    return pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type)
+
+
+def _dictionary_columns(schema):
+    return [col for col, dtype in schema.items() if dtype == "category"]
+
+
+def _parquet_file(dataset_path, dictionary_cols=()):
+    # `dictionary_cols` are read straight from the dictionary pages as dictionary arrays
+    path = dataset_path if _is_local_path(dataset_path) else _rewind(dataset_path)
+    return pq.ParquetFile(path, memory_map=_is_local_path(dataset_path), read_dictionary=list(dictionary_cols))
+
+
+def _arrow_reader(dataset_path):
+    # Local files are memory-mapped, so record batches point into the page cache instead of being copied
+    source = pa.memory_map(dataset_path) if _is_local_path(dataset_path) else pa.PythonFile(_rewind(dataset_path), mode="r")
+    try:
+        return pa.ipc.open_file(source)
+    except pa.ArrowInvalid:
+        source.seek(0)
+        return pa.ipc.open_stream(source)
+
+
+def _iter_arrow_batches(dataset_path, chunksize, columns=None, dictionary_cols=()):
+    if dataset_format(dataset_path) == "parquet":
+        parquet = _parquet_file(dataset_path, dictionary_cols)
+        yield from parquet.iter_batches(batch_size=chunksize, columns=columns)
+        return
+    reader = _arrow_reader(dataset_path)
+    if isinstance(reader, pa.ipc.RecordBatchFileReader):
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+    else:
+        batches = iter(reader)
+    for batch in batches:
+        if columns is not None:
+            batch = batch.select(columns)
+        yield from pa.Table.from_batches([batch]).to_batches(max_chunksize=chunksize)
+
+
+def _arrow_to_frame(table, schema):
+    """
+    DataFrame from an Arrow table or batch. Text columns the schema marks as "category" become
+    pandas categoricals straight from their dictionary (plain text is dictionary-encoded first),
+    other text stays object, and NA_VALUES become missing.
+    """
+    if isinstance(table, pa.RecordBatch):
+        table = pa.Table.from_batches([table])
+    na_values = pa.array(NA_VALUES)
+    for i, field in enumerate(table.schema):
+        if _is_text(field.type):
+            column = table.column(i)
+            column = pc.if_else(pc.is_in(column, value_set=na_values), pa.scalar(None, field.type), column)
+            if schema.get(field.name) == "category":
+                column = pc.dictionary_encode(column)
+            table = table.set_column(i, field.name, column)
+    df = table.to_pandas(split_blocks=True)
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            missing = [value for value in NA_VALUES if value in df[col].cat.categories]
+            if missing:
+                df[col] = df[col].cat.remove_categories(missing)
+    return df
+
+
+class ColumnTypeError(ValueError):
+    """
+    A CSV chunk has text in columns the schema reads as numbers, which happens when the schema
+    was inferred from the first rows only. Readers that can start over retry with with_text().
+    """
+
+    def __init__(self, columns):
+        super().__init__(f"Non-numeric values in numeric column(s): {', '.join(columns)}")
+        self.columns = columns
+
+    def with_text(self, schema):
+        """`schema` with the offending columns read as text."""
+        return {**schema, **{col: "object" for col in self.columns}}
+
+
+def infer_schema(dataset_path, sample_rows=10000, max_category_ratio=0.5):
+    """
+    Column -> dtype as infer_csv_schema gives it. For Parquet and Arrow the types come from the
+    file's own schema, and only text columns are sampled to choose between category and object.
+    """
+    if dataset_format(dataset_path) == "csv":
+        return infer_csv_schema(dataset_path, sample_rows=sample_rows, max_category_ratio=max_category_ratio)
+
+    if dataset_format(dataset_path) == "parquet":
+        fields = _parquet_file(dataset_path).schema_arrow
+    else:
+        fields = _arrow_reader(dataset_path).schema
+    text_cols = [field.name for field in fields if _is_text(field.type)]
+    sample = next(_iter_arrow_batches(dataset_path, sample_rows, columns=text_cols), None) if text_cols else None
+
+    schema = {}
+    for field in fields:
+        if pa.types.is_dictionary(field.type):
+            schema[field.name] = "category"
+        elif _is_text(field.type):
+            values = sample.column(field.name).drop_null() if sample is not None else pa.array([], pa.string())
+            n_unique = len(pc.unique(values))
+            schema[field.name] = "category" if n_unique and n_unique <= max(1, max_category_ratio * len(values)) \
+                else "object"
+        elif pa.types.is_integer(field.type) or pa.types.is_floating(field.type) or pa.types.is_boolean(field.type):
+            schema[field.name] = np.dtype(field.type.to_pandas_dtype()).name
+        else:
+            schema[field.name] = "object"
+    return schema
+
+
+def infer_csv_schema(dataset_path, sample_rows=10000, max_category_ratio=0.5):
+    """
+    Guess a compact dtype per column from the first `sample_rows` rows.
+    Numeric columns are parsed as float64 (and downcast later), low-cardinality text becomes
+    `category`, and everything else stays `object`. A later row with text in a numeric column
+    makes the chunked readers raise ColumnTypeError.
+    """
+    sample = pd.read_csv(_rewind(dataset_path), nrows=sample_rows, na_values=NA_VALUES)
+    schema = {}
+    for col in sample.columns:
+        values = sample[col].dropna()
+        if values.empty:
+            schema[col] = "object"
+        elif pd.api.types.is_numeric_dtype(values):
+            schema[col] = "float64"
+        elif values.nunique() <= max(1, max_category_ratio * len(values)):
+            schema[col] = "category"
+        else:
+            schema[col] = "object"
+    return schema
+
+
+def _downcast_numeric(chunk):
+    for col in chunk.select_dtypes(include="number").columns:
+        values = chunk[col]
+        if (values % 1 == 0).all():
+            chunk[col] = pd.to_numeric(values, downcast="integer")
+        else:
+            # Only go to float32 when no precision is lost
+            as32 = values.astype(np.float32)
+            if np.array_equal(as32.astype(np.float64).to_numpy(), values.to_numpy(dtype=np.float64)):
+                chunk[col] = as32
+    return chunk
+
+
+def read_csv_chunked(dataset_path, chunksize=100000, schema=None, columns=None):
+    """
+    Read a CSV in chunks with explicit compact dtypes, treating '?' as missing at parse time
+    and dropping incomplete rows chunk by chunk. Returns (DataFrame, info) where info holds
+    the number of rows read and dropped.
+
+    Chunking bounds the parser's buffers and drops incomplete rows early, but the chunks are
+    concatenated, so the whole (compact) dataset is still loaded; files that do not fit in
+    memory need iter_csv_chunks (out-of-core training). When a later chunk has text in a
+    column inferred as numeric, the file is read again with that column as text.
+    """
+    schema = schema or infer_csv_schema(dataset_path)
+    info = {"rows_read": 0, "rows_dropped": 0}
+    try:
+        frames = list(iter_csv_chunks(dataset_path, chunksize=chunksize, schema=schema, info=info, columns=columns))
+    except ColumnTypeError as e:
+        return read_csv_chunked(dataset_path, chunksize=chunksize, schema=e.with_text(schema), columns=columns)
+
+    if not frames:
+        raise ValueError("Dataset has no complete rows after removing missing values.")
+
+    # Each chunk has its own categories; align them so concat keeps the category dtype
+    for col in [c for c, dtype in schema.items() if dtype == "category" and c in frames[0].columns]:
+        categories = sorted(set().union(*(f[col].cat.categories for f in frames)))
+        for f in frames:
+            f[col] = f[col].cat.set_categories(categories)
+
+    df = pd.concat(frames, ignore_index=True)
+    return df, info
+
+
+def _complete_rows(chunk, info, required=None):
+    before = len(chunk)
+    chunk.dropna(subset=required, inplace=True)
+    info["rows_read"] = info.get("rows_read", 0) + before
+    info["rows_dropped"] = info.get("rows_dropped", 0) + before - len(chunk)
+    return _downcast_numeric(chunk)
+
+
+def _text_columns(dataset_path, schema, skip_rows, n_rows):
+    """Columns `schema` reads as numbers that hold text in the given rows of a CSV."""
+    numeric = [col for col, dtype in schema.items() if dtype not in ("category", "object")]
+    rows = pd.read_csv(_rewind(dataset_path), skiprows=range(1, skip_rows + 1), nrows=n_rows, usecols=numeric,
+                       dtype=str, na_values=NA_VALUES)
+    return [col for col in numeric if (pd.to_numeric(rows[col], errors="coerce").isna() & rows[col].notna()).any()]
+
+
+def iter_csv_chunks(dataset_path, chunksize=100000, schema=None, info=None, columns=None, required=None):
+    """
+    Yield the complete rows of a CSV one compact-dtype chunk at a time, parsing only `columns`
+    if given; with `required`, rows only need values in those columns. Rows read and dropped
+    are added to `info` if given. Raises ColumnTypeError when a chunk has text in a column the
+    schema reads as numbers.
+    """
+    schema = schema or infer_csv_schema(dataset_path)
+    info = info if info is not None else {}
+    if columns is not None:
+        schema = {col: schema[col] for col in columns if col in schema}
+
+    # Closing the reader explicitly detaches it from file objects instead of closing them
+    with pd.read_csv(_rewind(dataset_path), dtype=schema, na_values=NA_VALUES, chunksize=chunksize,
+                     usecols=columns) as reader:
+        rows_before = 0
+        while True:
+            try:
+                chunk = next(reader)
+            except StopIteration:
+                break
+            except ValueError:
+                # Earlier chunks were already parsed as numbers, so the caller has to start over
+                text_columns = _text_columns(dataset_path, schema, rows_before, chunksize)
+                if not text_columns:
+                    raise
+                raise ColumnTypeError(text_columns) from None
+            rows_before += len(chunk)
+            chunk = _complete_rows(chunk, info, required)
+            if not chunk.empty:
+                yield chunk
+
+
+def iter_columnar_chunks(dataset_path, chunksize=100000, schema=None, info=None, columns=None, required=None):
+    """
+    iter_csv_chunks for Parquet and Arrow IPC files: record batches of up to `chunksize` rows,
+    holding only `columns` if given, with the schema's category columns kept dictionary-encoded.
+    """
+    schema = schema or infer_schema(dataset_path)
+    info = info if info is not None else {}
+    batches = _iter_arrow_batches(dataset_path, chunksize, columns=columns, dictionary_cols=_dictionary_columns(schema))
+    for batch in batches:
+        chunk = _complete_rows(_arrow_to_frame(batch, schema), info, required)
+        if not chunk.empty:
+            yield chunk
+
+
+def iter_dataset_chunks(dataset_path, chunksize=100000, schema=None, info=None, columns=None, required=None):
+    """Complete rows of a CSV, Parquet or Arrow file one chunk at a time (see iter_csv_chunks)."""
+    if dataset_format(dataset_path) == "csv":
+        return iter_csv_chunks(dataset_path, chunksize=chunksize, schema=schema, info=info, columns=columns,
+                               required=required)
+    return iter_columnar_chunks(dataset_path, chunksize=chunksize, schema=schema, info=info, columns=columns,
+                                required=required)
+
+
+def read_columnar(dataset_path, columns=None, schema=None):
+    """
+    Load a Parquet or Arrow IPC file (memory-mapped when it is a local path), reading only
+    `columns` if given, and drop incomplete rows. The schema's category columns arrive as
+    categoricals built from the file's dictionaries. Returns (DataFrame, info) like read_csv_chunked.
+    """
+    schema = schema or infer_schema(dataset_path)
+    if dataset_format(dataset_path) == "parquet":
+        table = _parquet_file(dataset_path, _dictionary_columns(schema)).read(columns=columns)
+    else:
+        table = _arrow_reader(dataset_path).read_all()
+        if columns is not None:
+            table = table.select(columns)
+    info = {"rows_read": 0, "rows_dropped": 0}
+    df = _complete_rows(_arrow_to_frame(table, schema), info)
+    del table
+    if df.empty:
+        raise ValueError("Dataset has no complete rows after removing missing values.")
+    return df.reset_index(drop=True), info
+
+
+def _stratum_quotas(counts, sample_size):
+    """
+    Rows each stratum keeps of a `sample_size` sample: proportional to `counts` by the largest
+    remainder method, but at least one from every non-empty stratum, so rare target/group
+    combinations are never left out. Their rows come out of the largest strata; the total only
+    exceeds `sample_size` when there are more strata than that.
+    """
+    counts = counts[counts > 0]
+    ideal = sample_size * counts / counts.sum()
+    quota = np.maximum(np.floor(ideal), 1).astype(np.int64)
+    spare = sample_size - int(quota.sum())
+    if spare > 0:
+        # Strata raised to one row are already over their share
+        remainder = (ideal - np.floor(ideal)).where(ideal >= 1, -1.0)
+        quota.iloc[np.argsort(-remainder.to_numpy(), kind="stable")[:spare]] += 1
+    elif spare < 0:
+        excess = (quota - ideal).where(quota > 1, -np.inf)
+        order = np.argsort(-excess.to_numpy(), kind="stable")[:-spare]
+        quota.iloc[order[np.isfinite(excess.to_numpy()[order])]] -= 1
+    return quota
+
+
+def read_sample(dataset_path, strata_cols, sample_size=20000, chunksize=100000, schema=None,
+                time_budget=None, random_state=42):
+    """
+    Stratified random sample of the complete rows of a CSV, Parquet or Arrow file, drawn in one
+    chunked pass.
+
+    Every row gets a uniform random key and each stratum (combination of `strata_cols` values)
+    keeps the rows with the smallest keys seen so far, which is reservoir sampling done a chunk
+    at a time. At the end each stratum keeps a share of `sample_size` proportional to its row
+    count (see _stratum_quotas), so per-group rates stay unbiased and no group is lost. Reading
+    stops early once `time_budget` seconds have passed; info["complete"] says whether the whole
+    file was scanned.
+    Returns (sample, info) with the same counters as read_csv_chunked plus the schema used.
+    """
+    start = time.perf_counter()
+    schema = schema or infer_schema(dataset_path)
+    rng = np.random.default_rng(random_state)
+    reservoir = None
+    counts = pd.Series(dtype=np.int64)
+    info = {"rows_read": 0, "rows_dropped": 0}
+    complete = True
+
+    try:
+        with closing(iter_dataset_chunks(dataset_path, chunksize=chunksize, schema=schema, info=info)) as chunks:
+            for chunk in chunks:
+                # Hashing the strata values gives one stable key per stratum whatever the chunk dtypes
+                chunk["_stratum"] = pd.util.hash_pandas_object(chunk[strata_cols], index=False).to_numpy()
+                chunk["_key"] = rng.random(len(chunk))
+                counts = counts.add(chunk["_stratum"].value_counts(), fill_value=0)
+                pool = chunk if reservoir is None else pd.concat([reservoir, chunk], ignore_index=True)
+                reservoir = pool.sort_values("_key").groupby("_stratum", sort=False).head(sample_size)
+                if time_budget is not None and time.perf_counter() - start > time_budget:
+                    complete = False
+                    break
+    except ColumnTypeError as e:
+        if time_budget is not None:
+            time_budget = max(0.0, time_budget - (time.perf_counter() - start))
+        return read_sample(dataset_path, strata_cols, sample_size=sample_size, chunksize=chunksize,
+                           schema=e.with_text(schema), time_budget=time_budget, random_state=random_state)
+
+    if reservoir is None:
+        raise ValueError("Dataset has no complete rows after removing missing values.")
+
+    quota = _stratum_quotas(counts, sample_size)
+    rank = reservoir.groupby("_stratum", sort=False).cumcount()
+    sample = reservoir[rank.to_numpy() < reservoir["_stratum"].map(quota).to_numpy()]
+    sample = sample.drop(columns=["_stratum", "_key"]).reset_index(drop=True)
+
+    # Chunks with different category sets concatenate to object; restore compact dtypes
+    for col in [c for c, dtype in schema.items() if dtype == "category"]:
+        sample[col] = sample[col].astype("category")
+        sample[col] = sample[col].cat.set_categories(sorted(sample[col].cat.categories))
+
+    return _downcast_numeric(sample), {
+        **info,
+        "sample_rows": len(sample),
+        "strata": len(counts),
+        "complete": complete,
+        "schema": schema,
+    }
+
+
+def load_dataset(dataset_path, chunksize=None, schema=None, columns=None):
+    """
+    Load a CSV, Parquet or Arrow IPC file (a path or a seekable binary file object) and drop
+    incomplete rows, reading only `columns` if given. CSVs use chunked, dtype-aware reading when
+    `chunksize` is set, with `schema` (column -> dtype, e.g. from an earlier preview) instead of
+    inferring one; columnar files are always read whole, as they are already typed.
+    """
+    if dataset_format(dataset_path) != "csv":
+        return read_columnar(dataset_path, columns=columns, schema=schema)
+    if chunksize:
+        return read_csv_chunked(dataset_path, chunksize=chunksize, schema=schema, columns=columns)
+
+    df = pd.read_csv(_rewind(dataset_path), usecols=columns)
+    rows_read = len(df)
     df = df.replace('?', pd.NA).dropna()
+    return df, {"rows_read": rows_read, "rows_dropped": rows_read - len(df)}
+
+
+def _sorted_categories(values):
+    # Only the categories that occur, in sorted order, so the codes match LabelEncoder's
+    values = values.cat.remove_unused_categories()
+    if not values.cat.categories.is_monotonic_increasing:
+        values = values.cat.reorder_categories(values.cat.categories.sort_values())
+    return values
+
+
+def _label_encode(values):
+    """
+    (classes, codes) as LabelEncoder gives them. Categorical columns are encoded from their
+    categories and codes, without going back to one Python object per row.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = _sorted_categories(values)
+        return np.asarray(values.cat.categories), values.cat.codes.to_numpy().astype(np.int64)
+    encoder = LabelEncoder()
+    codes = encoder.fit_transform(values)
+    return encoder.classes_, codes
+
+
+def encode_sensitive(df, sensitive_cols, classes=None):
+    """
+    Encode one or more sensitive columns into a single integer group key.
+
+    With several columns each one is label-encoded and the codes are combined in mixed radix
+    (key = ((c1 * k2) + c2) * k3 + c3 ...), so every intersection gets one integer without a
+    groupby per combination. Returns (keys, labels) where labels maps each key that actually
+    occurs to a readable "value1 | value2 | ..." string. Pass the sorted `classes` of each
+    column to get the same keys for every chunk of a file.
+    """
+    if isinstance(sensitive_cols, str):
+        sensitive_cols = [sensitive_cols]
+
+    if classes is None:
+        classes, codes = zip(*(_label_encode(df[col]) for col in sensitive_cols))
+    else:
+        codes = [_encode_with_classes(df[col], col_classes) for col, col_classes in zip(sensitive_cols, classes)]
+        for col, col_codes in zip(sensitive_cols, codes):
+            if (col_codes < 0).any():
+                raise ValueError(f"Sensitive column '{col}' has values that were not seen when fitting.")
+
+    n_cells = 1
+    for col_classes in classes:
+        n_cells *= len(col_classes)
+    if n_cells >= 2 ** 62:
+        raise ValueError("Too many sensitive value combinations to index.")
+
+    keys = np.zeros(len(df), dtype=np.int64)
+    for col_classes, col_codes in zip(classes, codes):
+        keys = keys * len(col_classes) + col_codes
+
+    # Decode only the combinations that occur; empty cells never get a label
+    present = np.unique(keys)
+    remainder = present.copy()
+    parts = []
+    for col_classes in reversed(classes):
+        parts.append(col_classes[remainder % len(col_classes)])
+        remainder //= len(col_classes)
+    parts.reverse()
+
+    labels = {
+        int(key): " | ".join(str(part[i]) for part in parts)
+        for i, key in enumerate(present)
+    }
+    return keys, labels
+
+
+def preprocess_dataset(dataset_path, target_col, sensitive_col, test_size=0.3,
+                       chunksize=None, return_info=False, schema=None, dtype=np.float64):
+    df, info = load_dataset(dataset_path, chunksize=chunksize, schema=schema)
+    *splits, info = prepare_features(df, target_col, sensitive_col, test_size=test_size, info=info, dtype=dtype)
+    if return_info:
+        return (*splits, info)
+    return splits
+
+
+def profile_columns(X, id_unique_ratio=ID_UNIQUE_RATIO, max_categories=MAX_CATEGORIES, columns=None):
+    """
+    Find feature columns that would only add noise or cost: constant columns, identifiers (text
+    that is (nearly) unique per row, or unique integers with an ID-like name) and text with more
+    than `max_categories` distinct values. Only `columns` are checked if given, so the features
+    can be profiled in place. Returns {column: "constant" | "id" | "hash"}.
+    """
+    n_rows = len(X)
+    actions = {}
+    for col in (X.columns if columns is None else columns):
+        values = X[col]
+        n_unique = values.nunique(dropna=True)
+        is_text = isinstance(values.dtype, pd.CategoricalDtype) or values.dtype == object
+        if n_unique <= 1:
+            actions[col] = "constant"
+        elif is_text and n_rows > 1 and n_unique >= id_unique_ratio * n_rows:
+            actions[col] = "id"
+        elif (pd.api.types.is_integer_dtype(values) or pd.api.types.is_float_dtype(values)) \
+                and n_unique == n_rows and _ID_NAME.search(str(col)) and (values % 1 == 0).all():
+            actions[col] = "id"
+        elif is_text and n_unique > max_categories:
+            actions[col] = "hash"
+    return actions
+
+
+def _hash_codes(values, buckets):
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Hash each category once and look the rows up by code
+        return _hash_codes(pd.Series(values.cat.categories), buckets)[values.cat.codes.to_numpy()]
+    # pandas' hash is seeded with a fixed key, so the codes are stable across runs and processes
+    hashed = pd.util.hash_pandas_object(values.astype(str), index=False).to_numpy()
+    return (hashed % np.uint64(buckets)).astype(np.int32)
+
+
+def _feature_matrix(n_rows, columns, dtype):
+    # Row-major, so a block of rows (one side of the split) is itself a contiguous array
+    return np.empty((n_rows, len(columns)), dtype=dtype, order="C")
+
+
+def _scale_in_place(X, scaler, columns, numeric_columns, fit=False):
+    if list(numeric_columns) == list(columns):
+        if fit:
+            # fit() centres a temporary copy of X; block by block that copy stays small
+            for start in range(0, len(X), SCALER_BLOCK_ROWS):
+                scaler.partial_fit(X[start:start + SCALER_BLOCK_ROWS])
+        scaler.transform(X, copy=False)
+        return
+    idx = [columns.index(col) for col in numeric_columns]
+    if idx:
+        if fit:
+            scaler.fit(X[:, idx])
+        X[:, idx] = scaler.transform(X[:, idx])
+
+
+def prepare_features(df, target_col, sensitive_col, test_size=0.3, info=None, dtype=np.float64):
+    """
+    Encode, scale and split an already loaded dataset; `df` is not modified, so one loaded
+    frame can serve several target/sensitive combinations.
+
+    The features are written column by column into one C-ordered `dtype` matrix (float32 halves
+    its size), with the rows already in split order, and scaled in place. X_train and X_test are
+    views of that matrix, not copies.
+    Returns (X_train, X_test, y_train, y_test, A_train, A_test, info).
+    """
+    info = dict(info or {})
+
+    # One sensitive column, or a list of them for intersectional groups
+    sensitive_cols = [sensitive_col] if isinstance(sensitive_col, str) else list(sensitive_col)
 
     # Check columns exist
     if target_col not in df.columns:
         raise ValueError(f"Target column '{target_col}' not found in dataset.")
-    if sensitive_col not in df.columns:
-        raise ValueError(f"Sensitive column '{sensitive_col}' not found in dataset.")
+    for col in sensitive_cols:
+        if col not in df.columns:
+            raise ValueError(f"Sensitive column '{col}' not found in dataset.")
 
     # Encode target column to 0/1
-    le_target = LabelEncoder()
-    y = le_target.fit_transform(df[target_col])
+    target_classes, y = _label_encode(df[target_col])
+
+    # Encode sensitive column(s) to integers; the labels map each code back to its value(s)
+    # straight from the encoded classes
+    A, info["sensitive_labels"] = encode_sensitive(df, sensitive_cols)
+
+    # Features are every other column, leaving out constant and identifier columns
+    feature_columns = [col for col in df.columns if col not in (target_col, *sensitive_cols)]
+    actions = profile_columns(df, columns=feature_columns)
+    dropped = {col: reason for col, reason in actions.items() if reason in ("constant", "id")}
+    hashed = {col: HASH_BUCKETS for col, reason in actions.items() if reason == "hash"}
+    feature_columns = [col for col in feature_columns if col not in dropped]
+    info["feature_changes"] = {"dropped": dropped, "hashed": hashed}
+
+    # Split row indices, not frames: rows are written train first, so each side is a slice
+    train_idx, test_idx = train_test_split(np.arange(len(df)), test_size=test_size, random_state=42)
+    order = np.concatenate([train_idx, test_idx])
+    n_train = len(train_idx)
+
+    # Encode categorical features as compact category codes (categories are sorted, so the codes
+    # match what LabelEncoder would produce); very high-cardinality text is hashed instead
+    categories = {}
+    X = _feature_matrix(len(df), feature_columns, dtype)
+    for j, col in enumerate(feature_columns):
+        values = df[col]
+        if col in hashed:
+            values = _hash_codes(values, hashed[col])
+        elif isinstance(values.dtype, pd.CategoricalDtype) or values.dtype == object:
+            values = _sorted_categories(values) if isinstance(values.dtype, pd.CategoricalDtype) \
+                else values.astype("category")
+            categories[col] = np.asarray(values.cat.categories)
+            values = values.cat.codes.to_numpy()
+        else:
+            values = values.to_numpy()
+        X[:, j] = values[order]
+
+    # Scale every feature (category codes included) in place
+    scaler = StandardScaler()
+    _scale_in_place(X, scaler, feature_columns, feature_columns, fit=True)
+
+    # Everything needed to turn a new file into the same feature matrix (see apply_preprocessor)
+    info["preprocessor"] = {
+        "target_col": target_col,
+        "sensitive_cols": sensitive_cols,
+        "target_classes": target_classes,
+        "feature_columns": feature_columns,
+        "categories": categories,
+        "hashed_columns": hashed,
+        "numeric_columns": list(feature_columns),
+        "scaler": scaler,
+        "dtype": np.dtype(dtype).name,
+    }
+
+    y, A = y[order], A[order]
+    return X[:n_train], X[n_train:], y[:n_train], y[n_train:], A[:n_train], A[n_train:], info
+
+
+def _encode_with_classes(values, classes):
+    # Codes against the classes seen at fit time; unseen values become -1
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Recode the categories once and look the rows up by code
+        codes = values.cat.codes.to_numpy()
+        lookup = _encode_with_classes(pd.Series(values.cat.categories), classes)
+        return np.where(codes >= 0, lookup[codes], -1)
+    if classes.dtype.kind in "OUS":
+        values = values.astype(str)
+    return pd.Categorical(values, categories=classes).codes
+
+
+def preprocessor_columns(preprocessor):
+    """The columns apply_preprocessor reads; the rest of a file can be left unread."""
+    return [preprocessor["target_col"], *preprocessor["sensitive_cols"], *preprocessor["feature_columns"]]
+
+
+def apply_preprocessor(df, preprocessor):
+    """
+    Encode and scale a new dataset with the encoders and scaler fitted by preprocess_dataset
+    (or fit_streaming_preprocessor) into a feature matrix of the same dtype and column order.
+    Returns (X, y, A, info): unseen category values are encoded
+    as -1 and counted in info. The sensitive groups are re-indexed from this dataset, as they
+    are not model features, unless the preprocessor fixes their classes.
+    """
+    target_col = preprocessor["target_col"]
+    sensitive_cols = preprocessor["sensitive_cols"]
+    for col in preprocessor_columns(preprocessor):
+        if col not in df.columns:
+            raise ValueError(f"Column '{col}' not found in dataset.")
+
+    y = _encode_with_classes(df[target_col], preprocessor["target_classes"])
+    if (y < 0).any():
+        raise ValueError(f"Target column '{target_col}' has values the model was not trained on.")
+
+    A, sensitive_labels = encode_sensitive(df, sensitive_cols, classes=preprocessor.get("sensitive_classes"))
+
+    feature_columns = preprocessor["feature_columns"]
+    hashed = preprocessor.get("hashed_columns", {})
+    # Preprocessors saved before the dtype was recorded built float64 matrices
+    X = _feature_matrix(len(df), feature_columns, preprocessor.get("dtype", "float64"))
+    unseen = {}
+    for j, col in enumerate(feature_columns):
+        if col in hashed:
+            X[:, j] = _hash_codes(df[col], hashed[col])
+        elif col in preprocessor["categories"]:
+            codes = _encode_with_classes(df[col], preprocessor["categories"][col])
+            n_unseen = int((codes < 0).sum())
+            if n_unseen:
+                unseen[col] = n_unseen
+            X[:, j] = codes
+        else:
+            X[:, j] = df[col].to_numpy()
+
+    if preprocessor["scaler"] is not None:
+        _scale_in_place(X, preprocessor["scaler"], feature_columns, preprocessor["numeric_columns"])
+
+    return X, y.astype(np.int64), A, {"sensitive_labels": sensitive_labels, "unseen_categories": unseen}
+
+
+def fit_streaming_preprocessor(dataset_path, target_col, sensitive_col, chunksize=100000, schema=None,
+                               dtype=np.float64):
+    """
+    Fit the same preprocessing as prepare_features without loading the file: one chunked pass
+    collects the target, sensitive and category values, and a second one fits the scaler on the
+    encoded chunks. Identifiers are spotted in the first chunk; constant and high-cardinality
+    columns are decided over the whole file. Later passes read only the columns kept, so every
+    pass drops the rows missing a value in any column but the identifiers, and a column with
+    missing values is never dropped as constant. Returns (preprocessor, info) for apply_preprocessor,
+    with the sensitive classes fixed so every chunk gets the same group keys and `dtype` as the
+    dtype of the feature matrices it builds.
+    """
+    sensitive_cols = [sensitive_col] if isinstance(sensitive_col, str) else list(sensitive_col)
+    schema = schema or infer_schema(dataset_path)
+    for col in [target_col, *sensitive_cols]:
+        if col not in schema:
+            kind = "Target" if col == target_col else "Sensitive"
+            raise ValueError(f"{kind} column '{col}' not found in dataset.")
 
-    # Encode sensitive column to integers
-    le_sensitive = LabelEncoder()
-    A = le_sensitive.fit_transform(df[sensitive_col])
+    info = {"rows_read": 0, "rows_dropped": 0}
+    target_values = set()
+    sensitive_values = {col: set() for col in sensitive_cols}
+    text_values = {}
+    numeric_range = {}
+    dropped = {}
+    hashed = {}
+    missing = set()
+    required = None
+    try:
+        # Rows are filtered here rather than by the reader, as the identifiers are not known yet
+        for chunk in iter_dataset_chunks(dataset_path, chunksize=chunksize, schema=schema, info={}, required=[]):
+            missing.update(chunk.columns[chunk.isna().any()])
+            candidates = [col for col in chunk.columns if col not in (target_col, *sensitive_cols)]
+            if required is None:
+                actions = profile_columns(chunk.dropna(), columns=candidates)
+                dropped = {col: reason for col, reason in actions.items() if reason == "id"}
+                required = [col for col in chunk.columns if col not in dropped]
+            chunk = _complete_rows(chunk, info, required)
+            if chunk.empty:
+                continue
+            target_values.update(chunk[target_col].unique())
+            for col in sensitive_cols:
+                sensitive_values[col].update(chunk[col].unique())
+            for col in candidates:
+                if col in dropped:
+                    continue
+                values = chunk[col]
+                if isinstance(values.dtype, pd.CategoricalDtype) or values.dtype == object:
+                    if col not in hashed:
+                        seen = text_values.setdefault(col, set())
+                        seen.update(values.unique())
+                        if len(seen) > MAX_CATEGORIES:
+                            hashed[col] = HASH_BUCKETS
+                            del text_values[col]
+                else:
+                    low, high = numeric_range.get(col, (np.inf, -np.inf))
+                    numeric_range[col] = (min(low, values.min()), max(high, values.max()))
+    except ColumnTypeError as e:
+        # The later passes (and run_streaming_analysis) use the corrected schema from info["schema"]
+        return fit_streaming_preprocessor(dataset_path, target_col, sensitive_col, chunksize=chunksize,
+                                          schema=e.with_text(schema), dtype=dtype)
 
-    # Separate features
-    X = df.drop(columns=[target_col, sensitive_col])
+    if not target_values:
+        raise ValueError("Dataset has no complete rows after removing missing values.")
+    for col, values in text_values.items():
+        if len(values) <= 1 and col not in missing:
+            dropped[col] = "constant"
+    for col, (low, high) in numeric_range.items():
+        if low == high and col not in missing:
+            dropped[col] = "constant"
 
-    # Encode categorical features
-    for col in X.select_dtypes(include=["object"]).columns:
-        le = LabelEncoder()
-        X[col] = le.fit_transform(X[col])
+    feature_columns = [c for c in schema if c not in (target_col, *sensitive_cols) and c not in dropped]
+    if not feature_columns:
+        raise ValueError("No feature columns left after removing identifiers and constants.")
+    preprocessor = {
+        "target_col": target_col,
+        "sensitive_cols": sensitive_cols,
+        "sensitive_classes": [np.array(sorted(sensitive_values[col])) for col in sensitive_cols],
+        "target_classes": np.array(sorted(target_values)),
+        "feature_columns": feature_columns,
+        "categories": {col: np.array(sorted(text_values[col])) for col in feature_columns if col in text_values},
+        "hashed_columns": hashed,
+        # Category codes are scaled too, as in prepare_features
+        "numeric_columns": feature_columns,
+        "scaler": None,
+        "dtype": np.dtype(dtype).name,
+    }
 
-    # Scale numeric features
-    numeric_cols = X.select_dtypes(include=["int64", "float64"]).columns
     scaler = StandardScaler()
-    X[numeric_cols] = scaler.fit_transform(X[numeric_cols])
+    for chunk in iter_dataset_chunks(dataset_path, chunksize=chunksize, schema=schema,
+                                     columns=preprocessor_columns(preprocessor)):
+        X, _, _, _ = apply_preprocessor(chunk, preprocessor)
+        scaler.partial_fit(X)
+    preprocessor["scaler"] = scaler
 
-    return train_test_split(X, y, A, test_size=test_size, random_state=42)
\ No newline at end of file
+    info["feature_changes"] = {"dropped": dropped, "hashed": hashed}
+    info["schema"] = schema
+    return preprocessor, info
@@ -1,18 +1,151 @@
 from fpdf import FPDF
 import numpy as np
 import pandas as pd
+from PIL import Image
+
+# Fairness thresholds used in the interpretation
+DI_RANGE = (0.8, 1.25)
+# "Equal Opportunity Diff" is the equalized-odds ratio (worst of the TPR and FPR ratios, 1 = fair),
+# so it is flagged below a lower bound, the same four-fifths rule as Disparate Impact
+EOD_MIN = DI_RANGE[0]
+# Selection-rate gap (Demographic Parity Difference) above which the bias is called substantial
+DPD_TOLERANCE = 0.3
+# With more groups than this the report lists the highest and lowest SUMMARY_GROUPS rates and
+# moves the full table to an appendix
+MAX_TABLE_GROUPS = 30
+SUMMARY_GROUPS = 10
+# The code -> label block at the top is only readable for a handful of groups
+MAX_MAPPED_GROUPS = 20
+# Group/rate column pairs per appendix row
+APPENDIX_COLUMNS = 3
+# Height in mm above which the chart is scaled down to fit a page
+MAX_CHART_HEIGHT = 250
+
+
+def _pdf_text(value):
+    """FPDF's core fonts are latin-1 only; replace anything else instead of failing."""
+    return str(value).encode("latin-1", "replace").decode("latin-1")
+
+
+def group_label_index(keys, sensitive_mapping=None, sensitive_series=None):
+    """
+    Readable label for each group key. `sensitive_mapping` maps codes to labels (e.g. built from the
+    preprocessing LabelEncoder classes; its keys may be ints or strings). Without it the code is
+    used as a position in the distinct values of `sensitive_series`, for older callers.
+    """
+    if sensitive_mapping:
+        by_code = {str(k): str(v) for k, v in sensitive_mapping.items()}
+        return {key: by_code.get(str(key), str(key)) for key in keys}
+
+    if sensitive_series is not None:
+        unique_vals = list(pd.unique(np.asarray(sensitive_series)))
+        labels = {}
+        for key in keys:
+            position = int(key) if isinstance(key, (int, np.integer, float, np.floating)) and key == key else -1
+            labels[key] = str(unique_vals[position]) if 0 <= position < len(unique_vals) else str(key)
+        return labels
+
+    return {key: str(key) for key in keys}
+
+
+def _label_sort_key(label):
+    # Numeric labels sort as numbers, before any text labels
+    try:
+        return 0, float(label), ""
+    except ValueError:
+        return 1, 0.0, label
+
+
+def _rate_value(rate):
+    try:
+        rate = float(rate)
+    except (TypeError, ValueError):
+        return 0.0
+    return 0.0 if rate != rate else rate  # NaN -> 0
+
+
+def _fit_text(pdf, text, width):
+    """Trim `text` with an ellipsis so it fits in a cell `width` mm wide at the current font."""
+    if pdf.get_string_width(text) <= width - 2:
+        return text
+    while text and pdf.get_string_width(text + "...") > width - 2:
+        text = text[:-1]
+    return text + "..."
+
+
+def _rate_table(pdf, sensitive_col, items):
+    pdf.set_font("Arial", size=10)
+    pdf.cell(95, 8, _pdf_text(f"{sensitive_col} Group"), border=1)
+    pdf.cell(95, 8, "Selection Rate", border=1, ln=True)
+    for label, rate in items:
+        pdf.cell(95, 8, _fit_text(pdf, label, 95), border=1)
+        pdf.cell(95, 8, f"{rate:.2f}", border=1, ln=True)
+
+
+def _appendix_table(pdf, sensitive_col, items):
+    """All groups in a compact multi-column table, filled column by column, with a header on every page."""
+    label_w, rate_w, row_h = 45, 18, 5
+    pdf.add_page()
+    pdf.set_font("Arial", size=12)
+    pdf.cell(200, 10, txt=_pdf_text(f"Appendix: Selection Rates by {sensitive_col}"), ln=True)
+    rows_per_page = int((pdf.page_break_trigger - pdf.get_y()) // row_h) - 1
+    per_page = rows_per_page * APPENDIX_COLUMNS
+
+    for start in range(0, len(items), per_page):
+        if start:
+            pdf.add_page()
+        page = items[start:start + per_page]
+        n_rows = -(-len(page) // APPENDIX_COLUMNS)
+
+        pdf.set_font("Arial", "B", 7)
+        for _ in range(APPENDIX_COLUMNS):
+            pdf.cell(label_w, row_h, "Group", border=1)
+            pdf.cell(rate_w, row_h, "Rate", border=1)
+        pdf.ln()
+
+        pdf.set_font("Arial", size=7)
+        for r in range(n_rows):
+            for c in range(APPENDIX_COLUMNS):
+                i = c * n_rows + r
+                if i < len(page):
+                    label, rate = page[i]
+                    pdf.cell(label_w, row_h, _fit_text(pdf, label, label_w), border=1)
+                    pdf.cell(rate_w, row_h, f"{rate:.2f}", border=1)
+            pdf.ln()
+
+
+def _interval_note(name, metric_intervals, thresholds=()):
+    """Sentence describing the bootstrap interval of a metric, or '' when there is none."""
+    if not metric_intervals:
+        return ""
+    interval = metric_intervals["intervals"].get(name) or {}
+    low, high = interval.get("low"), interval.get("high")
+    if low is None or high is None:
+        return ""
+
+    level = int(round(metric_intervals["confidence"] * 100))
+    note = f" The {level}% bootstrap confidence interval is {low:.2f} to {high:.2f}"
+    if any(low < t < high for t in thresholds):
+        note += ", which crosses the fairness threshold, so this verdict is not conclusive at this sample size."
+    else:
+        note += "."
+    return note
+
+
 def generate_report(metrics, chart_path, group_rates, sensitive_col, chosen_model_name,
-                    output_path="reports/report.pdf", sensitive_mapping=None, sensitive_series=None):
+                    output_path="reports/report.pdf", sensitive_mapping=None, sensitive_series=None,
+                    metric_intervals=None):
     """
     Generate a detailed PDF fairness report with model metrics, group rates, and interpretation.
     Automatically uses actual sensitive column values for group labels.
+    `metric_intervals` (from bias_metrices.bootstrap_intervals) adds confidence intervals to the interpretation.
     """
     pdf = FPDF()
     pdf.add_page()
 
-    # Display group mapping if available
-    if sensitive_mapping:
-        mapping_items = [f"{str(k)} → {v}" for k, v in sensitive_mapping.items()]
+    # Display group mapping if available (only readable for a handful of groups)
+    if sensitive_mapping and len(sensitive_mapping) <= MAX_MAPPED_GROUPS:
+        mapping_items = [_pdf_text(f"{k} -> {v}") for k, v in sensitive_mapping.items()]
         line_length = 80  # max characters per line
         lines = []
         current_line = ""
@@ -61,69 +194,30 @@ def generate_report(metrics, chart_path, group_rates, sensitive_col, chosen_mode
     else:
         group_rates_dict = dict(group_rates)
 
-    groups_list =[]
-    rates_list = []
+    # Resolve every label once, then sort by label (numerically when the labels are numbers)
+    labels = group_label_index(group_rates_dict.keys(), sensitive_mapping, sensitive_series)
+    items = sorted(
+        ((_pdf_text(labels[key]), _rate_value(rate)) for key, rate in group_rates_dict.items()),
+        key=lambda item: _label_sort_key(item[0])
+    )
+    groups_list = [label for label, _ in items]
+    rates_list = [rate for _, rate in items]
 
-    # Write table header
     pdf.set_font("Arial", size=12)
     pdf.cell(200, 10, txt=f"Selection Rates by {sensitive_col}", ln=True)
-    pdf.set_font("Arial", size=10)
-    pdf.cell(95, 8, f"{sensitive_col} Group", border=1)
-    pdf.cell(95, 8, "Selection Rate", border=1, ln=True)
-
-    # Create a mapping from group_rates_dict keys to actual sensitive values if sensitive_series is provided
-    group_key_to_label = {}
-    if sensitive_series is not None:
-        # Get unique values in sensitive_series in order of appearance
-        unique_vals = list(pd.unique(sensitive_series))
-        # Map each group key to the corresponding unique sensitive value if possible
-        for key in group_rates_dict.keys():
-            # Try to interpret key as an index to unique_vals if key is numeric
-            if isinstance(key, (int, np.integer)):
-                if 0 <= key < len(unique_vals):
-                    group_key_to_label[key] = str(unique_vals[key])
-                else:
-                    group_key_to_label[key] = str(key)
-            elif isinstance(key, float) and not np.isnan(key):
-                int_key = int(key)
-                if 0 <= int_key < len(unique_vals):
-                    group_key_to_label[key] = str(unique_vals[int_key])
-                else:
-                    group_key_to_label[key] = str(key)
-            else:
-                # Non-numeric key, use as is
-                group_key_to_label[key] = str(key)
+    if len(items) <= MAX_TABLE_GROUPS:
+        _rate_table(pdf, sensitive_col, items)
     else:
-        # No sensitive_series, fallback to sensitive_mapping or str
-        for key in group_rates_dict.keys():
-            if sensitive_mapping:
-                group_key_to_label[key] = sensitive_mapping.get(key, sensitive_mapping.get(str(key), str(key)))
-            else:
-                group_key_to_label[key] = str(key)
-
-    sorted_items = sorted(
-        group_rates_dict.items(),
-        key=lambda x: float(group_key_to_label.get(x[0], x[0]))
-        if str(group_key_to_label.get(x[0], x[0])).replace('.', '', 1).isdigit()
-        else str(group_key_to_label.get(x[0], x[0]))
-    )
-
-    # Populate table rows with actual sensitive column values
-    for group, rate in sorted_items:
-        try:
-            rate_val = float(rate)
-            if rate_val != rate_val:  # NaN check
-                rate_val = 0.0
-        except Exception:
-            rate_val = 0.0
-
-        group_label = group_key_to_label.get(group, str(group))
-
-        groups_list.append(group_label)
-        rates_list.append(rate_val)
-
-        pdf.cell(95, 8, group_label, border=1)
-        pdf.cell(95, 8, f"{rate_val:.2f}", border=1, ln=True)
+        # Too many groups for one table: show the extremes here and everything in the appendix
+        ranked = sorted(items, key=lambda item: item[1], reverse=True)
+        pdf.set_font("Arial", size=10)
+        pdf.multi_cell(0, 8, f"There are {len(items)} groups. The {SUMMARY_GROUPS} highest and lowest "
+                             "selection rates are shown here; every group is listed in the appendix.")
+        pdf.cell(200, 8, txt="Highest selection rates", ln=True)
+        _rate_table(pdf, sensitive_col, ranked[:SUMMARY_GROUPS])
+        pdf.ln(3)
+        pdf.cell(200, 8, txt="Lowest selection rates", ln=True)
+        _rate_table(pdf, sensitive_col, ranked[-SUMMARY_GROUPS:][::-1])
 
     pdf.ln(5)
 
@@ -139,40 +233,49 @@ def generate_report(metrics, chart_path, group_rates, sensitive_col, chosen_mode
         interpretation.append(
             f"The model achieved an accuracy of {acc:.2f}. "
             "However, high accuracy does not imply fairness, as the model may be systematically favoring one group over another."
+            + _interval_note("Accuracy", metric_intervals)
         )
 
     if "Disparate Impact" in metrics:
         di = metrics["Disparate Impact"]
+        di_note = _interval_note("Disparate Impact", metric_intervals, thresholds=DI_RANGE)
         if di == 0.0:
             interpretation.append(
                 f"Disparate Impact is {di:.2f}. Severe bias detected: one group has zero selection rate compared to another, meaning it is completely excluded from positive outcomes."
+                + di_note
             )
-        elif di < 0.8 or di > 1.25:
+        elif di < DI_RANGE[0] or di > DI_RANGE[1]:
             interpretation.append(
                 f"Disparate Impact is {di:.2f}, which falls outside the fairness threshold [0.8, 1.25]. "
                 "This indicates that one group is being disproportionately favored or disfavored compared to another."
+                + di_note
             )
         else:
             interpretation.append(
                 f"Disparate Impact is {di:.2f}, which lies within the fairness threshold. "
                 "This suggests that the model is treating groups more equitably in terms of overall outcomes."
+                + di_note
             )
 
     if "Equal Opportunity Diff" in metrics:
         eod = metrics["Equal Opportunity Diff"]
-        if eod == 1.0 or eod == -1.0:
+        eod_note = _interval_note("Equal Opportunity Diff", metric_intervals, thresholds=(EOD_MIN,))
+        if eod == 0.0:
             interpretation.append(
                 f"Equal Opportunity Difference is {eod:.2f}. Severe bias detected: one group has perfect true positive rate while another has none, showing extreme unfairness."
+                + eod_note
             )
-        elif abs(eod) > 0.2:
+        elif eod < EOD_MIN:
             interpretation.append(
-                f"Equal Opportunity Difference is {eod:.2f}, which exceeds the fairness tolerance. "
+                f"Equal Opportunity Difference is {eod:.2f}, which falls below the fairness threshold {EOD_MIN}. "
                 "This means the model provides different true positive rates across groups, disadvantaging some."
+                + eod_note
             )
         else:
             interpretation.append(
                 f"Equal Opportunity Difference is {eod:.2f}, which is within the acceptable range. "
                 "This implies that the model's ability to correctly identify positives is relatively balanced."
+                + eod_note
             )
 
     if "Demographic Parity Diff" in metrics:
@@ -180,6 +283,7 @@ def generate_report(metrics, chart_path, group_rates, sensitive_col, chosen_mode
         interpretation.append(
             f"Demographic Parity Difference is {dpd:.2f}. "
             "A higher value indicates unequal positive prediction rates between groups, a key sign of potential bias."
+            + _interval_note("Demographic Parity Diff", metric_intervals)
         )
 
     for line in interpretation:
@@ -199,7 +303,7 @@ def generate_report(metrics, chart_path, group_rates, sensitive_col, chosen_mode
         gap = max_rate - min_rate
         fairness_summary = (
             f"The highest selection rate among groups is {max_rate:.2f}, while the lowest is {min_rate:.2f}. "
-            f"This results in a gap of {gap:.2f}, indicating {'substantial' if gap > 0.3 else 'minor'} bias in favor of the higher-rated group."
+            f"This results in a gap of {gap:.2f}, indicating {'substantial' if gap > DPD_TOLERANCE else 'minor'} bias in favor of the higher-rated group."
         )
         pdf.multi_cell(0, 8, fairness_summary)
     else:
@@ -209,7 +313,97 @@ def generate_report(metrics, chart_path, group_rates, sensitive_col, chosen_mode
     if chart_path:
         pdf.set_font("Arial", size=12)
         pdf.cell(200, 10, txt="Selection Rates Chart", ln=True)
-        pdf.image(chart_path, x=10, y=None, w=180)
+        # Tall charts (many groups) are scaled to fit on one page
+        with Image.open(chart_path) as img:
+            width, height = img.size
+        if 180 * height / width > MAX_CHART_HEIGHT:
+            pdf.image(chart_path, x=10, y=None, h=MAX_CHART_HEIGHT)
+        else:
+            pdf.image(chart_path, x=10, y=None, w=180)
+
+    if len(items) > MAX_TABLE_GROUPS:
+        _appendix_table(pdf, sensitive_col, items)
+
+    pdf.output(output_path)
+    return output_path
+
+def _outside_threshold(name, value):
+    if name == "Disparate Impact":
+        return value < DI_RANGE[0] or value > DI_RANGE[1]
+    if name == "Equal Opportunity Diff":
+        return value < EOD_MIN
+    return False
+
+
+def generate_comparison_report(rows, output_path="reports/comparison.pdf"):
+    """
+    One PDF comparing several analyses of the same dataset (e.g. a batch run).
+    `rows` is a list of dicts with "label", "metrics" and optionally "chart_path".
+    Metrics outside the fairness thresholds are marked with an asterisk.
+    """
+    metric_names = ["Accuracy", "Demographic Parity Diff", "Equal Opportunity Diff", "Disparate Impact"]
+    headers = ["Accuracy", "DP Diff", "EO Diff", "Disp. Impact"]
+
+    pdf = FPDF()
+    pdf.add_page()
+
+    # Title
+    pdf.set_font("Arial", size=16)
+    pdf.cell(200, 10, txt="BiasGuard - Comparative Fairness Report", ln=True, align="C")
+    pdf.ln(5)
+    pdf.set_font("Arial", size=10)
+    pdf.multi_cell(0, 8, f"This report compares {len(rows)} analyses of the same dataset. "
+                         f"Values marked * fall outside the fairness thresholds "
+                         f"(Disparate Impact within [{DI_RANGE[0]}, {DI_RANGE[1]}], "
+                         f"Equal Opportunity Difference at least {EOD_MIN}).")
+    pdf.ln(3)
+
+    # Metrics table
+    pdf.set_font("Arial", size=9)
+    pdf.cell(78, 8, "Analysis", border=1)
+    for header in headers:
+        pdf.cell(28, 8, header, border=1, align="C")
+    pdf.ln()
+    for row in rows:
+        pdf.cell(78, 8, _pdf_text(row["label"])[:48], border=1)
+        for name in metric_names:
+            value = row["metrics"].get(name)
+            if value is None or value != value:
+                text = "n/a"
+            else:
+                text = f"{value:.2f}" + ("*" if _outside_threshold(name, value) else "")
+            pdf.cell(28, 8, text, border=1, align="C")
+        pdf.ln()
+    pdf.ln(5)
+
+    # Summary of the worst analyses
+    pdf.set_font("Arial", size=12)
+    pdf.cell(200, 10, txt="Summary", ln=True)
+    pdf.set_font("Arial", size=10)
+    flagged = [row["label"] for row in rows
+               if any(_outside_threshold(name, row["metrics"].get(name) or 0) for name in metric_names)]
+    if flagged:
+        pdf.multi_cell(0, 8, _pdf_text(f"{len(flagged)} of {len(rows)} analyses cross a fairness threshold: "
+                                       + "; ".join(flagged) + "."))
+    else:
+        pdf.multi_cell(0, 8, "No analysis crosses a fairness threshold.")
+    valid = [row for row in rows if row["metrics"].get("Demographic Parity Diff") is not None]
+    if valid:
+        worst = max(valid, key=lambda r: r["metrics"]["Demographic Parity Diff"])
+        pdf.multi_cell(0, 8, _pdf_text(
+            f"The largest demographic parity gap ({worst['metrics']['Demographic Parity Diff']:.2f}) "
+            f"is in {worst['label']}."))
+    pdf.ln(5)
+
+    # Selection-rate charts, two to a page
+    for row in rows:
+        if row.get("chart_path"):
+            # Keep each chart on the same page as its caption (130 mm wide is ~98 mm tall)
+            if pdf.get_y() + 8 + 98 > pdf.page_break_trigger:
+                pdf.add_page()
+            pdf.set_font("Arial", size=11)
+            pdf.cell(200, 8, txt=_pdf_text(row["label"]), ln=True)
+            pdf.image(row["chart_path"], x=35, y=None, w=130)
 
     pdf.output(output_path)
-    return output_path
\ No newline at end of file
+    return output_path
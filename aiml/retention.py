@@ -0,0 +1,244 @@
+import gzip
+import hashlib
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+
+# Analyses name their files <kind>_<uid>[-<n>].<ext> (chart_, report_, comparison_, pareto_);
+# everything sharing a uid (charts, PDF, deferred spec, per-spec batch charts) lives and dies together
+_GROUP = re.compile(r"^[a-z]+_([0-9a-f]+)")
+# Text formats worth keeping a gzip copy of; PNGs and fpdf's PDFs are already compressed
+COMPRESSIBLE_EXTENSIONS = (".svg", ".json")
+
+
+class ReportStore:
+    """
+    Lifecycle of the charts and PDFs that analyses write to `report_dir`.
+
+    collect() removes every group of files (one analysis) whose newest file is older than
+    `max_age` seconds, then the oldest groups until the files take at most `max_bytes` on disk.
+    Groups younger than `min_age` seconds are never removed, so analyses in flight keep their
+    files. Identical files are hard-linked to one blob in `blob_dir` (same filesystem), named by
+    SHA-256, so a chart shared by many analyses is stored once; blobs nothing links to any more
+    are removed. Deduplicated files share their data, so files must never be rewritten in place
+    (analyses always write new, uid-named files). They also share the blob's mtime, so the time
+    each one was written is kept on an empty sidecar file of the same name in `blob_dir`/seen.
+
+    digest() gives the content hash used as a strong ETag, and compressed() a gzip copy of text
+    files when `precompress` is set. Hashes are remembered per inode, so each file is read once.
+    """
+
+    def __init__(self, report_dir, blob_dir, max_bytes=2048 * 1024 * 1024, max_age=7 * 24 * 3600,
+                 min_age=600, precompress=False, collect_interval=300, keep=(".gitkeep",)):
+        self.report_dir = report_dir
+        self.blob_dir = blob_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.min_age = min_age
+        self.precompress = precompress
+        self.collect_interval = collect_interval
+        self.keep = keep
+        self.last_collect = None
+        self._digests = {}
+        self._lock = threading.Lock()
+        self._collect_lock = threading.Lock()
+        self.seen_dir = os.path.join(blob_dir, "seen")
+        os.makedirs(self.seen_dir, exist_ok=True)
+        if hasattr(os, "register_at_fork"):
+            # A worker forked while another thread hashes or collects must not inherit held locks
+            os.register_at_fork(after_in_child=self._reset_locks)
+
+    def _reset_locks(self):
+        self._lock = threading.Lock()
+        self._collect_lock = threading.Lock()
+
+    def _hash(self, path):
+        st = os.stat(path)
+        key = (st.st_dev, st.st_ino, st.st_size)
+        with self._lock:
+            digest = self._digests.get(key)
+        if digest is None:
+            hasher = hashlib.sha256()
+            with open(path, "rb") as fh:
+                for chunk in iter(lambda: fh.read(1 << 20), b""):
+                    hasher.update(chunk)
+            digest = hasher.hexdigest()
+            with self._lock:
+                self._digests[key] = digest
+        return digest, st
+
+    def _written_at(self, path, st):
+        try:
+            return os.stat(os.path.join(self.seen_dir, os.path.basename(path))).st_mtime
+        except OSError:
+            return st.st_mtime
+
+    def _deduplicate(self, path, digest, st):
+        """Hard-link `path` (stat `st`) to the blob for `digest`; returns True when it replaced a duplicate."""
+        blob = os.path.join(self.blob_dir, digest + os.path.splitext(path)[1])
+        try:
+            if not os.path.exists(blob):
+                # The first copy becomes the blob; later identical files link to it
+                os.link(path, blob)
+                return False
+            if os.path.samefile(blob, path):
+                return False
+            # The link takes the blob's mtime; remember when this file was written for expiry
+            seen = os.path.join(self.seen_dir, os.path.basename(path))
+            with open(seen, "a"):
+                pass
+            os.utime(seen, (st.st_mtime, st.st_mtime))
+            tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+            os.link(blob, tmp_path)
+            os.replace(tmp_path, path)
+            return True
+        except OSError:
+            # Links not supported, blob_dir on another filesystem, or a concurrent link: keep the copy
+            return False
+
+    def digest(self, path):
+        """SHA-256 of a finished report file. A file seen for the first time is deduplicated."""
+        digest, st = self._hash(path)
+        # One link means the file has not been matched to a blob yet
+        if st.st_nlink == 1:
+            self._deduplicate(path, digest, st)
+        return digest
+
+    def compressed(self, path):
+        """Path of a gzip copy of `path` (made on first use), or None when it is not worth one."""
+        if not self.precompress or os.path.splitext(path)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+            return None
+        gz_path = path + ".gz"
+        if not os.path.exists(gz_path):
+            tmp_path = f"{gz_path}.{uuid.uuid4().hex[:8]}.tmp"
+            # mtime=0 makes the output depend on the content only, so identical copies deduplicate
+            with open(path, "rb") as src, open(tmp_path, "wb") as raw, \
+                    gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=9, mtime=0) as out:
+                shutil.copyfileobj(src, out, 1 << 20)
+            os.replace(tmp_path, gz_path)
+        return gz_path
+
+    def _groups(self):
+        groups = {}
+        for name in os.listdir(self.report_dir):
+            path = os.path.join(self.report_dir, name)
+            if name in self.keep:
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if not os.path.isfile(path):
+                continue
+            match = _GROUP.match(name)
+            groups.setdefault(match.group(1) if match else name, []).append((path, st))
+        return groups
+
+    def _remove_group(self, files, links):
+        freed = 0
+        for path, st in files:
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            inode = (st.st_dev, st.st_ino)
+            links[inode] -= 1
+            if not links[inode]:
+                freed += st.st_size
+        return len(files), freed
+
+    def collect(self):
+        """Expire, deduplicate and evict report files now. Returns what was done and what is left."""
+        with self._collect_lock:
+            return self._collect()
+
+    def maybe_collect(self):
+        """collect() unless one ran in the last `collect_interval` seconds or is running now."""
+        last = self.last_collect
+        if last is not None and time.time() - last["collected_at"] < self.collect_interval:
+            return None
+        if not self._collect_lock.acquire(blocking=False):
+            return None
+        try:
+            return self._collect()
+        finally:
+            self._collect_lock.release()
+
+    def _collect(self):
+        now = time.time()
+        removed = deduplicated = 0
+        groups = self._groups()
+
+        live = []
+        for key, files in groups.items():
+            newest = max(self._written_at(path, st) for path, st in files)
+            if now - newest > self.max_age:
+                for path, _ in files:
+                    try:
+                        os.remove(path)
+                        removed += 1
+                    except OSError:
+                        pass
+                continue
+            # Settled files that no blob links to yet; younger ones may still be being written
+            for path, st in files:
+                if st.st_nlink == 1 and now - st.st_mtime >= self.min_age and not path.endswith(".tmp"):
+                    deduplicated += self._deduplicate(path, self._hash(path)[0], st)
+            live.append((newest, key))
+
+        # Sizes after deduplication: an inode counts once however many report files link to it
+        groups = self._groups()
+        links = {}
+        sizes = {}
+        for files in groups.values():
+            for _, st in files:
+                inode = (st.st_dev, st.st_ino)
+                links[inode] = links.get(inode, 0) + 1
+                sizes[inode] = st.st_size
+        total = sum(sizes.values())
+
+        for newest, key in sorted(live):
+            if total <= self.max_bytes or now - newest < self.min_age:
+                break
+            n_removed, freed = self._remove_group(groups.get(key, []), links)
+            removed += n_removed
+            total -= freed
+
+        # Blobs only the blob directory still links to belong to removed files
+        for name in os.listdir(self.blob_dir):
+            path = os.path.join(self.blob_dir, name)
+            try:
+                if os.path.isfile(path) and os.stat(path).st_nlink == 1:
+                    os.remove(path)
+            except OSError:
+                pass
+        for name in os.listdir(self.seen_dir):
+            if not os.path.exists(os.path.join(self.report_dir, name)):
+                try:
+                    os.remove(os.path.join(self.seen_dir, name))
+                except OSError:
+                    pass
+        # Forget the hashes of removed files
+        live_inodes = {inode for inode, count in links.items() if count}
+        with self._lock:
+            self._digests = {k: v for k, v in self._digests.items() if k[:2] in live_inodes}
+
+        self.last_collect = {
+            "collected_at": now,
+            "removed": removed,
+            "deduplicated": deduplicated,
+            "files": sum(links.values()),
+            "bytes": total,
+        }
+        return self.last_collect
+
+    def stats(self):
+        return {
+            "max_bytes": self.max_bytes,
+            "max_age": self.max_age,
+            "precompress": self.precompress,
+            "last_collect": self.last_collect,
+        }
@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+
+class HashingSpooledFile(tempfile.SpooledTemporaryFile):
+    """
+    Upload buffer that stays in memory up to `max_size` bytes and then spills to an anonymous
+    temporary file. The SHA-256 of everything written is kept as it arrives, so the dataset
+    hash is known as soon as the request body has been parsed.
+    """
+
+    def __init__(self, max_size=0, dir=None):
+        super().__init__(max_size=max_size, mode="w+b", dir=dir)
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.size += len(data)
+        return super().write(data)
+
+
+def upload_digest(stream):
+    """SHA-256 of an uploaded file stream; reads (and rewinds) it if it was not hashed on arrival."""
+    if isinstance(stream, HashingSpooledFile):
+        return stream.sha256.hexdigest()
+
+    hasher = hashlib.sha256()
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(1 << 20), b""):
+        hasher.update(chunk)
+    stream.seek(0)
+    return hasher.hexdigest()
+
+
+def copy_upload(stream, file_path):
+    """Write an upload stream to `file_path`, e.g. for a job that runs in another process."""
+    stream.seek(0)
+    with open(file_path, "wb") as out:
+        shutil.copyfileobj(stream, out, 1 << 20)
+    stream.seek(0)
+    return file_path
+
+
+def purge_stale_files(directory, max_age, keep=(".gitkeep",)):
+    """Delete files older than `max_age` seconds, e.g. uploads left behind by a crashed worker."""
+    cutoff = time.time() - max_age
+    removed = 0
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name in keep or not os.path.isfile(path):
+            continue
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+def purge_previews(directory, max_age, max_bytes):
+    """
+    Expire saved previews that were never upgraded: those older than `max_age` seconds, then the
+    oldest until the kept uploads take at most `max_bytes` (the newest preview is always kept).
+    Claimed previews, whose upload now belongs to a job, are left alone. Returns how many were removed.
+    """
+    previews = []
+    for name in os.listdir(directory):
+        if not (name.startswith("preview_") and name.endswith(".json")):
+            continue
+        meta_path = os.path.join(directory, name)
+        data_path = meta_path[:-len(".json")] + ".dataset"
+        try:
+            saved_at = os.path.getmtime(meta_path)
+            size = os.path.getsize(data_path) if os.path.exists(data_path) else 0
+        except OSError:
+            continue
+        previews.append((saved_at, size, meta_path, data_path))
+
+    previews.sort()
+    total = sum(size for _, size, _, _ in previews)
+    cutoff = time.time() - max_age
+    removed = 0
+    for i, (saved_at, size, meta_path, data_path) in enumerate(previews):
+        newest = i == len(previews) - 1
+        if saved_at >= cutoff and (total <= max_bytes or newest):
+            continue
+        try:
+            # The metadata goes first, so a concurrent take_preview either wins or sees an unknown preview
+            os.remove(meta_path)
+        except OSError:
+            continue
+        try:
+            os.remove(data_path)
+        except OSError:
+            pass
+        total -= size
+        removed += 1
+    return removed
+
+
+def save_preview(directory, preview_id, stream, meta):
+    """Keep a previewed upload and what is needed to run it in full (options, digest, schema)."""
+    copy_upload(stream, os.path.join(directory, f"preview_{preview_id}.dataset"))
+    with open(os.path.join(directory, f"preview_{preview_id}.json"), "w", encoding="utf-8") as fh:
+        json.dump(meta, fh)
+    return preview_id
+
+
+def take_preview(directory, preview_id):
+    """
+    Claim a saved preview for its full run: returns (file_path, meta) and removes the metadata so
+    the preview is only upgraded once. Raises KeyError for unknown or already used previews.
+    """
+    meta_path = os.path.join(directory, f"preview_{preview_id}.json")
+    try:
+        with open(meta_path, "r", encoding="utf-8") as fh:
+            meta = json.load(fh)
+        os.remove(meta_path)
+    except (OSError, ValueError):
+        raise KeyError(preview_id)
+    return os.path.join(directory, f"preview_{preview_id}.dataset"), meta
@@ -1,12 +1,116 @@
-import matplotlib
-matplotlib.use("Agg")  # Use non-GUI backend for Flask/macOS
-import matplotlib.pyplot as plt
+import io
+import os
+from functools import lru_cache
+
+import numpy as np
 import pandas as pd
+from PIL import Image
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+# Above this many groups the chart switches to horizontal bars that grow with the group count
+MAX_VERTICAL_GROUPS = 12
+# Labels longer than this in total no longer fit side by side under vertical bars
+MAX_VERTICAL_LABEL_CHARS = 60
+# Above this many groups the per-bar value labels are left out
+MAX_ANNOTATED_GROUPS = 40
+# Above this many groups only the highest and lowest MAX_CHART_GROUPS / 2 rates are drawn
+MAX_CHART_GROUPS = 60
+# Raster charts only go into the PDF, where 180 mm wide at ~110 dpi is already sharp
+CHART_DPI = int(os.environ.get("BIASGUARD_CHART_DPI", 110))
+# Written for every analysis: PNG for the PDF plus these extra formats (SVG for the web page)
+CHART_FORMATS = tuple(f for f in os.environ.get("BIASGUARD_CHART_FORMATS", "svg").split(",") if f)
+# Rendered charts kept in memory, keyed on the group labels, rates, format and DPI
+RENDER_CACHE_SIZE = 256
+
 
-def plot_selection_rates(y_pred, A_test, save_path="static/charts/selection.png", sensitive_mapping=None):
+def _render_chart(group_names, values, fmt, dpi, title="Selection Rates by Group"):
+    """Draw the selection-rate chart on a private Figure and return the encoded bytes."""
+    horizontal = (len(group_names) > MAX_VERTICAL_GROUPS
+                  or sum(len(name) for name in group_names) > MAX_VERTICAL_LABEL_CHARS)
+
+    # A Figure with its own Agg canvas, so concurrent requests never share pyplot state
+    if horizontal:
+        fig = Figure(figsize=(10, max(6, 0.25 * len(group_names))))
+    else:
+        fig = Figure(figsize=(8, 6))
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
 
-    df = pd.DataFrame({"y_pred": y_pred, "group": A_test})
-    rates = df.groupby("group").mean()["y_pred"].sort_index()
+    if horizontal:
+        bars = ax.barh(group_names, values, color="skyblue", edgecolor="black")
+        ax.invert_yaxis()
+    else:
+        bars = ax.bar(group_names, values, color="skyblue", edgecolor="black")
+
+    # Title and axis labels
+    ax.set_title(title, fontsize=16, fontweight="bold")
+    if horizontal:
+        ax.set_xlabel("Selection Rate", fontsize=12)
+        ax.set_ylabel("Group", fontsize=12)
+        ax.tick_params(axis="x", labelsize=11)
+        ax.tick_params(axis="y", labelsize=8)
+        ax.set_xlim(0, 1)
+    else:
+        ax.set_ylabel("Selection Rate", fontsize=12)
+        ax.set_xlabel("Group", fontsize=12)
+
+        # Ticks formatting
+        ax.tick_params(axis="x", labelrotation=0, labelsize=11)
+        ax.tick_params(axis="y", labelsize=11)
+
+        ax.set_ylim(0, 1)
+    ax.grid(color="grey", linestyle=":", linewidth=1, alpha=0.7)
+
+    # Add value labels on bars
+    if len(group_names) <= MAX_ANNOTATED_GROUPS:
+        for bar in bars:
+            if horizontal:
+                width = bar.get_width()
+                xy = (width, bar.get_y() + bar.get_height() / 2)
+                offset, ha, va, value = (3, 0), "left", "center", width
+            else:
+                height = bar.get_height()
+                xy = (bar.get_x() + bar.get_width() / 2, height)
+                offset, ha, va, value = (0, 3), "center", "bottom", height  # 3 points vertical offset
+            ax.annotate(
+                f"{value:.2f}",
+                xy=xy,
+                xytext=offset,
+                textcoords="offset points",
+                ha=ha,
+                va=va,
+                fontsize=10 if not horizontal else 8,
+                fontweight="bold",
+                color="black"
+            )
+
+    fig.tight_layout()
+    return _encode_figure(fig, canvas, fmt, dpi)
+
+
+def _encode_figure(fig, canvas, fmt, dpi):
+    buffer = io.BytesIO()
+    if fmt == "png":
+        # Flat palette PNG without an alpha channel: FPDF decodes alpha pixel by pixel in Python,
+        # which made embedding an RGBA chart the slowest part of the PDF
+        fig.set_dpi(dpi)
+        canvas.draw()
+        rgb = np.asarray(canvas.buffer_rgba())[..., :3]
+        Image.fromarray(rgb).quantize(colors=256).save(buffer, format="png", optimize=True)
+    else:
+        canvas.print_figure(buffer, format=fmt, dpi=dpi)
+    return buffer.getvalue()
+
+
+# lru_cache is thread-safe; identical rate vectors (e.g. re-analysing the same data with
+# another hyperparameter that does not change predictions) reuse the encoded chart
+_cached_render = lru_cache(maxsize=RENDER_CACHE_SIZE)(_render_chart)
+
+
+def render_selection_chart(rates, sensitive_mapping=None, fmt="png", dpi=CHART_DPI):
+    """Encoded chart bytes for a Series of selection rates indexed by group."""
+    rates = rates.sort_index()
 
     # Map numeric codes or other values back to readable labels
     if sensitive_mapping:
@@ -14,39 +118,82 @@ def plot_selection_rates(y_pred, A_test, save_path="static/charts/selection.png"
     else:
         group_names = [str(g) for g in rates.index]
 
-    # Plotting
-    plt.figure(figsize=(8, 6))
-    bars = plt.bar(group_names, rates.values, color="skyblue", edgecolor="black")
+    values = tuple(round(float(v), 6) for v in rates.values)
+    if len(values) <= MAX_CHART_GROUPS:
+        return _cached_render(tuple(group_names), values, fmt, dpi)
 
-    # Title and axis labels
-    plt.title("Selection Rates by Group", fontsize=16, fontweight="bold")
-    plt.ylabel("Selection Rate", fontsize=12)
-    plt.xlabel("Group", fontsize=12)
+    # Thousands of bars are unreadable; keep the extremes, highest first
+    half = MAX_CHART_GROUPS // 2
+    order = sorted(range(len(values)), key=lambda i: values[i], reverse=True)
+    keep = order[:half] + order[-half:]
+    title = f"Highest and Lowest Selection Rates ({MAX_CHART_GROUPS} of {len(values)} groups)"
+    return _cached_render(tuple(group_names[i] for i in keep), tuple(values[i] for i in keep), fmt, dpi, title)
 
-    # Ticks formatting
-    plt.xticks(rotation=0, fontsize=11)
-    plt.yticks(fontsize=11)
 
-    plt.ylim(0, 1)
-    plt.grid(color = "grey" ,linestyle=":",linewidth = 1, alpha=0.7)
+def plot_selection_rates(y_pred, A_test, save_path="static/charts/selection.png", sensitive_mapping=None,
+                         rates=None, formats=None, dpi=CHART_DPI):
+    """
+    Bar chart of the selection rate per group. Pass `rates` (a Series indexed by group, e.g. from
+    evaluate_bias) to skip recomputing them from `y_pred`/`A_test`.
 
-    # Add value labels on bars
-    for bar in bars:
-        height = bar.get_height()
-        plt.annotate(
-            f"{height:.2f}",
-            xy=(bar.get_x() + bar.get_width() / 2, height),
-            xytext=(0, 3),  # 3 points vertical offset
-            textcoords="offset points",
-            ha="center",
-            va="bottom",
-            fontsize=10,
-            fontweight="bold",
-            color="black"
-        )
-
-    plt.tight_layout()
-    if save_path:
-        plt.savefig(save_path, dpi=300)
-    plt.close()
-    return save_path
\ No newline at end of file
+    The chart is written to `save_path` in the format of its extension; any other `formats`
+    (e.g. "svg" for the web page) are written next to it with the same stem. Returns save_path.
+    """
+    if rates is None:
+        df = pd.DataFrame({"y_pred": y_pred, "group": A_test})
+        rates = df.groupby("group").mean()["y_pred"]
+
+    if not save_path:
+        return None
+    stem, ext = os.path.splitext(save_path)
+    formats = [ext.lstrip(".").lower() or "png", *(formats or ())]
+    for fmt in dict.fromkeys(formats):
+        data = render_selection_chart(rates, sensitive_mapping=sensitive_mapping, fmt=fmt, dpi=dpi)
+        with open(f"{stem}.{fmt}", "wb") as fh:
+            fh.write(data)
+    return save_path
+
+
+def render_pareto_chart(points, front, x="Disparate Impact", y="Accuracy", x_threshold=None,
+                        fmt="png", dpi=CHART_DPI):
+    """
+    Scatter of mitigation sweep points (dicts with method, strength and metrics) with the Pareto
+    front (indices into `points`) drawn as a line, and an optional dashed line at `x_threshold`.
+    """
+    fig = Figure(figsize=(8, 6))
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+
+    methods = list(dict.fromkeys(p["method"] for p in points if "metrics" in p))
+    markers = "osD^vP*X"
+    for n, method in enumerate(methods):
+        scored = [p for p in points if p["method"] == method and "metrics" in p]
+        ax.scatter([p["metrics"][x] for p in scored], [p["metrics"][y] for p in scored],
+                   marker=markers[n % len(markers)], s=50, label=method.replace("_", " "), zorder=3)
+    if front:
+        ax.plot([points[i]["metrics"][x] for i in front], [points[i]["metrics"][y] for i in front],
+                color="black", linewidth=1.5, label="Pareto front", zorder=2)
+    if x_threshold is not None:
+        ax.axvline(x_threshold, color="grey", linestyle="--", linewidth=1)
+
+    ax.set_title("Accuracy vs Disparate Impact", fontsize=16, fontweight="bold")
+    ax.set_xlabel(x, fontsize=12)
+    ax.set_ylabel(y, fontsize=12)
+    ax.grid(color="grey", linestyle=":", linewidth=1, alpha=0.7)
+    ax.legend(fontsize=10)
+
+    fig.tight_layout()
+    return _encode_figure(fig, canvas, fmt, dpi)
+
+
+def plot_pareto_front(points, front, save_path, formats=None, dpi=CHART_DPI, **kwargs):
+    """Write render_pareto_chart to `save_path` and any other `formats` next to it. Returns save_path."""
+    stem, ext = os.path.splitext(save_path)
+    for fmt in dict.fromkeys([ext.lstrip(".").lower() or "png", *(formats or ())]):
+        with open(f"{stem}.{fmt}", "wb") as fh:
+            fh.write(render_pareto_chart(points, front, fmt=fmt, dpi=dpi, **kwargs))
+    return save_path
+
+
+def chart_cache_info():
+    return _cached_render.cache_info()._asdict()
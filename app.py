@@ -1,91 +1,453 @@
 import os
+import re
+import json
+import mimetypes
+import time
 import uuid
-import shutil
+import cProfile
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 os.makedirs("static/charts", exist_ok=True)
 from datetime import datetime
-from typing import Any, Union
 
 from flask import (
-    Flask, request, jsonify, send_from_directory,
+    Flask, Request, Response, g, request, jsonify, send_file, abort,
     render_template, url_for, redirect, flash
 )
-from werkzeug.utils import secure_filename
+from werkzeug.utils import secure_filename, safe_join
 from flask_cors import CORS
 
 # --- Import ML pipeline ---
-from aiml.preprocessing import preprocess_dataset
-from aiml.model_training import train_models
-from aiml.bias_metrices import evaluate_bias
-from aiml.visualization import plot_selection_rates
-from aiml.report import generate_report
-
-import numpy as np
-import pandas as pd
-try:
-    from fairlearn.metrics import MetricFrame
-except ImportError:
-    MetricFrame = None
+# The analysis stack (pandas, scikit-learn, matplotlib, fpdf) is imported on first use through
+# the aiml package attributes, so static pages and worker boot do not pay for it
+import aiml
+from aiml.model_training import validate_model_name, parse_model_params, INCREMENTAL_MODELS
+from aiml.jobs import JobQueue, QueueFullError
+from aiml.cache import ResultCache, analysis_key
+from aiml.artifacts import ArtifactStore
+from aiml.retention import ReportStore
+from aiml.isolation import HostSlots, IsolatedRunner, HostBusyError, WorkerLimitError
+from aiml.instrumentation import METRICS
+from aiml.uploads import (
+    HashingSpooledFile, upload_digest, copy_upload, purge_stale_files, purge_previews, save_preview, take_preview
+)
 
 # --- Config ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 UPLOAD_DIR = os.path.join(BASE_DIR, "uploads")
 REPORT_DIR = os.path.join(BASE_DIR, "reports")
-ALLOWED_EXTENSIONS = {"csv"}
+CACHE_DIR = os.path.join(BASE_DIR, "cache")
+ARTIFACT_DIR = os.path.join(BASE_DIR, "artifacts")
+# Parquet and Arrow IPC (.arrow/.feather/.ipc) are read column by column; the format is detected from the content
+ALLOWED_EXTENSIONS = {"csv", "parquet", "arrow", "feather", "ipc"}
+
+JOB_WORKERS = int(os.environ.get("BIASGUARD_JOB_WORKERS", 2))
+MAX_QUEUED_JOBS = int(os.environ.get("BIASGUARD_MAX_QUEUED_JOBS", 16))
+CSV_CHUNKSIZE = int(os.environ.get("BIASGUARD_CSV_CHUNKSIZE", 100000))  # 0 reads the whole file at once
+# "float32" halves the feature matrix of every analysis; scores stay within float32 rounding
+FEATURE_DTYPE = os.environ.get("BIASGUARD_FEATURE_DTYPE", "float64")
+if FEATURE_DTYPE not in ("float64", "float32"):
+    raise ValueError(f"BIASGUARD_FEATURE_DTYPE must be float64 or float32, not {FEATURE_DTYPE!r}")
+# Part of every cache key, as the dtype changes results; only set for float32, so float64 keys
+# (and the results already cached under them) are unchanged
+FEATURE_KEY = {"feature_dtype": FEATURE_DTYPE} if FEATURE_DTYPE != "float64" else {}
+MAX_BOOTSTRAP_RESAMPLES = 20000
+MAX_BATCH_SPECS = int(os.environ.get("BIASGUARD_MAX_BATCH_SPECS", 32))
+MAX_SWEEP_POINTS = int(os.environ.get("BIASGUARD_MAX_SWEEP_POINTS", 24))
+PREVIEW_ROWS = int(os.environ.get("BIASGUARD_PREVIEW_ROWS", 20000))
+MAX_PREVIEW_ROWS = 200000
+PREVIEW_TIME_BUDGET = float(os.environ.get("BIASGUARD_PREVIEW_BUDGET_S", 5))
+PREVIEW_CHUNKSIZE = 50000  # smaller chunks let sampling stop closer to the budget
+PREVIEW_BOOTSTRAP_RESAMPLES = 500
+# Uploads kept for upgrading a preview expire after this long, oldest first beyond the size cap
+PREVIEW_MAX_AGE = int(os.environ.get("BIASGUARD_PREVIEW_MAX_AGE_HOURS", 6)) * 3600
+PREVIEW_MAX_BYTES = int(os.environ.get("BIASGUARD_PREVIEW_MAX_MB", 4096)) * 1024 * 1024
+CACHE_MAX_BYTES = int(os.environ.get("BIASGUARD_CACHE_MAX_MB", 500)) * 1024 * 1024
+CACHE_MAX_AGE = int(os.environ.get("BIASGUARD_CACHE_MAX_AGE_HOURS", 168)) * 3600
+# reports/ is garbage-collected down to this size and age (see aiml.retention.ReportStore)
+REPORT_MAX_BYTES = int(os.environ.get("BIASGUARD_REPORT_MAX_MB", 2048)) * 1024 * 1024
+REPORT_MAX_AGE = int(os.environ.get("BIASGUARD_REPORT_MAX_AGE_HOURS", 168)) * 3600
+# Report files never change once written, so browsers and proxies may keep them this long
+REPORT_CACHE_MAX_AGE = int(os.environ.get("BIASGUARD_REPORT_CACHE_MAX_AGE_S", 86400))
+# "1" serves SVG charts and JSON specs gzipped (from a copy kept on disk) to clients that accept it
+REPORT_PRECOMPRESS = os.environ.get("BIASGUARD_REPORT_PRECOMPRESS", "0") == "1"
+# Synchronous analyses (/results, /run-bias, /batch, model scoring) run in a forked worker with these
+# limits (0 disables one); "0" runs them in the web process as before. Job workers get the same
+# memory and per-job CPU limits.
+ISOLATE_ANALYSES = os.environ.get("BIASGUARD_ISOLATE", "1") == "1"
+WORKER_MEMORY_LIMIT = int(os.environ.get("BIASGUARD_WORKER_MEMORY_MB", 4096)) * 1024 * 1024
+WORKER_CPU_LIMIT = int(os.environ.get("BIASGUARD_WORKER_CPU_S", 900))
+ANALYSIS_TIMEOUT = float(os.environ.get("BIASGUARD_ANALYSIS_TIMEOUT_S", 600))
+# Host-wide cap on synchronous analyses across all web worker processes; extra requests get 503
+MAX_CONCURRENT_ANALYSES = int(os.environ.get("BIASGUARD_MAX_CONCURRENT_ANALYSES", 2))
+# Also refuse them while the 1-minute load average per CPU is above this (0 = off)
+MAX_LOAD_PER_CPU = float(os.environ.get("BIASGUARD_MAX_LOAD_PER_CPU", 0))
+# Cores one analysis may use for model fits, bootstrap and batch/sweep threads. By default the
+# host's cores are shared between every analysis and job that can run at once.
+_HOST_CPUS = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+ANALYSIS_CPUS = int(os.environ.get("BIASGUARD_ANALYSIS_CPUS", 0)) or \
+    max(1, _HOST_CPUS // (MAX_CONCURRENT_ANALYSES + JOB_WORKERS))
+MAX_UPLOAD_BYTES = int(os.environ.get("BIASGUARD_MAX_UPLOAD_MB", 1024)) * 1024 * 1024
+SPOOL_MAX_BYTES = int(os.environ.get("BIASGUARD_SPOOL_MAX_MB", 64)) * 1024 * 1024  # uploads above this spill to a temp file
+STALE_UPLOAD_AGE = 24 * 3600
+# "eager" builds the PDF before responding, "lazy" on its first download, "background" in a thread
+REPORT_MODE = os.environ.get("BIASGUARD_REPORT_MODE", "lazy")
+# When set, a request with ?profile=1 (or an X-Profile: 1 header) dumps a cProfile .prof file here
+PROFILE_DIR = os.environ.get("BIASGUARD_PROFILE_DIR")
+# "off" imports the analysis stack on the first analysis request, "eager" before serving,
+# "background" in a thread started at boot
+PREWARM = os.environ.get("BIASGUARD_PREWARM", "off")
+MONITOR_WINDOW = int(os.environ.get("BIASGUARD_MONITOR_WINDOW_S", 3600))
+MONITOR_SLIDE = int(os.environ.get("BIASGUARD_MONITOR_SLIDE_S", 300))
+MONITOR_MIN_GROUP_SIZE = int(os.environ.get("BIASGUARD_MONITOR_MIN_GROUP_SIZE", 30))
+MAX_MONITORS = 64
+MAX_MONITOR_BATCH = 10000
+MONITOR_NAME = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+# "stream=path;stream=path": JSON-lines prediction logs tailed into monitors from boot
+MONITOR_TAIL = os.environ.get("BIASGUARD_MONITOR_TAIL", "")
 
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(REPORT_DIR, exist_ok=True)
+# Job inputs left behind by a crash or restart
+purge_stale_files(UPLOAD_DIR, STALE_UPLOAD_AGE)
+
+
+class UploadRequest(Request):
+    """Buffers uploaded files in memory (spilling to a temp file when large) and hashes them as they arrive."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingSpooledFile(max_size=SPOOL_MAX_BYTES)
+
 
 app = Flask(__name__, static_folder="static", template_folder="templates")
 app.secret_key = "dev-secret"
+app.request_class = UploadRequest
+# Oversized bodies are rejected with 413 before any of the upload is read
+app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_BYTES
 CORS(app)
 
+job_queue = JobQueue(max_workers=JOB_WORKERS, max_pending=MAX_QUEUED_JOBS,
+                     memory_limit=WORKER_MEMORY_LIMIT, cpu_limit=WORKER_CPU_LIMIT)
+result_cache = ResultCache(REPORT_DIR, CACHE_DIR, max_bytes=CACHE_MAX_BYTES, max_age=CACHE_MAX_AGE)
+artifact_store = ArtifactStore(ARTIFACT_DIR)
+report_store = ReportStore(REPORT_DIR, os.path.join(CACHE_DIR, "report_blobs"), max_bytes=REPORT_MAX_BYTES,
+                           max_age=REPORT_MAX_AGE, precompress=REPORT_PRECOMPRESS)
+# Reports expired while the app was down
+report_store.collect()
+host_slots = HostSlots(os.path.join(CACHE_DIR, "slots"), max_concurrent=MAX_CONCURRENT_ANALYSES,
+                       max_load=MAX_LOAD_PER_CPU)
+isolated = IsolatedRunner(memory_limit=WORKER_MEMORY_LIMIT, cpu_limit=WORKER_CPU_LIMIT, timeout=ANALYSIS_TIMEOUT)
+report_builder = ThreadPoolExecutor(max_workers=1) if REPORT_MODE == "background" else None
+
+
+def _warm_up():
+    app.logger.info("Analysis stack imported in %.2fs", aiml.warm_up())
+
+
+if PREWARM == "eager":
+    _warm_up()
+elif PREWARM == "background":
+    threading.Thread(target=_warm_up, name="biasguard-warm-up", daemon=True).start()
+
+
+# --- Instrumentation ---
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    if PROFILE_DIR and (request.args.get("profile") == "1" or request.headers.get("X-Profile") == "1"):
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+
+@app.after_request
+def record_request_time(response):
+    if "request_started" in g:
+        METRICS.observe("biasguard_request_seconds", time.perf_counter() - g.request_started,
+                        (("endpoint", request.endpoint or "unknown"),))
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.disable()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        name = f"{request.endpoint or 'unknown'}_{time.strftime('%Y%m%d-%H%M%S')}_{_new_uid()}.prof"
+        profiler.dump_stats(os.path.join(PROFILE_DIR, name))
+        response.headers["X-Profile-File"] = name
+    return response
+
+
+@app.teardown_request
+def stop_profiler(exc=None):
+    # after_request is skipped when a request fails outright
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.disable()
+
 
 def allowed_file(filename: str) -> bool:
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-def _to_native(obj: Any) -> Union[int, float, bool, dict, list, str]:
-    """Convert numpy/pandas/Fairlearn objects to pure Python for JSON/templates"""
+def _read_analysis_form(missing_message="Missing fields"):
+    """Read the analysis options from the form; raises ValueError with a client-facing message."""
+    target_col = request.form.get("target_col", "").strip()
+    model_name = request.form.get("model_name", "").strip()
+    sensitive_cols = _split_columns(request.form.getlist("sensitive_col"))
+    if not target_col or not sensitive_cols or not model_name:
+        raise ValueError(missing_message)
+    sensitive_col = sensitive_cols[0] if len(sensitive_cols) == 1 else sensitive_cols
+
+    validate_model_name(model_name)
+    model_params = parse_model_params(model_name, request.form)
+
+    # Out-of-core training reads the file chunk by chunk and never loads it whole
+    out_of_core = _form_flag("out_of_core")
+    if out_of_core and model_name not in INCREMENTAL_MODELS:
+        raise ValueError(f"out_of_core needs one of these models: {', '.join(sorted(INCREMENTAL_MODELS))}")
+
+    return {
+        "target_col": target_col,
+        "sensitive_col": sensitive_col,
+        "model_name": model_name,
+        "model_params": model_params,
+        "save_model": _form_flag("save_model"),
+        # Only present when set, so cache keys of in-memory analyses are unchanged
+        **({"out_of_core": True} if out_of_core else {}),
+        **_read_metric_options(),
+    }
+
+
+def _form_flag(name):
+    return request.form.get(name, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _split_columns(values):
+    # Several sensitive columns (repeated field or comma-separated) select intersectional groups
+    return [col.strip() for value in values for col in value.split(",") if col.strip()]
+
+
+def _read_batch_specs():
+    """Parse the JSON list of {target_col, sensitive_col, model_name, model_params} in the "specs" field."""
+    try:
+        raw_specs = json.loads(request.form.get("specs") or "[]")
+    except ValueError:
+        raise ValueError("specs must be a JSON list")
+    if not isinstance(raw_specs, list) or not raw_specs:
+        raise ValueError("specs must be a non-empty JSON list")
+    if len(raw_specs) > MAX_BATCH_SPECS:
+        raise ValueError(f"At most {MAX_BATCH_SPECS} specs per batch")
+
+    specs = []
+    for n, raw in enumerate(raw_specs, 1):
+        if not isinstance(raw, dict):
+            raise ValueError(f"Spec {n} must be an object")
+        target_col = str(raw.get("target_col") or "").strip()
+        sensitive = raw.get("sensitive_col") or []
+        sensitive_cols = _split_columns([sensitive] if isinstance(sensitive, str) else [str(c) for c in sensitive])
+        model_name = str(raw.get("model_name") or "").strip()
+        if not target_col or not sensitive_cols or not model_name:
+            raise ValueError(f"Spec {n} needs target_col, sensitive_col and model_name")
+        validate_model_name(model_name)
+        specs.append({
+            "target_col": target_col,
+            "sensitive_col": sensitive_cols[0] if len(sensitive_cols) == 1 else sensitive_cols,
+            "model_name": model_name,
+            "model_params": parse_model_params(model_name, raw.get("model_params") or {}),
+        })
+    return specs
+
+
+def _read_preview_options():
+    """Sample size and latency budget when the request asks for a preview, else None."""
+    if not _form_flag("preview"):
+        return None
+    try:
+        sample_rows = int(request.form.get("preview_rows") or PREVIEW_ROWS)
+        time_budget = float(request.form.get("preview_budget") or PREVIEW_TIME_BUDGET)
+    except ValueError:
+        raise ValueError("preview_rows and preview_budget must be numbers")
+    if not 100 <= sample_rows <= MAX_PREVIEW_ROWS:
+        raise ValueError(f"preview_rows must be between 100 and {MAX_PREVIEW_ROWS}")
+    if not 0 < time_budget <= 60:
+        raise ValueError("preview_budget must be between 0 and 60 seconds")
+    return {"sample_rows": sample_rows, "time_budget": time_budget}
+
+
+def _read_sweep_options():
+    """Mitigation methods and constraint strengths for /mitigate; raises ValueError with a client-facing message."""
+    # aiml.mitigation loads numpy and pandas, which importing the app must not do (see PREWARM)
+    from aiml.mitigation import MITIGATION_METHODS, DEFAULT_STRENGTHS
+
+    methods = _split_columns(request.form.getlist("methods")) or list(MITIGATION_METHODS)
+    unknown = [m for m in methods if m not in MITIGATION_METHODS]
+    if unknown:
+        raise ValueError(f"Unknown mitigation method(s): {', '.join(unknown)}; "
+                         f"use {', '.join(MITIGATION_METHODS)}")
+    try:
+        strengths = [float(v) for v in _split_columns(request.form.getlist("strengths"))] or list(DEFAULT_STRENGTHS)
+    except ValueError:
+        raise ValueError("strengths must be numbers between 0 and 1")
+    if not all(0 < v <= 1 for v in strengths):
+        raise ValueError("strengths must be numbers between 0 and 1")
+    if len(methods) * len(strengths) > MAX_SWEEP_POINTS:
+        raise ValueError(f"A sweep is limited to {MAX_SWEEP_POINTS} method/strength combinations")
+    return {"methods": list(dict.fromkeys(methods)), "strengths": sorted(set(strengths))}
+
+
+def _read_metric_options():
+    """Bootstrap and group-size options shared by analysis and scoring requests."""
+    try:
+        bootstrap_resamples = int(request.form.get("bootstrap_resamples") or 0)
+        confidence = float(request.form.get("confidence") or 0.95)
+        min_group_size = int(request.form.get("min_group_size") or 1)
+    except ValueError:
+        raise ValueError("bootstrap_resamples, confidence and min_group_size must be numbers")
+    if not 0 <= bootstrap_resamples <= MAX_BOOTSTRAP_RESAMPLES:
+        raise ValueError(f"bootstrap_resamples must be between 0 and {MAX_BOOTSTRAP_RESAMPLES}")
+    if not 0 < confidence < 1:
+        raise ValueError("confidence must be between 0 and 1")
+    if min_group_size < 1:
+        raise ValueError("min_group_size must be at least 1")
+
+    return {
+        "bootstrap_resamples": bootstrap_resamples,
+        "confidence": confidence,
+        "min_group_size": min_group_size,
+    }
+
+
+def _get_upload():
+    if "dataset" not in request.files:
+        raise ValueError("Missing dataset")
+
+    file = request.files["dataset"]
+    if not file or file.filename == "" or not allowed_file(file.filename):
+        raise ValueError("Invalid file")
+    return file
+
+
+def _validate_api_request():
+    """Check the upload and form fields of a JSON API request; raises ValueError with a client-facing message."""
+    file = _get_upload()
+    return file, _read_analysis_form()
+
+
+def _new_uid():
+    return str(uuid.uuid4())[:8]
+
 
-    # --- Fairlearn MetricFrame ---
-    if MetricFrame is not None and isinstance(obj, MetricFrame):
-        return obj.by_group.to_dict()
+def _save_upload(file, uid):
+    """Write the upload to uploads/ for a job that runs in another process. Returns the file path."""
+    file_path = os.path.join(UPLOAD_DIR, f"{uid}_{secure_filename(file.filename)}")
+    return copy_upload(file.stream, file_path)
+
+
+def _remove_file(file_path):
+    try:
+        os.remove(file_path)
+    except Exception:
+        pass
 
-    # --- Pandas ---
-    if isinstance(obj, pd.Series):
-        return obj.to_dict()
-    if isinstance(obj, pd.DataFrame):
-        return obj.to_dict(orient="list")
 
-    # --- Numpy types ---
-    if isinstance(obj, (np.integer,)):
-        return int(obj)
-    if isinstance(obj, (np.floating,)):
-        return float(obj)
-    if isinstance(obj, (np.bool_,)):
-        return bool(obj)
-    if isinstance(obj, (np.ndarray,)):
-        return obj.tolist()
+def _report_options(in_worker=False):
+    """How run_analysis/score_dataset should produce the PDF under REPORT_MODE."""
+    # A job worker is already off the request path, so background mode builds the PDF there
+    if in_worker:
+        return {"defer_report": REPORT_MODE == "lazy"}
+    return {"defer_report": REPORT_MODE != "eager"}
 
-    # --- Containers ---
-    if isinstance(obj, dict):
-        return {k: _to_native(v) for k, v in obj.items()}
-    if isinstance(obj, (list, tuple, set)):
-        return type(obj)(_to_native(v) for v in obj)
 
-    return obj
+def _run_isolated(fn, *args, **kwargs):
+    """Run an analysis entry point under the per-request worker limits (in-process when disabled)."""
+    if not ISOLATE_ANALYSES:
+        return fn(*args, **kwargs)
+    return isolated.run(fn, *args, **kwargs)
 
 
-def _save_chart_return_path(maybe_path_or_fig, out_path):
-    """Ensure charts end up saved in reports/ folder"""
-    import matplotlib.figure
-    if isinstance(maybe_path_or_fig, str) and os.path.exists(maybe_path_or_fig):
-        shutil.move(maybe_path_or_fig, out_path)
-        return out_path
-    if isinstance(maybe_path_or_fig, matplotlib.figure.Figure):
-        maybe_path_or_fig.savefig(out_path, bbox_inches="tight")
-        return out_path
-    return out_path
+def _error_payload(e):
+    payload = {"ok": False, "error": str(e)}
+    if isinstance(e, WorkerLimitError):
+        payload["limit"] = e.limit
+    return payload
+
+
+def _busy_response(e):
+    if request.path == "/results":
+        flash(str(e), "error")
+        return redirect(url_for("submit_model"))
+    response = jsonify({"ok": False, "error": str(e), "retry_after": e.retry_after})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response
+
+
+def admitted(view):
+    """Hold a host slot for the whole request; refuse with 503 before the upload is read when none is free."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        try:
+            with host_slots.acquire():
+                return view(*args, **kwargs)
+        except HostBusyError as e:
+            return _busy_response(e)
+    return wrapper
+
+
+def _schedule_report(result):
+    if report_builder is not None and result.get("report_spec_path"):
+        report_builder.submit(aiml.build_deferred_report, result["report_path"])
+    _collect_garbage()
+    return result
+
+
+def _collect_garbage():
+    # Every finished analysis adds files to reports/ and every preview an upload; sweep now and then
+    if report_store.maybe_collect() is not None:
+        purge_previews(UPLOAD_DIR, PREVIEW_MAX_AGE, PREVIEW_MAX_BYTES)
+
+
+def _result_payload(result, cached=False):
+    return {
+        "ok": True,
+        "cached": cached,
+        "model_name": result["model_name"],
+        "metrics": result["metrics"],
+        "group_rates": result["group_rates"],
+        "group_metrics": result.get("group_metrics"),
+        "group_labels": result.get("group_labels"),
+        "report_url": f"/reports/{os.path.basename(result['report_path'])}",
+        "report_ready": os.path.exists(result["report_path"]),
+        "charts": [f"/reports/{os.path.basename(path)}"
+                   for path in (result.get("chart_svg_path"), result["chart_path"]) if path],
+        "ingestion": result.get("ingestion"),
+        "intervals": result.get("intervals"),
+        "artifact_id": result.get("artifact_id"),
+        "preview": result.get("preview"),
+        "training": result.get("training")
+    }
+
+
+def _mitigation_payload(result, cached=False):
+    return {
+        "ok": True,
+        "cached": cached,
+        "model_name": result["model_name"],
+        "baseline": result["baseline"],
+        "sweep": result["sweep"],
+        "points": result["points"],
+        "pareto_front": [result["points"][i] for i in result["pareto_front"]],
+        "charts": [f"/reports/{os.path.basename(path)}"
+                   for path in (result.get("chart_svg_path"), result["chart_path"]) if path],
+        "ingestion": result.get("ingestion"),
+    }
+
+
+@app.errorhandler(413)
+def upload_too_large(e):
+    message = f"Upload exceeds the {MAX_UPLOAD_BYTES // (1024 * 1024)} MB limit"
+    if request.path == "/results":
+        flash(message, "error")
+        return redirect(url_for("submit_model"))
+    return jsonify({"ok": False, "error": message}), 413
 
 
 # --- Routes ---
@@ -111,12 +473,33 @@ def payment():
 
 @app.route("/reports/<path:filename>")
 def get_report(filename):
-    return send_from_directory(REPORT_DIR, filename, as_attachment=False)
+    """Serve a chart or PDF with a content-hash ETag, so repeat downloads get 304 Not Modified."""
+    path = safe_join(REPORT_DIR, filename)
+    if path is None:
+        abort(404)
+    # Deferred PDFs are built on first download
+    if filename.endswith(".pdf") and not os.path.exists(path):
+        aiml.build_deferred_report(path)
+    if not os.path.isfile(path):
+        abort(404)
+
+    etag = report_store.digest(path)
+    gz_path = report_store.compressed(path) if request.accept_encodings["gzip"] else None
+    response = send_file(
+        gz_path or path, mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream",
+        etag=f"{etag}-gzip" if gz_path else etag, max_age=REPORT_CACHE_MAX_AGE, conditional=True
+    )
+    if gz_path:
+        response.headers["Content-Encoding"] = "gzip"
+    if report_store.precompress:
+        response.vary.add("Accept-Encoding")
+    return response
 
 
 @app.route("/results", methods=["POST"])
+@admitted
 def results():
-    print(">>> POST /results HIT")
+    app.logger.info("POST /results")
 
     # --- 1. File validation ---
     if "dataset" not in request.files:
@@ -129,63 +512,37 @@ def results():
         return redirect(url_for("submit_model"))
 
     # --- 2. Form fields ---
-    target_col = request.form.get("target_col", "").strip()
-    sensitive_col = request.form.get("sensitive_col", "").strip()
-    model_name = request.form.get("model_name", "").strip()
-    if not target_col or not sensitive_col or not model_name:
-        flash("Please fill all fields", "error")
+    try:
+        analysis = _read_analysis_form(missing_message="Please fill all fields")
+    except ValueError as e:
+        flash(str(e), "error")
         return redirect(url_for("submit_model"))
 
-    # --- 3. Save uploaded CSV ---
-    uid = str(uuid.uuid4())[:8]
-    file_path = os.path.join(UPLOAD_DIR, f"{uid}_{secure_filename(file.filename)}")
-    file.save(file_path)
+    # --- 3. Hash the buffered upload (computed while it was received) ---
+    digest = upload_digest(file.stream)
 
     try:
-        # --- 4. Preprocess + train ---
-        X_train, X_test, y_train, y_test, A_train, A_test = preprocess_dataset(
-            file_path, target_col, sensitive_col
+        # --- 4. Preprocess, train, evaluate, chart and report (unless cached) ---
+        cache_key = analysis_key(digest, **analysis, **FEATURE_KEY)
+        result = result_cache.get(cache_key) or _run_isolated(
+            aiml.run_analysis, file.stream, report_dir=REPORT_DIR, uid=_new_uid(),
+            cache=result_cache, cache_key=cache_key,
+            chunksize=CSV_CHUNKSIZE, feature_dtype=FEATURE_DTYPE, n_jobs=ANALYSIS_CPUS, artifact_store=artifact_store,
+            **_report_options(), **analysis
         )
-        models = train_models(X_train, y_train)
-        if model_name not in models:
-            flash(f"Model '{model_name}' not available", "error")
-            return redirect(url_for("submit_model"))
-
-        model = models[model_name]
-        metrics, group_rates, y_pred = evaluate_bias(model, X_test, y_test, A_test)
-
-        # --- 5. Chart ---
-        chart_name = f"chart_{uid}.png"
-        chart_path = plot_selection_rates(
-            y_pred,
-            A_test,
-            save_path=os.path.join(REPORT_DIR, chart_name)   # 👈 ab chart reports/ me save hoga
-        )
-        # --- 6. Report ---
-        report_name = f"report_{uid}.pdf"
-        report_path = os.path.join(REPORT_DIR, report_name)
-        final_report = generate_report(
-            metrics=_to_native(metrics),
-            chart_path=chart_path,
-            group_rates=group_rates,        # pass raw object to report
-            sensitive_col=sensitive_col,
-            chosen_model_name=model_name,
-            sensitive_series=A_test,
-            output_path=report_path
-        )
-        if not final_report or not os.path.exists(final_report):
-            final_report = report_path
+        _schedule_report(result)
+        app.logger.info("Report saved at %s", result["report_path"])
 
-        print(">>> Report saved at:", final_report)
-
-        # --- 7. Render results page ---
+        # --- 5. Render results page ---
+        group_labels = result.get("group_labels") or {}
+        group_rates = {group_labels.get(str(k), k): v for k, v in result["group_rates"].items()}
         return render_template(
             "results.html",
-            model_name=model_name,
-            metrics=_to_native(metrics),
-            group_rates=_to_native(group_rates),   # dict for Jinja
-            chart_url=url_for("get_report", filename=os.path.basename(chart_path)),
-            report_url=url_for("get_report", filename=os.path.basename(final_report))
+            model_name=result["model_name"],
+            metrics=result["metrics"],
+            group_rates=group_rates,   # dict for Jinja
+            chart_url=url_for("get_report", filename=os.path.basename(result.get("chart_svg_path") or result["chart_path"])),
+            report_url=url_for("get_report", filename=os.path.basename(result["report_path"]))
         )
 
     except Exception as e:
@@ -193,80 +550,374 @@ def results():
         flash(f"Error: {e}", "error")
         return redirect(url_for("submit_model"))
 
-    finally:
-        try:
-            os.remove(file_path)
-        except Exception:
-            pass
-
 
 @app.route("/run-bias", methods=["POST"])
+@admitted
 def run_bias():
-    if "dataset" not in request.files:
-        return jsonify({"ok": False, "error": "Missing dataset"}), 400
+    try:
+        file, analysis = _validate_api_request()
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
 
-    file = request.files["dataset"]
-    if not file or file.filename == "" or not allowed_file(file.filename):
-        return jsonify({"ok": False, "error": "Invalid file"}), 400
+    try:
+        preview = _read_preview_options()
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
 
-    target_col = request.form.get("target_col", "").strip()
-    sensitive_col = request.form.get("sensitive_col", "").strip()
-    model_name = request.form.get("model_name", "").strip()
-    if not target_col or not sensitive_col or not model_name:
-        return jsonify({"ok": False, "error": "Missing fields"}), 400
+    try:
+        digest = upload_digest(file.stream)
+        cache_key = analysis_key(digest, **analysis, **FEATURE_KEY)
+        cached = result_cache.get(cache_key)
+        if cached:
+            return jsonify(_result_payload(cached, cached=True))
+
+        if preview:
+            return jsonify(_run_preview(file, analysis, digest, **preview))
+
+        result = _run_isolated(
+            aiml.run_analysis, file.stream, report_dir=REPORT_DIR, uid=_new_uid(),
+            cache=result_cache, cache_key=cache_key,
+            chunksize=CSV_CHUNKSIZE, feature_dtype=FEATURE_DTYPE, n_jobs=ANALYSIS_CPUS, artifact_store=artifact_store,
+            **_report_options(), **analysis
+        )
+        return jsonify(_result_payload(_schedule_report(result)))
 
-    uid = str(uuid.uuid4())[:8]
-    file_path = os.path.join(UPLOAD_DIR, f"{uid}_{secure_filename(file.filename)}")
-    file.save(file_path)
+    except Exception as e:
+        return jsonify(_error_payload(e)), 500
+
+
+def _run_preview(file, analysis, digest, sample_rows, time_budget):
+    """Approximate analysis on a sample; the upload is kept so the full run needs no re-upload."""
+    preview_id = _new_uid()
+    result = _run_isolated(
+        aiml.run_preview, file.stream, analysis["target_col"], analysis["sensitive_col"], analysis["model_name"],
+        REPORT_DIR, uid=preview_id, model_params=analysis["model_params"], chunksize=PREVIEW_CHUNKSIZE,
+        feature_dtype=FEATURE_DTYPE, n_jobs=ANALYSIS_CPUS, sample_rows=sample_rows, time_budget=time_budget,
+        bootstrap_resamples=max(analysis["bootstrap_resamples"], PREVIEW_BOOTSTRAP_RESAMPLES),
+        confidence=analysis["confidence"], min_group_size=analysis["min_group_size"]
+    )
+    schema = result["preview"].pop("schema")
+    save_preview(UPLOAD_DIR, preview_id, file.stream, {"analysis": analysis, "digest": digest, "schema": schema})
+    # Enforced on every save, as each preview may hold up to MAX_UPLOAD_BYTES
+    purge_previews(UPLOAD_DIR, PREVIEW_MAX_AGE, PREVIEW_MAX_BYTES)
+    return {
+        **_result_payload(result),
+        "preview_id": preview_id,
+        "upgrade_url": url_for("upgrade_preview", preview_id=preview_id),
+    }
+
+
+@app.route("/previews/<preview_id>/full", methods=["POST"])
+def upgrade_preview(preview_id):
+    """Queue the full-data run of a preview, reusing its upload and inferred schema."""
+    if not re.match(r"^[0-9a-f]{8}$", preview_id):
+        return jsonify({"ok": False, "error": "Unknown preview"}), 404
+    if job_queue.pending_count() >= job_queue.max_pending:
+        return jsonify({"ok": False, "error": "Too many pending jobs, try again later"}), 429
+
+    try:
+        file_path, meta = take_preview(UPLOAD_DIR, preview_id)
+    except KeyError:
+        return jsonify({"ok": False, "error": "Unknown preview"}), 404
+
+    analysis = meta["analysis"]
+    cache_key = analysis_key(meta["digest"], **analysis, **FEATURE_KEY)
+    cached = result_cache.get(cache_key)
+    if cached:
+        _remove_file(file_path)
+        return jsonify(_result_payload(cached, cached=True))
+
+    return _submit_analysis_job(file_path, _new_uid(), analysis, cache_key, schema=meta["schema"])
+
+
+@app.route("/cache/stats", methods=["GET"])
+def cache_stats():
+    return jsonify({"ok": True, **result_cache.stats(), "reports": report_store.stats()})
+
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    """Per-stage and per-request timings in the Prometheus text format."""
+    METRICS.set("biasguard_jobs_pending", job_queue.pending_count())
+    for name, monitor in list(monitors.items()):
+        snapshot = monitor.snapshot()
+        for metric, value in (snapshot["sliding"]["metrics"] or {}).items():
+            METRICS.set("biasguard_monitor_metric", value, (("stream", name), ("metric", metric)))
+        METRICS.set("biasguard_monitor_alerts_firing", len(snapshot["firing"]), (("stream", name),))
+    return Response(METRICS.render(), mimetype="text/plain; version=0.0.4")
+
+
+# --- Stored models ---
+@app.route("/models", methods=["GET"])
+def list_models():
+    return jsonify({"ok": True, "models": artifact_store.list()})
+
+
+@app.route("/models/<artifact_id>/score", methods=["POST"])
+@admitted
+def score_model(artifact_id):
+    try:
+        artifact_store.metadata(artifact_id)
+    except KeyError:
+        return jsonify({"ok": False, "error": "Unknown model"}), 404
+
+    try:
+        file = _get_upload()
+        options = _read_metric_options()
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
 
     try:
-        X_train, X_test, y_train, y_test, A_train, A_test = preprocess_dataset(
-            file_path, target_col, sensitive_col
+        result = _run_isolated(
+            aiml.score_dataset, file.stream, artifact_store, artifact_id, REPORT_DIR, uid=_new_uid(),
+            chunksize=CSV_CHUNKSIZE, n_jobs=ANALYSIS_CPUS, **_report_options(), **options
         )
-        models = train_models(X_train, y_train)
-        if model_name not in models:
-            return jsonify({"ok": False, "error": f"Model '{model_name}' not available"}), 400
+        return jsonify(_result_payload(_schedule_report(result)))
+
+    except Exception as e:
+        return jsonify(_error_payload(e)), 500
 
-        model = models[model_name]
-        metrics, group_rates, y_pred = evaluate_bias(model, X_test, y_test, A_test)
 
-        chart_name = f"chart_{uid}.png"
-        chart_path = _save_chart_return_path(
-            plot_selection_rates(y_pred, A_test),
-            os.path.join(REPORT_DIR, chart_name)
+# --- Batch analysis ---
+@app.route("/batch", methods=["POST"])
+@admitted
+def batch():
+    try:
+        file = _get_upload()
+        specs = _read_batch_specs()
+        options = _read_metric_options()
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+
+    # Same keys as single analyses, so batch and /run-bias results are shared through the cache
+    digest = upload_digest(file.stream)
+    cache_keys = [analysis_key(digest, **spec, save_model=False, **options, **FEATURE_KEY) for spec in specs]
+
+    try:
+        batch_result = _run_isolated(
+            aiml.run_batch, file.stream, specs, REPORT_DIR, uid=_new_uid(),
+            cache=result_cache, cache_keys=cache_keys,
+            chunksize=CSV_CHUNKSIZE, feature_dtype=FEATURE_DTYPE, n_jobs=ANALYSIS_CPUS, **_report_options(), **options
+        )
+    except Exception as e:
+        return jsonify(_error_payload(e)), 500
+    _schedule_report(batch_result)
+
+    results = []
+    for result in batch_result["results"]:
+        if "error" in result:
+            payload = {"ok": False, "error": result["error"]}
+        else:
+            payload = _result_payload(result, cached=result["cached"])
+        results.append({**payload, "label": result["label"], "spec": result["spec"]})
+
+    return jsonify({
+        "ok": True,
+        "results": results,
+        "report_url": f"/reports/{os.path.basename(batch_result['report_path'])}",
+        "report_ready": os.path.exists(batch_result["report_path"]),
+        "ingestion": batch_result["ingestion"],
+    })
+
+
+# --- Bias mitigation ---
+@app.route("/mitigate", methods=["POST"])
+def mitigate():
+    """Queue a mitigation sweep (reweighing, per-group thresholds, exponentiated gradient) as a job."""
+    try:
+        file, analysis = _validate_api_request()
+        sweep = _read_sweep_options()
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    if analysis.get("out_of_core"):
+        return jsonify({"ok": False, "error": "Mitigation sweeps run in memory; leave out out_of_core"}), 400
+
+    if job_queue.pending_count() >= job_queue.max_pending:
+        return jsonify({"ok": False, "error": "Too many pending jobs, try again later"}), 429
+
+    options = {
+        "target_col": analysis["target_col"],
+        "sensitive_col": analysis["sensitive_col"],
+        "model_name": analysis["model_name"],
+        "model_params": analysis["model_params"],
+        "min_group_size": analysis["min_group_size"],
+        **sweep,
+    }
+    cache_key = analysis_key(upload_digest(file.stream), kind="mitigation", **options, **FEATURE_KEY)
+    cached = result_cache.get(cache_key)
+    if cached:
+        return jsonify(_mitigation_payload(cached, cached=True))
+
+    uid = _new_uid()
+    file_path = _save_upload(file, uid)
+    try:
+        job_id = job_queue.submit(
+            aiml.run_mitigation, file_path, report_dir=REPORT_DIR, uid=uid, remove_input=True,
+            cache=result_cache, cache_key=cache_key, chunksize=CSV_CHUNKSIZE, feature_dtype=FEATURE_DTYPE,
+            n_jobs=ANALYSIS_CPUS, on_cancel=lambda: _remove_file(file_path), **options
         )
+    except QueueFullError as e:
+        _remove_file(file_path)
+        return jsonify({"ok": False, "error": str(e)}), 429
+
+    return jsonify({
+        "ok": True,
+        "job_id": job_id,
+        "status_url": url_for("job_status", job_id=job_id),
+        "result_url": url_for("job_result", job_id=job_id)
+    }), 202
+
+
+# --- Fairness monitoring ---
+monitors = {}
+monitors_lock = threading.Lock()
+
+
+def _get_monitor(name, create=False):
+    """The monitor for stream `name`; KeyError when it does not exist and `create` is false."""
+    with monitors_lock:
+        if name not in monitors:
+            if not create:
+                raise KeyError(name)
+            if not MONITOR_NAME.match(name):
+                raise ValueError("Stream names may only use letters, digits, '.', '_' and '-'")
+            if len(monitors) >= MAX_MONITORS:
+                raise ValueError(f"At most {MAX_MONITORS} streams can be monitored")
+
+            def log_alert(alert):
+                app.logger.warning("Fairness alert on %s: %s %s (%.2f)", name, alert["metric"],
+                                   alert["status"], alert["value"])
+
+            monitors[name] = aiml.FairnessMonitor(
+                window_seconds=MONITOR_WINDOW, slide_seconds=MONITOR_SLIDE,
+                min_group_size=MONITOR_MIN_GROUP_SIZE, on_alert=log_alert
+            )
+        return monitors[name]
+
+
+@app.route("/monitors", methods=["GET"])
+def list_monitors():
+    return jsonify({"ok": True, "streams": sorted(monitors)})
+
+
+@app.route("/monitors/<name>/records", methods=["POST"])
+def append_records(name):
+    """Add a batch of {"prediction", "label", "group", "timestamp"?} records to a stream."""
+    body = request.get_json(silent=True)
+    records = body.get("records") if isinstance(body, dict) else body
+    if not isinstance(records, list) or not records:
+        return jsonify({"ok": False, "error": "Send a JSON list of records or {\"records\": [...]}"}), 400
+    if len(records) > MAX_MONITOR_BATCH:
+        return jsonify({"ok": False, "error": f"At most {MAX_MONITOR_BATCH} records per request"}), 400
 
-        report_name = f"report_{uid}.pdf"
-        report_path = os.path.join(REPORT_DIR, report_name)
-        final_report = generate_report(
-            metrics=_to_native(metrics),
-            chart_path=chart_path,
-            group_rates=group_rates,
-            sensitive_col=sensitive_col,
-            chosen_model_name=model_name,
-            sensitive_series=A_test,
-            output_path=report_path
+    try:
+        monitor = _get_monitor(name, create=True)
+        accepted = monitor.ingest_records(records)
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+
+    return jsonify({"ok": True, "accepted": accepted, "late": len(records) - accepted,
+                    "firing": monitor.snapshot()["firing"]})
+
+
+@app.route("/monitors/<name>", methods=["GET"])
+def monitor_status(name):
+    try:
+        monitor = _get_monitor(name)
+    except KeyError:
+        return jsonify({"ok": False, "error": "Unknown stream"}), 404
+    return jsonify({"ok": True, "stream": name, **monitor.snapshot()})
+
+
+for _entry in filter(None, MONITOR_TAIL.split(";")):
+    _stream, _, _path = _entry.partition("=")
+    threading.Thread(
+        target=aiml.tail_records, args=(_path.strip(), _get_monitor(_stream.strip(), create=True)),
+        name=f"biasguard-tail-{_stream.strip()}", daemon=True
+    ).start()
+
+
+# --- Background jobs ---
+@app.route("/jobs", methods=["POST"])
+def submit_job():
+    try:
+        file, analysis = _validate_api_request()
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+
+    if job_queue.pending_count() >= job_queue.max_pending:
+        return jsonify({"ok": False, "error": "Too many pending jobs, try again later"}), 429
+
+    cache_key = analysis_key(upload_digest(file.stream), **analysis, **FEATURE_KEY)
+    cached = result_cache.get(cache_key)
+    if cached:
+        return jsonify(_result_payload(cached, cached=True))
+
+    # The worker runs in another process, so only queued jobs write their input to uploads/
+    uid = _new_uid()
+    return _submit_analysis_job(_save_upload(file, uid), uid, analysis, cache_key)
+
+
+def _submit_analysis_job(file_path, uid, analysis, cache_key, **options):
+    """Queue run_analysis on a file in uploads/ (removed when the job ends) and return the 202 response."""
+    try:
+        job_id = job_queue.submit(
+            aiml.run_analysis, file_path, report_dir=REPORT_DIR, uid=uid, remove_input=True,
+            cache=result_cache, cache_key=cache_key, chunksize=CSV_CHUNKSIZE, feature_dtype=FEATURE_DTYPE,
+            n_jobs=ANALYSIS_CPUS, artifact_store=artifact_store, on_cancel=lambda: _remove_file(file_path),
+            **_report_options(in_worker=True), **options, **analysis
         )
-        if not final_report or not os.path.exists(final_report):
-            final_report = report_path
+    except QueueFullError as e:
+        _remove_file(file_path)
+        return jsonify({"ok": False, "error": str(e)}), 429
 
-        return jsonify({
-            "ok": True,
-            "model_name": model_name,
-            "metrics": _to_native(metrics),
-            "group_rates": _to_native(group_rates),
-            "report_url": f"/reports/{os.path.basename(final_report)}",
-            "charts": [f"/reports/{os.path.basename(chart_path)}"]
-        })
+    return jsonify({
+        "ok": True,
+        "job_id": job_id,
+        "status_url": url_for("job_status", job_id=job_id),
+        "result_url": url_for("job_result", job_id=job_id)
+    }), 202
 
-    except Exception as e:
-        return jsonify({"ok": False, "error": str(e)}), 500
 
-    finally:
-        try:
-            os.remove(file_path)
-        except Exception:
-            pass
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    try:
+        return jsonify({"ok": True, **job_queue.status(job_id)})
+    except KeyError:
+        return jsonify({"ok": False, "error": "Unknown job"}), 404
+
+
+@app.route("/jobs/<job_id>/result", methods=["GET"])
+def job_result(job_id):
+    try:
+        status = job_queue.status(job_id)
+    except KeyError:
+        return jsonify({"ok": False, "error": "Unknown job"}), 404
+
+    if status["status"] in ("queued", "running"):
+        return jsonify({"ok": False, **status}), 202
+    if status["status"] == "cancelled":
+        return jsonify({"ok": False, "error": "Job was cancelled", **status}), 409
+    if status["status"] == "failed":
+        return jsonify({"ok": False, **status}), 500
+
+    result = job_queue.result(job_id)
+    _collect_garbage()
+    payload = _mitigation_payload(result) if "sweep" in result else _result_payload(result)
+    return jsonify({**payload, "job_id": job_id})
+
+
+@app.route("/jobs/<job_id>", methods=["DELETE"])
+def cancel_job(job_id):
+    try:
+        cancelled = job_queue.cancel(job_id)
+    except KeyError:
+        return jsonify({"ok": False, "error": "Unknown job"}), 404
+
+    if not cancelled:
+        return jsonify({"ok": False, "error": "Job already started or finished",
+                        **job_queue.status(job_id)}), 409
+    return jsonify({"ok": True, **job_queue.status(job_id)})
 
 
 if __name__ == "__main__":
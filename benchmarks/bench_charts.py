@@ -0,0 +1,84 @@
+"""
+Render the selection-rate chart from many threads at once, comparing the old pyplot/300 dpi path
+with the per-call Figure renderer in aiml.visualization (cold, and with the render cache warm).
+
+    python benchmarks/bench_charts.py --charts 64 --threads 8 --groups 4
+"""
+import argparse
+import io
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import matplotlib  # noqa: E402
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt  # noqa: E402
+
+from aiml import visualization  # noqa: E402
+
+
+def pyplot_chart(rates):
+    # The previous implementation: global pyplot state, 300 dpi PNG
+    plt.figure(figsize=(8, 6))
+    plt.bar([str(g) for g in rates.index], rates.values, color="skyblue", edgecolor="black")
+    plt.title("Selection Rates by Group", fontsize=16, fontweight="bold")
+    plt.ylim(0, 1)
+    plt.tight_layout()
+    buffer = io.BytesIO()
+    plt.savefig(buffer, format="png", dpi=300)
+    plt.close()
+    return buffer.getvalue()
+
+
+def figure_chart(rates, fmt):
+    return visualization.render_selection_chart(rates, fmt=fmt)
+
+
+def _key(rates):
+    return tuple(str(g) for g in rates.index), tuple(round(float(v), 6) for v in rates.values)
+
+
+def run(fn, rate_sets, threads):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        outputs = list(pool.map(fn, rate_sets))
+    return time.perf_counter() - start, outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--charts", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--groups", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    rate_sets = [pd.Series(rng.random(args.groups), index=range(args.groups)) for _ in range(args.charts)]
+
+    # pyplot is not thread-safe, so the old path can only be timed serially
+    t_pyplot, _ = run(pyplot_chart, rate_sets, threads=1)
+    print(f"charts={args.charts} groups={args.groups} threads={args.threads}")
+    print(f"pyplot 300dpi png (serial): {t_pyplot * 1000:9.1f} ms")
+
+    for fmt in ("png", "svg"):
+        visualization._cached_render.cache_clear()
+        t_cold, outputs = run(lambda r: figure_chart(r, fmt), rate_sets, args.threads)
+        t_warm, _ = run(lambda r: figure_chart(r, fmt), rate_sets, args.threads)
+        if fmt == "png":
+            # Each output must be an image of its own, not a mix of two threads' figures
+            serial = [visualization._render_chart(*_key(r), fmt, visualization.CHART_DPI) for r in rate_sets[:4]]
+            assert outputs[:4] == serial, "concurrent render differs from serial render"
+        print(f"figure {fmt} {visualization.CHART_DPI}dpi (cold):   {t_cold * 1000:9.1f} ms"
+              f"  ({t_pyplot / t_cold:.1f}x)  avg {np.mean([len(o) for o in outputs]) / 1024:.0f} KiB")
+        print(f"figure {fmt} {visualization.CHART_DPI}dpi (cached): {t_warm * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Measure the memory prepare_features needs to turn a loaded dataset into a split feature matrix.
+
+    python benchmarks/bench_features.py --rows 100000 1000000 --dtypes float64 float32
+
+Each size is generated with benchmarks/synthetic.py (same options), read back with load_dataset
+as an analysis would, and encoded, scaled and split once per dtype under tracemalloc. "copies"
+is the peak allocation divided by the size of a float64 matrix of the kept features, so 1.0
+means the matrix was built once with nothing else alive. Results are written as JSON.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiml.preprocessing import load_dataset, prepare_features  # noqa: E402
+
+import synthetic  # noqa: E402
+from bench_pipeline import RESULTS_DIR, environment  # noqa: E402
+
+
+def measure(df, info, dtype):
+    start = time.perf_counter()
+    tracemalloc.start()
+    try:
+        X_train, X_test, *_, prepared = prepare_features(
+            df, synthetic.TARGET_COL, synthetic.SENSITIVE_COL, info=info, dtype=dtype
+        )
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    seconds = time.perf_counter() - start
+    n_features = len(prepared["preprocessor"]["feature_columns"])
+    matrix_bytes = (len(X_train) + len(X_test)) * n_features * 8
+    return {
+        "dtype": dtype,
+        "seconds": seconds,
+        "features": n_features,
+        "peak_mb": round(peak / 2 ** 20, 1),
+        "matrix_mb": round(matrix_bytes / 2 ** 20, 1),
+        "copies": round(peak / matrix_bytes, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    synthetic.add_arguments(parser, rows=False)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--dtypes", nargs="+", default=["float64", "float32"], choices=["float64", "float32"])
+    parser.add_argument("--chunksize", type=int, default=100000, help="0 reads each CSV in one go")
+    parser.add_argument("--output", help=f"results file (default: {RESULTS_DIR}/features-<time>.json)")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in args.rows:
+            csv_path = synthetic.write_dataset(os.path.join(workdir, f"synthetic_{rows}.csv"),
+                                               **synthetic.dataset_kwargs(args, rows=rows))
+            df, info = load_dataset(csv_path, chunksize=args.chunksize or None)
+            os.remove(csv_path)
+            print(f"rows={rows}")
+            for dtype in args.dtypes:
+                result = {"rows": rows, **measure(df, info, dtype)}
+                results.append(result)
+                print(f"  {dtype:8s} {result['seconds'] * 1000:9.1f} ms  peak {result['peak_mb']:8.1f} MiB"
+                      f"  ({result['copies']:4.2f}x a {result['matrix_mb']:.1f} MiB float64 matrix)")
+            del df
+
+    output = args.output or os.path.join(RESULTS_DIR, f"features-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    dataset = {k: v for k, v in synthetic.dataset_kwargs(args, rows=0).items() if k != "rows"}
+    with open(output, "w", encoding="utf-8") as fh:
+        json.dump({
+            "environment": environment(),
+            "config": {"dataset": dataset, "chunksize": args.chunksize},
+            "results": results,
+        }, fh, indent=2, default=float)
+    print(f"results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Compare reading the same synthetic dataset from CSV, Parquet and Arrow IPC.
+
+    python benchmarks/bench_formats.py --rows 100000 1000000
+
+Each size is generated with benchmarks/synthetic.py (same options) and written in every format.
+For each file the benchmark times load_dataset + prepare_features (a full analysis read), a
+projected read of the target, sensitive and one feature column (what scoring a stored model
+with few features reads) and the stratified preview sample, and records the file size and the
+peak memory of the full read under tracemalloc. Results are written as JSON.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiml.preprocessing import load_dataset, prepare_features, read_sample  # noqa: E402
+
+import synthetic  # noqa: E402
+from bench_pipeline import RESULTS_DIR, environment  # noqa: E402
+
+FORMATS = ("csv", "parquet", "arrow")
+CASES = ("full", "projected", "sample")
+
+
+def write_formats(df, workdir, rows):
+    paths = {"csv": os.path.join(workdir, f"synthetic_{rows}.csv")}
+    df.to_csv(paths["csv"], index=False)
+    # Columnar files hold what a CSV parse with "?" as missing gives, as an export from pandas would
+    parsed = load_dataset(paths["csv"], chunksize=100000)[0] if df.isin(["?"]).any().any() else df
+    table = pa.Table.from_pandas(parsed, preserve_index=False)
+    paths["parquet"] = os.path.join(workdir, f"synthetic_{rows}.parquet")
+    pq.write_table(table, paths["parquet"])
+    paths["arrow"] = os.path.join(workdir, f"synthetic_{rows}.arrow")
+    feather.write_feather(table, paths["arrow"], compression="uncompressed")
+    return paths
+
+
+def run_case(case, path, chunksize):
+    if case == "full":
+        df, info = load_dataset(path, chunksize=chunksize)
+        return prepare_features(df, synthetic.TARGET_COL, synthetic.SENSITIVE_COL, info=info)
+    if case == "projected":
+        return load_dataset(path, chunksize=chunksize,
+                            columns=[synthetic.TARGET_COL, synthetic.SENSITIVE_COL, "num_0"])
+    return read_sample(path, [synthetic.TARGET_COL, synthetic.SENSITIVE_COL], chunksize=chunksize)
+
+
+def measure(path, chunksize, repeat, memory):
+    result = {"file_mb": round(os.path.getsize(path) / 2 ** 20, 1)}
+    for case in CASES:
+        runs = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run_case(case, path, chunksize)
+            runs.append(time.perf_counter() - start)
+        result[case] = {"seconds": min(runs), "runs": runs}
+    if memory:
+        tracemalloc.start()
+        try:
+            run_case("full", path, chunksize)
+            result["full"]["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    synthetic.add_arguments(parser, rows=False)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--chunksize", type=int, default=100000, help="CSV chunk size, as BIASGUARD_CSV_CHUNKSIZE")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run")
+    parser.add_argument("--output", help=f"results file (default: {RESULTS_DIR}/formats-<time>.json)")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in args.rows:
+            df = synthetic.make_dataset(**synthetic.dataset_kwargs(args, rows=rows))
+            paths = write_formats(df, workdir, rows)
+            del df
+            print(f"rows={rows}")
+            baseline = None
+            for fmt in FORMATS:
+                result = {"rows": rows, "format": fmt,
+                          **measure(paths[fmt], args.chunksize or None, args.repeat, not args.no_memory)}
+                results.append(result)
+                baseline = baseline or result
+                cells = "  ".join(
+                    f"{case} {result[case]['seconds'] * 1000:8.1f} ms ({baseline[case]['seconds'] / result[case]['seconds']:4.1f}x)"
+                    for case in CASES
+                )
+                memory = f"  peak {result['full']['peak_mb']:7.1f} MiB" if "peak_mb" in result["full"] else ""
+                print(f"  {fmt:8s} {result['file_mb']:7.1f} MB  {cells}{memory}")
+            for path in paths.values():
+                os.remove(path)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"formats-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    dataset = {k: v for k, v in synthetic.dataset_kwargs(args, rows=0).items() if k != "rows"}
+    with open(output, "w", encoding="utf-8") as fh:
+        json.dump({
+            "environment": {**environment(), "pyarrow": pa.__version__},
+            "config": {"dataset": dataset, "chunksize": args.chunksize, "repeat": args.repeat},
+            "results": results,
+        }, fh, indent=2, default=float)
+    print(f"results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
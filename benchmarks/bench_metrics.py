@@ -0,0 +1,78 @@
+"""
+Compare the bincount fairness engine in aiml.bias_metrices against the fairlearn calls it replaced.
+
+    python benchmarks/bench_metrics.py --rows 1000000 --groups 4
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fairlearn.metrics import (  # noqa: E402
+    MetricFrame, selection_rate, true_positive_rate, false_positive_rate,
+    demographic_parity_difference, equalized_odds_ratio
+)
+from sklearn.metrics import accuracy_score  # noqa: E402
+
+from aiml.bias_metrices import group_confusion_counts, metrics_from_counts  # noqa: E402
+
+
+def fairlearn_metrics(y_true, y_pred, groups):
+    rates = MetricFrame(metrics=selection_rate, y_true=y_true, y_pred=y_pred, sensitive_features=groups)
+    return {
+        "Accuracy": round(accuracy_score(y_true, y_pred), 2),
+        "Demographic Parity Diff": round(demographic_parity_difference(y_true, y_pred, sensitive_features=groups), 2),
+        "Equal Opportunity Diff": round(equalized_odds_ratio(y_true, y_pred, sensitive_features=groups), 2),
+        "Disparate Impact": round(rates.group_min() / rates.group_max(), 2),
+    }, rates
+
+
+def engine_metrics(y_true, y_pred, groups):
+    return metrics_from_counts(*group_confusion_counts(y_true, y_pred, groups))
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--groups", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    groups = rng.integers(0, args.groups, args.rows)
+    y_true = rng.integers(0, 2, args.rows)
+    # Inject some bias so the metrics are not all trivially equal
+    y_pred = (rng.random(args.rows) < 0.4 + 0.1 * (groups % 3)).astype(int)
+
+    t_fair, (fair, fair_rates) = best_of(lambda: fairlearn_metrics(y_true, y_pred, groups), args.repeat)
+    t_engine, (engine, frame) = best_of(lambda: engine_metrics(y_true, y_pred, groups), args.repeat)
+
+    assert fair == engine, f"metric mismatch: fairlearn={fair} engine={engine}"
+    assert np.allclose(fair_rates.by_group.to_numpy(), frame["selection_rate"].to_numpy())
+    eo = MetricFrame(metrics={"tpr": true_positive_rate, "fpr": false_positive_rate},
+                     y_true=y_true, y_pred=y_pred, sensitive_features=groups).by_group
+    assert np.allclose(eo["tpr"].to_numpy(), frame["tpr"].to_numpy())
+    assert np.allclose(eo["fpr"].to_numpy(), frame["fpr"].to_numpy())
+
+    print(f"rows={args.rows} groups={args.groups}")
+    print(f"fairlearn: {t_fair * 1000:9.1f} ms")
+    print(f"engine:    {t_engine * 1000:9.1f} ms  ({t_fair / t_engine:.1f}x faster)")
+    print(f"metrics:   {engine}")
+
+
+if __name__ == "__main__":
+    main()
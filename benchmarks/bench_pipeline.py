@@ -0,0 +1,188 @@
+"""
+Time every stage of the analysis pipeline on synthetic data and record peak memory per stage.
+
+    python benchmarks/bench_pipeline.py --rows 10000 100000 1000000 --models LogisticRegression
+    python benchmarks/bench_pipeline.py --rows 100000 --compare benchmarks/results/pipeline-<time>.json
+
+Each size is generated with benchmarks/synthetic.py (same options), written to a temporary CSV
+and run through preprocess_dataset, train_models, evaluate_bias, plot_selection_rates and
+generate_report. Timings are the best of `--repeat` untraced runs; peak memory comes from one
+extra run under tracemalloc (NumPy and pandas buffers included). Results are written as JSON,
+and `--compare` prints the change against an earlier results file.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiml import visualization  # noqa: E402
+from aiml.bias_metrices import evaluate_bias  # noqa: E402
+from aiml.model_training import train_models  # noqa: E402
+from aiml.preprocessing import preprocess_dataset  # noqa: E402
+from aiml.report import generate_report  # noqa: E402
+
+import synthetic  # noqa: E402
+
+STAGES = ["preprocess_dataset", "train_models", "evaluate_bias", "plot_selection_rates", "generate_report"]
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def run_pipeline(csv_path, model_name, chunksize, workdir, measure):
+    """Run the stages in order; `measure(name, fn)` times (or traces) each one and returns its output."""
+    X_train, X_test, y_train, y_test, A_train, A_test, info = measure("preprocess_dataset", lambda: preprocess_dataset(
+        csv_path, synthetic.TARGET_COL, synthetic.SENSITIVE_COL, chunksize=chunksize, return_info=True
+    ))
+    labels = info["sensitive_labels"]
+
+    models = measure("train_models", lambda: train_models(X_train, y_train, model_names=[model_name], n_jobs=-1))
+    metrics, rates, y_pred, _ = measure("evaluate_bias", lambda: evaluate_bias(
+        models[model_name], X_test, y_test, A_test, return_group_metrics=True
+    ))
+
+    def plot():
+        # Time a real render, not a render-cache hit
+        visualization._cached_render.cache_clear()
+        return visualization.plot_selection_rates(
+            y_pred, A_test, save_path=os.path.join(workdir, "chart.png"), sensitive_mapping=labels, rates=rates
+        )
+
+    chart_path = measure("plot_selection_rates", plot)
+    measure("generate_report", lambda: generate_report(
+        metrics, chart_path, rates, synthetic.SENSITIVE_COL, model_name,
+        output_path=os.path.join(workdir, "report.pdf"), sensitive_mapping=labels
+    ))
+    return metrics
+
+
+def time_stages(csv_path, model_name, chunksize, workdir, repeat):
+    timings = {name: [] for name in STAGES}
+
+    def measure(name, fn):
+        start = time.perf_counter()
+        out = fn()
+        timings[name].append(time.perf_counter() - start)
+        return out
+
+    for _ in range(repeat):
+        metrics = run_pipeline(csv_path, model_name, chunksize, workdir, measure)
+    return timings, metrics
+
+
+def trace_stages(csv_path, model_name, chunksize, workdir):
+    peaks = {}
+
+    def measure(name, fn):
+        tracemalloc.start()
+        try:
+            return fn()
+        finally:
+            peaks[name] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+            tracemalloc.stop()
+
+    run_pipeline(csv_path, model_name, chunksize, workdir, measure)
+    return peaks
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "sklearn": sklearn.__version__,
+    }
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, "r", encoding="utf-8") as fh:
+        baseline = {(r["rows"], r["model"]): r for r in json.load(fh)["results"]}
+    for result in results:
+        before = baseline.get((result["rows"], result["model"]))
+        if before is None:
+            print(f"rows={result['rows']} model={result['model']}: not in baseline")
+            continue
+        print(f"rows={result['rows']} model={result['model']} vs baseline:")
+        for name in STAGES:
+            old, new = before["stages"][name]["seconds"], result["stages"][name]["seconds"]
+            print(f"  {name:22s} {old * 1000:9.1f} -> {new * 1000:9.1f} ms  ({new / old:5.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    synthetic.add_arguments(parser, rows=False)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--models", nargs="+", default=["LogisticRegression", "RandomForest"])
+    parser.add_argument("--chunksize", type=int, default=100000, help="0 reads each CSV in one go")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run")
+    parser.add_argument("--output", help=f"results file (default: {RESULTS_DIR}/pipeline-<time>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in args.rows:
+            csv_path = synthetic.write_dataset(os.path.join(workdir, f"synthetic_{rows}.csv"),
+                                               **synthetic.dataset_kwargs(args, rows=rows))
+            for model_name in args.models:
+                timings, metrics = time_stages(csv_path, model_name, args.chunksize or None, workdir, args.repeat)
+                peaks = {} if args.no_memory else trace_stages(csv_path, model_name, args.chunksize or None, workdir)
+                stages = {
+                    name: {
+                        "seconds": min(timings[name]),
+                        "runs": timings[name],
+                        "peak_mb": round(peaks[name], 1) if name in peaks else None,
+                    }
+                    for name in STAGES
+                }
+                results.append({
+                    "rows": rows,
+                    "model": model_name,
+                    "csv_mb": round(os.path.getsize(csv_path) / 2 ** 20, 1),
+                    "total_seconds": sum(s["seconds"] for s in stages.values()),
+                    "stages": stages,
+                    "metrics": metrics,
+                })
+
+                print(f"rows={rows} model={model_name}")
+                for name, stage in stages.items():
+                    memory = f"{stage['peak_mb']:8.1f} MiB" if stage["peak_mb"] is not None else ""
+                    print(f"  {name:22s} {stage['seconds'] * 1000:9.1f} ms  {memory}")
+            os.remove(csv_path)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"pipeline-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    dataset = {k: v for k, v in synthetic.dataset_kwargs(args, rows=0).items() if k != "rows"}
+    with open(output, "w", encoding="utf-8") as fh:
+        json.dump({
+            "environment": environment(),
+            "config": {"dataset": dataset, "chunksize": args.chunksize, "repeat": args.repeat},
+            "results": results,
+        }, fh, indent=2, default=float)
+    print(f"results written to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Time PDF report generation and compare file sizes: the old RGBA chart at 300 dpi against the flat
+palette chart that aiml.visualization now renders for the PDF, plus the cost of a deferred report
+(saving the spec only) against building the PDF up front.
+
+    python benchmarks/bench_report.py --groups 4 --repeat 5
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg  # noqa: E402
+from matplotlib.figure import Figure  # noqa: E402
+
+from aiml.pipeline import _build_report, build_deferred_report, to_native  # noqa: E402
+from aiml.report import generate_report  # noqa: E402
+from aiml.visualization import render_selection_chart  # noqa: E402
+
+METRICS = {"Accuracy": 0.8, "Demographic Parity Diff": 0.05, "Equal Opportunity Diff": 0.61, "Disparate Impact": 0.94}
+
+
+def rgba_chart(rates):
+    # The previous chart: RGBA PNG at 300 dpi
+    fig = Figure(figsize=(8, 6))
+    canvas = FigureCanvasAgg(fig)
+    fig.add_subplot().bar([str(g) for g in rates.index], rates.values)
+    buffer = io.BytesIO()
+    canvas.print_figure(buffer, format="png", dpi=300)
+    return buffer.getvalue()
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--groups", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rates = pd.Series(np.linspace(0.4, 0.9, args.groups), index=range(args.groups))
+    labels = {g: f"group {g}" for g in rates.index}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"groups={args.groups}")
+        for name, data in (("rgba 300dpi", rgba_chart(rates)), ("palette", render_selection_chart(rates, labels))):
+            chart = os.path.join(tmp, f"{name.split()[0]}.png")
+            with open(chart, "wb") as fh:
+                fh.write(data)
+            pdf = os.path.join(tmp, f"{name.split()[0]}.pdf")
+            elapsed = best_of(lambda: generate_report(METRICS, chart, rates, "group", "LogisticRegression",
+                                                      output_path=pdf, sensitive_mapping=labels), args.repeat)
+            print(f"{name:12s} chart {len(data) / 1024:7.0f} KiB  report {elapsed * 1000:8.1f} ms"
+                  f"  pdf {os.path.getsize(pdf) / 1024:7.0f} KiB")
+
+        # Deferred mode: the request only pays for writing the spec; the PDF comes on download
+        report_args = to_native({
+            "metrics": METRICS, "chart_path": chart, "group_rates": [[k, v] for k, v in rates.items()],
+            "sensitive_col": "group", "chosen_model_name": "LogisticRegression",
+            "sensitive_mapping": labels, "sensitive_series": None, "metric_intervals": None,
+        })
+        eager = best_of(lambda: _build_report(report_args, os.path.join(tmp, "eager.pdf")), args.repeat)
+
+        def deferred():
+            report = os.path.join(tmp, "deferred.pdf")
+            with open(os.path.join(tmp, "deferred.json"), "w", encoding="utf-8") as fh:
+                json.dump(report_args, fh)
+            if os.path.exists(report):
+                os.remove(report)
+            return report
+
+        spec_only = best_of(deferred, args.repeat)
+        first_download = best_of(lambda: build_deferred_report(deferred()), args.repeat) - spec_only
+        print(f"eager report:    {eager * 1000:8.1f} ms in the request")
+        print(f"deferred report: {spec_only * 1000:8.1f} ms in the request, "
+              f"{first_download * 1000:.1f} ms on first download")
+
+
+if __name__ == "__main__":
+    main()
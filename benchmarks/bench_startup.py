@@ -0,0 +1,55 @@
+"""
+Measure app startup: how long `import app` takes in a fresh interpreter with the analysis stack
+imported lazily (BIASGUARD_PREWARM=off) and eagerly, and what the first analysis request then
+pays to import the rest. Fails if `import app` alone loads pandas or numpy.
+
+    python benchmarks/bench_startup.py --repeat 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ("pandas", "numpy")
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app
+boot = time.perf_counter() - start
+heavy = [m for m in %r if m in sys.modules]
+import aiml
+# The import cost the first analysis request pays (close to 0 once pre-warmed)
+first_request = aiml.warm_up()
+print(json.dumps({"boot": boot, "first_request": first_request, "heavy": heavy}))
+""" % (HEAVY_MODULES,)
+
+
+def probe(prewarm):
+    env = {**os.environ, "BIASGUARD_PREWARM": prewarm}
+    out = subprocess.run([sys.executable, "-c", PROBE], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # The first run also fills the filesystem cache and writes .pyc files
+    heavy = probe("off")["heavy"]
+    if heavy:
+        raise SystemExit(f"import app loaded {', '.join(heavy)} with BIASGUARD_PREWARM=off")
+    for prewarm in ("off", "eager"):
+        runs = [probe(prewarm) for _ in range(args.repeat)]
+        boot = min(r["boot"] for r in runs)
+        first = min(r["first_request"] for r in runs)
+        print(f"BIASGUARD_PREWARM={prewarm:6s} import app {boot * 1000:8.1f} ms"
+              f"  first analysis import {first * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()